@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+bench_formats.py
+—————————————————————————————————
+Compara el coste de pasar la tabla entre etapas en XLSX (como antes) y
+en Parquet (stream_io.write_table / read_table).
+
+Para cada formato y operación (escribir / leer) se lanza un proceso
+nuevo, de modo que el pico de memoria medido (+RSS sobre el proceso ya
+arrancado) sea solo el de esa operación.
+
+Uso
+───
+python bench_formats.py            # 20 000 filas sintéticas
+python bench_formats.py 100000
+"""
+
+import multiprocessing as mp
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from stream_io import read_table, write_table
+
+N_ROWS = 20_000
+
+
+def synthetic_table(n: int) -> pd.DataFrame:
+    """Tabla con la forma del inventario del INAH ya geocodificado."""
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "clave": np.arange(n),
+        "nombre": [f"Inmueble histórico {i}" for i in range(n)],
+        "direccion": [f"Calle {i % 500} #{i % 97}, Centro, Cuauhtémoc" for i in range(n)],
+        "google_maps_url": [f"https://www.google.com/maps/place/x/@{19.4 + i * 1e-6:.6f},-99.1,17z"
+                            for i in range(n)],
+        "latitud": rng.uniform(19.2, 19.6, n),
+        "longitud": rng.uniform(-99.3, -98.9, n),
+    })
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # KB → MB (Linux)
+
+
+def _run(op: str, path: str, n: int, out):
+    import openpyxl, pyarrow.parquet    # noqa: F401  (que no cuente la importación)
+    if op == "write":
+        df = synthetic_table(n)
+        base = _peak_rss_mb()
+        t0 = time.perf_counter()
+        write_table(df, path)
+    else:
+        base = _peak_rss_mb()
+        t0 = time.perf_counter()
+        read_table(path)
+    out.put((time.perf_counter() - t0, _peak_rss_mb() - base))
+
+
+def measure(op: str, path: str, n: int) -> tuple[float, float]:
+    ctx = mp.get_context("spawn")
+    q = ctx.Queue()
+    p = ctx.Process(target=_run, args=(op, path, n, q))
+    p.start()
+    res = q.get()
+    p.join()
+    return res
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else N_ROWS
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"📏  {n} filas")
+        print(f"   {'formato':<8} {'escribir s':>11} {'+RSS MB':>8} "
+              f"{'leer s':>8} {'+RSS MB':>8} {'tamaño MB':>10}")
+        for ext in ("xlsx", "parquet"):
+            path = os.path.join(tmp, f"tabla.{ext}")
+            t_w, rss_w = measure("write", path, n)
+            t_r, rss_r = measure("read", path, n)
+            size = os.path.getsize(path) / 1e6
+            print(f"   {ext:<8} {t_w:>11.2f} {rss_w:>8.1f} {t_r:>8.2f} {rss_r:>8.1f} {size:>10.2f}")
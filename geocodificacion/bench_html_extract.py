@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+bench_html_extract.py
+—————————————————————————————————
+Micro-benchmark: extract_from_html (HTML completo en memoria) frente a
+extract_from_stream (lectura por bloques con corte temprano).
+
+Usa las páginas guardadas en FIXTURES_DIR (*.html, tal como las
+devuelve Google Maps). Si la carpeta no existe, genera páginas
+sintéticas de ~600 KB con las coordenadas al principio, a la mitad, al
+final o ausentes.
+
+Uso
+───
+python bench_html_extract.py [carpeta_fixtures]
+"""
+
+import glob
+import os
+import sys
+import time
+
+from geocode_google_v2 import extract_from_html, extract_from_stream
+
+FIXTURES_DIR = "fixtures_html"
+REPEAT       = 20
+
+
+class FakeResponse:
+    """Imita a requests.Response con stream=True sobre bytes en memoria."""
+
+    def __init__(self, body: bytes, encoding: str = "utf-8"):
+        self.body = body
+        self.encoding = encoding
+        self.bytes_read = 0
+
+    def iter_content(self, chunk_size: int):
+        for i in range(0, len(self.body), chunk_size):
+            chunk = self.body[i:i + chunk_size]
+            self.bytes_read += len(chunk)
+            yield chunk
+
+    def close(self):
+        pass
+
+
+def synthetic_pages(size: int = 600_000) -> dict[str, bytes]:
+    filler = ('<script>window.x=[null,"' + "a" * 120 + '",[1,2,3],{"k":"v"}];</script>\n')
+    n = size // len(filler)
+    center = '"center":{"lat":19.4343,"lng":-99.1392}'
+    appinit = 'window.APP_INITIALIZATION_STATE=[[[19.4343,-99.1392],[0,0,0]],'
+    pages = {}
+    for name, pos, marker in (("center_inicio", 0.05, center), ("center_mitad", 0.5, center),
+                              ("appinit_final", 0.95, appinit), ("sin_coords", None, "")):
+        parts = [filler] * n
+        if pos is not None:
+            parts.insert(int(n * pos), marker)
+        pages[name] = "".join(parts).encode("utf-8")
+    return pages
+
+
+def load_fixtures(folder: str) -> dict[str, bytes]:
+    return {os.path.basename(p): open(p, "rb").read()
+            for p in sorted(glob.glob(os.path.join(folder, "*.html")))}
+
+
+def bench(pages: dict[str, bytes]) -> None:
+    print(f"   {'página':<22} {'KB':>6} {'completo ms':>12} {'stream ms':>10} "
+          f"{'KB leídos':>10} {'mismo resultado':>16}")
+    for name, body in pages.items():
+        t0 = time.perf_counter()
+        for _ in range(REPEAT):
+            full = extract_from_html(body.decode("utf-8", errors="replace"))
+        t_full = (time.perf_counter() - t0) / REPEAT * 1000
+
+        t0 = time.perf_counter()
+        for _ in range(REPEAT):
+            resp = FakeResponse(body)
+            streamed = extract_from_stream(resp)
+        t_stream = (time.perf_counter() - t0) / REPEAT * 1000
+
+        print(f"   {name[:22]:<22} {len(body) / 1024:>6.0f} {t_full:>12.2f} {t_stream:>10.2f} "
+              f"{resp.bytes_read / 1024:>10.0f} {str(full == streamed):>16}")
+
+
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 else FIXTURES_DIR
+    pages = load_fixtures(folder) if os.path.isdir(folder) else {}
+    if not pages:
+        print(f"ℹ️  Sin fixtures en «{folder}»: usando páginas sintéticas")
+        pages = synthetic_pages()
+    bench(pages)
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+bench_pipeline.py
+—————————————————————————————————
+Benchmark reproducible de la geocodificación contra fake_google.py, sin
+tocar Google.
+
+1. Genera un libro sintético (make_workbook) con la mezcla MIX de URLs:
+   redirección con @lat,lon, HTML con "center", HTML con
+   APP_INITIALIZATION_STATE, sin coordenadas (Nominatim falso),
+   redirección por JavaScript (solo la resuelve el navegador) y URLs que
+   ya traen @lat,lon; una fracción DUP_FRAC son duplicados.
+2. Arranca el servidor falso con la latencia / 429 / consentimiento
+   pedidos.
+3. Mide, cada uno en un proceso nuevo (para que el pico de memoria sea
+   solo suyo):
+       get_coords   → geocode_via_google_redirect.get_coords, en serie
+       resolve_all  → geocode_via_google_redirect.resolve_all, en paralelo
+       v2           → bucle de geocode_google_v2.resolve_row (sin el sleep de 1 s)
+       expand       → expand_google_links.expand_one (se omite si no hay Chrome)
+   e imprime filas/s, latencia p50/p95 por fila, +RSS y cuántas
+   coordenadas coinciden con las esperadas.
+
+Uso
+───
+python bench_pipeline.py                              # 300 filas, 20 ms
+python bench_pipeline.py --rows 2000 --latency-ms 80 --p429 0.01
+python bench_pipeline.py --workbook base_sintetica.xlsx --rows 5000   # solo genera el libro
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import fake_google
+from stream_io import read_table, write_table
+
+N_ROWS     = 300
+LATENCY_MS = 20
+PORT       = 8800
+MIX = {                 # fracción de filas por tipo de URL
+    "redir":   0.45,
+    "center":  0.20,
+    "appinit": 0.10,
+    "none":    0.10,
+    "js":      0.05,    # redirección por JavaScript → solo Selenium
+    "url":     0.10,    # ya trae @lat,lon
+}
+DUP_FRAC = 0.10         # filas que repiten la URL de otra
+BENCHES  = ("get_coords", "resolve_all", "v2", "expand")
+
+
+def make_workbook(n: int, base_url: str, mix: dict = MIX, dup_frac: float = DUP_FRAC,
+                  seed: int = 0) -> pd.DataFrame:
+    """Tabla con la forma del inventario y las coordenadas esperadas por fila."""
+    rng = np.random.default_rng(seed)
+    modes = rng.choice(list(mix), size=n, p=np.array(list(mix.values())) / sum(mix.values()))
+    urls, lats, lons = [], [], []
+    for i, mode in enumerate(modes):
+        if mode == "url":
+            query = f"redir-{i}"
+            lat, lon = fake_google.coords_for(query)
+            urls.append(f"{base_url}/maps/place/{query}/@{lat},{lon},17z")
+        else:
+            query = f"{mode}-{i}"
+            lat, lon = fake_google.coords_for(query)
+            urls.append(f"{base_url}/maps/search/?api=1&query={query}")
+        lats.append(lat)
+        lons.append(lon)
+
+    df = pd.DataFrame({
+        "clave": np.arange(n),
+        "nombre": [f"Inmueble histórico {i}" for i in range(n)],
+        "direccion": [f"Calle {i % 500} #{i % 97}, Centro, Cuauhtémoc" for i in range(n)],
+        "google_maps_url": urls,
+        "tipo": modes,
+        "lat_esperada": lats,
+        "lon_esperada": lons,
+    })
+    dups = rng.choice(n, size=int(n * dup_frac), replace=False)
+    src = rng.choice(n, size=len(dups))
+    for col in ("google_maps_url", "tipo", "lat_esperada", "lon_esperada"):
+        df.loc[dups, col] = df.loc[src, col].to_numpy()
+    return df
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # KB → MB (Linux)
+
+
+# ── benchmarks (cada uno corre en un proceso aparte) ─────────
+def _bench_get_coords(df, port):
+    from geocode_via_google_redirect import get_coords
+    from transport import make_session
+    session = make_session(pool_size=1)
+    base, times, out = _peak_rss_mb(), [], []
+    t0 = time.perf_counter()
+    for url in df["google_maps_url"]:
+        t = time.perf_counter()
+        out.append(get_coords(url, session))
+        times.append(time.perf_counter() - t)
+    return time.perf_counter() - t0, times, out, _peak_rss_mb() - base
+
+
+def _bench_resolve_all(df, port):
+    from geocode_via_google_redirect import resolve_all
+    from metrics import METRICS
+    base = _peak_rss_mb()
+    t0 = time.perf_counter()
+    res = resolve_all(df["google_maps_url"].to_dict(), rate=1000, burst=100, desc="resolve_all")
+    elapsed = time.perf_counter() - t0
+    out = [res.get(i, (None, None)) for i in df.index]
+    return elapsed, METRICS.durations["redirect"], out, _peak_rss_mb() - base
+
+
+def _bench_v2(df, port):
+    import geocode_google_v2 as v2
+    from geopy.geocoders import Nominatim
+    from geopy.extra.rate_limiter import RateLimiter
+    # Nominatim también apunta al servidor falso y sin la pausa de 1 s
+    nominatim = Nominatim(user_agent="bench_pipeline", domain=f"127.0.0.1:{port}", scheme="http")
+    v2.geocode = RateLimiter(nominatim.geocode, min_delay_seconds=0)
+    base, times, out = _peak_rss_mb(), [], []
+    t0 = time.perf_counter()
+    for url in df["google_maps_url"]:
+        t = time.perf_counter()
+        lat, lon, _ = v2.resolve_row(url)
+        out.append((lat, lon))
+        times.append(time.perf_counter() - t)
+    return time.perf_counter() - t0, times, out, _peak_rss_mb() - base
+
+
+def _bench_expand(df, port):
+    from expand_google_links import make_driver, expand_one, PAT_COORDS
+    driver = make_driver()
+    base, times, out = _peak_rss_mb(), [], []
+    t0 = time.perf_counter()
+    try:
+        for url in df["google_maps_url"]:
+            t = time.perf_counter()
+            try:
+                m = PAT_COORDS.search(expand_one(driver, url))
+                out.append(tuple(map(float, m.groups())) if m else (None, None))
+            except Exception:
+                out.append((None, None))
+            times.append(time.perf_counter() - t)
+    finally:
+        driver.quit()
+    return time.perf_counter() - t0, times, out, _peak_rss_mb() - base
+
+
+def _run(name, path, port, q):
+    from transport import pin_host
+    pin_host("consent.localhost", "127.0.0.1")
+    df = read_table(path)
+    try:
+        elapsed, times, out, rss = globals()[f"_bench_{name}"](df, port)
+    except Exception as e:
+        q.put((name, None, str(e)))
+        return
+    got = np.array([(np.nan if a is None else a, np.nan if b is None else b) for a, b in out],
+                   dtype="float64")
+    exp = df[["lat_esperada", "lon_esperada"]].to_numpy(dtype="float64")
+    correct = int((np.abs(got - exp) < 1e-6).all(axis=1).sum())
+    ms = np.asarray(times) * 1000 if len(times) else np.zeros(1)
+    q.put((name, (len(df) / elapsed, np.percentile(ms, 50), np.percentile(ms, 95), rss, correct), None))
+
+
+def measure(name: str, path: str, port: int):
+    ctx = mp.get_context("spawn")
+    q = ctx.Queue()
+    p = ctx.Process(target=_run, args=(name, path, port, q))
+    p.start()
+    res = q.get()
+    p.join()
+    return res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark offline de la geocodificación.")
+    parser.add_argument("--rows", type=int, default=N_ROWS)
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS)
+    parser.add_argument("--p429", type=float, default=0.0)
+    parser.add_argument("--pconsent", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--only", nargs="+", choices=BENCHES, default=list(BENCHES))
+    parser.add_argument("--workbook", help="solo genera el libro sintético en esta ruta")
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    df = make_workbook(args.rows, base_url)
+    if args.workbook:
+        write_table(df, args.workbook)
+        print(f"✅  Libro sintético: {args.workbook} ({len(df)} filas)")
+        raise SystemExit(0)
+
+    fake_google.serve(args.port, args.latency_ms, args.p429, args.pconsent)
+    print(f"🧪  {args.rows} filas | latencia {args.latency_ms:.0f} ms | "
+          f"429 {args.p429:.0%} | consentimiento {args.pconsent:.0%}")
+    print(f"   {df['tipo'].value_counts().to_dict()}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "base_sintetica.parquet")
+        write_table(df, path)
+        rows = []
+        for name in args.only:
+            name, res, err = measure(name, path, args.port)
+            if res is None:
+                print(f"⚠️  {name}: omitido ({err.splitlines()[0][:80]})")
+                continue
+            rows.append((name, *res))
+
+    print(f"\n📊  {'prueba':<12} {'filas/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'+RSS MB':>8} {'correctas':>10}")
+    for name, rps, p50, p95, rss, correct in rows:
+        print(f"   {name:<12} {rps:>9.1f} {p50:>8.1f} {p95:>8.1f} {rss:>8.1f} "
+              f"{correct:>6}/{args.rows}")
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+canonical.py
+—————————————————————————————————
+Canonicalización y deduplicación de URLs / consultas antes de cualquier
+petición de red.
+
+En las hojas del INAH muchas filas apuntan al mismo inmueble o al mismo
+texto `query=` con diferencias de mayúsculas, acentos, espacios o
+codificación URL. Aquí cada fila se reduce a una clave única:
+
+    "place:<query_place_id>"   si la URL trae el identificador del lugar
+    "query:<texto canónico>"   para las URLs /maps/search/?query=…
+    "url:<url canónica>"       para el resto
+
+de modo que cada clave se resuelve una sola vez y el resultado se
+reparte después a todas sus filas (`fan_out`).
+"""
+
+import unicodedata
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, unquote, unquote_plus
+
+# Parámetros que no cambian el lugar buscado
+IGNORED_PARAMS = {"hl", "entry", "g_ep", "authuser", "shorturl", "coh", "skid"}
+
+
+def _unquote_all(text: str, rounds: int = 3) -> str:
+    """Decodifica %XX repetidamente (hay URLs codificadas dos veces)."""
+    for _ in range(rounds):
+        decoded = unquote(text)
+        if decoded == text:
+            break
+        text = decoded
+    return text
+
+
+def canonical_query(query: str) -> str:
+    """Texto de búsqueda: decodificado, sin acentos, en minúsculas, con
+    espacios colapsados y sin espacios antes de comas."""
+    text = unicodedata.normalize("NFKD", unquote_plus(_unquote_all(str(query))))
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = " ".join(text.split())
+    return text.replace(" ,", ",")
+
+
+def canonical_url(url: str) -> str:
+    """URL canónica: host en minúsculas, parámetros decodificados y
+    ordenados, sin parámetros irrelevantes ni fragmento. El path se
+    respeta tal cual (los enlaces cortos distinguen mayúsculas)."""
+    parts = urlsplit(unicodedata.normalize("NFC", str(url).strip()))
+    params = []
+    for k, v in parse_qsl(parts.query, keep_blank_values=True):
+        if k in IGNORED_PARAMS or k.startswith("utm_"):
+            continue
+        v = _unquote_all(v)
+        params.append((k, canonical_query(v) if k == "query" else v))
+    path = _unquote_all(parts.path).rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(),
+                       path, urlencode(sorted(params)), ""))
+
+
+def dedup_key(url: str) -> str:
+    """Clave de deduplicación de una fila.
+
+    `query_place_id` identifica el lugar sin ambigüedad: dos URLs con el
+    mismo texto y distinto place_id son lugares distintos, y el mismo
+    place_id con textos distintos es el mismo lugar. El texto solo se usa
+    cuando falta el place_id.
+    """
+    canon = canonical_url(url)
+    parts = urlsplit(canon)
+    params = dict(parse_qsl(parts.query))
+    if params.get("query_place_id"):
+        return "place:" + params["query_place_id"]
+    query = params.get("query")
+    if query and "/maps/search" in parts.path:
+        return "query:" + query
+    return "url:" + canon
+
+
+def dedup(urls: dict) -> tuple[dict, dict]:
+    """
+    {idx: url} → (grupos {clave: [idx, …]}, representantes {clave: url}).
+    El representante es la primera URL original de cada grupo.
+    """
+    groups, reps = {}, {}
+    for idx, url in urls.items():
+        url = str(url).strip()
+        if not url or url == "nan":
+            continue
+        key = dedup_key(url)
+        if key not in groups:
+            groups[key] = []
+            reps[key] = url
+        groups[key].append(idx)
+    return groups, reps
+
+
+def fan_out(groups: dict, results: dict) -> dict:
+    """Reparte {clave: resultado} a {idx: resultado} para todas las filas."""
+    return {idx: results[key] for key, idxs in groups.items() if key in results
+            for idx in idxs}
+
+
+def report_dedup(n_rows: int, groups: dict) -> None:
+    n_keys = len(groups)
+    ratio = 1 - n_keys / n_rows if n_rows else 0.0
+    print(f"🔁  Deduplicación: {n_rows} filas → {n_keys} claves únicas "
+          f"({ratio:.1%} de peticiones ahorradas)")
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+checkpoint.py
+—————————————————————————————————
+Puntos de control para procesos largos de geocodificación.
+
+Las filas ya resueltas se vuelcan a un archivo CSV "sidecar" cada
+`every_rows` filas o cada `every_secs` segundos. La escritura es
+atómica (archivo temporal + os.replace), así que un corte de luz, un
+bloqueo de Google o un Ctrl-C nunca dejan el archivo a medias.
+
+Con `load()` se recuperan las filas hechas para reanudar (--resume).
+Cada fila guarda también su URL: si la hoja se editó entre ejecuciones,
+solo se reutilizan las filas cuya URL no cambió.
+"""
+
+import csv
+import os
+import tempfile
+import time
+
+FIELDS = ("idx", "google_maps_url", "latitud", "longitud")
+
+
+def _num(value: str):
+    return float(value) if value not in ("", None) else None
+
+
+class Checkpoint:
+    """Acumula filas resueltas y las guarda periódicamente en `path`."""
+
+    def __init__(self, path: str, every_rows: int = 200, every_secs: float = 60.0):
+        self.path = path
+        self.every_rows = every_rows
+        self.every_secs = every_secs
+        self.rows: dict[int, tuple] = {}
+        self._dirty = 0
+        self._last_flush = time.monotonic()
+
+    def load(self) -> dict[int, tuple]:
+        """Lee el sidecar (si existe) → {idx: (url, lat, lon)}."""
+        self.rows = {}
+        if os.path.exists(self.path):
+            with open(self.path, newline="", encoding="utf-8") as fh:
+                for r in csv.DictReader(fh):
+                    self.rows[int(r["idx"])] = (r["google_maps_url"],
+                                                _num(r["latitud"]), _num(r["longitud"]))
+        return self.rows
+
+    def done(self, idx: int, url: str) -> tuple | None:
+        """Devuelve (lat, lon) si la fila ya se resolvió con la misma URL.
+
+        Las filas guardadas sin coordenadas (fallos, bloqueos) no cuentan
+        como hechas: se reintentan al reanudar.
+        """
+        row = self.rows.get(idx)
+        if row is not None and row[0] == url and row[1] is not None:
+            return row[1], row[2]
+        return None
+
+    def record(self, idx: int, url: str, lat, lon) -> None:
+        self.rows[idx] = (url, lat, lon)
+        self._dirty += 1
+        if (self._dirty >= self.every_rows
+                or time.monotonic() - self._last_flush >= self.every_secs):
+            self.flush()
+
+    def flush(self) -> None:
+        """Reescribe el sidecar de forma atómica."""
+        folder = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(prefix=".ckpt_", suffix=".csv", dir=folder)
+        try:
+            with os.fdopen(fd, "w", newline="", encoding="utf-8") as fh:
+                w = csv.writer(fh)
+                w.writerow(FIELDS)
+                for idx in sorted(self.rows):
+                    url, lat, lon = self.rows[idx]
+                    w.writerow((idx, url,
+                                "" if lat is None else lat,
+                                "" if lon is None else lon))
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self._dirty = 0
+        self._last_flush = time.monotonic()
+
+    def remove(self) -> None:
+        """Borra el sidecar una vez guardado el resultado final."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
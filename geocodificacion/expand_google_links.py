@@ -9,6 +9,11 @@ por la URL final “/place/…@lat,lon…” que Google devuelve tras la
 redirección, de modo que luego puedas extraer fácilmente latitud
 y longitud.
 
+Las URLs se reparten entre POOL_SIZE navegadores headless que toman
+trabajo de una cola común. Cada navegador se recicla tras
+PAGES_PER_DRIVER páginas (Chrome crece en memoria con el uso) y todos
+comparten un único límite global de RATE páginas/s.
+
 Requisitos
 ──────────
 pip install pandas openpyxl selenium webdriver-manager tqdm
@@ -20,7 +25,8 @@ python expand_google_links.py
 
 import re
 import time
-import pandas as pd
+import queue
+import threading
 from tqdm import tqdm
 
 from selenium import webdriver
@@ -28,24 +34,34 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.common.by import By
+from selenium.common.exceptions import TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
 from urllib.parse import unquote
 
+from geo_cache import GeoCache
+from rate_limit import TokenBucket
+from canonical import dedup, fan_out, report_dedup
+from stream_io import read_table, write_table, export_table
+from bulk_extract import resolvable
+
 # ── CONFIGURACIÓN ─────────────────────────────────────────────
 
 FILE_IN  = "base_ina_datos_links_final.xlsx"     # archivo de entrada
-FILE_OUT = "base_ina_datos_links_expanded.xlsx"  # archivo de salida
+FILE_OUT = "base_ina_datos_links_expanded.parquet"  # salida intermedia (Parquet)
+EXPORT_BASE = "base_ina_datos_links_expanded"       # exportación opcional
+EXPORT_XLSX = False                                 # True → también .xlsx
 
 URL_COL      = "google_maps_url"  # nombre de la columna con las URLs
 TIMEOUT      = 20                # segundos máximos por página
-DELAY_BETWEEN = 1.0              # s de pausa entre peticiones (evita bloqueo)
 MAX_TRIES    = 2                 # reintentos en caso de fallo
 
-# ── CARGA EL DATAFRAME ───────────────────────────────────────
-df = pd.read_excel(FILE_IN)
+POOL_SIZE        = 3     # navegadores headless en paralelo
+PAGES_PER_DRIVER = 50    # páginas antes de reiniciar cada navegador
+RATE             = 1.0   # páginas/s en total (todos los navegadores)
+BURST            = 2     # ráfaga máxima permitida por el límite global
 
 # Expresión para detectar si la URL YA tiene @lat,lon
-PAT_COORDS = re.compile(r'@-?\d+\.\d+,-?\d+\.\d+')
+PAT_COORDS = re.compile(r'@(-?\d+\.\d+),(-?\d+\.\d+)')
 
 # ── CONFIGURA CHROME HEADLESS ────────────────────────────────
 chrome_opts = Options()
@@ -55,45 +71,171 @@ chrome_opts.add_argument("--no-sandbox")
 chrome_opts.add_argument("--window-size=1200,800")
 chrome_opts.add_argument("--lang=es-ES")
 
-driver = webdriver.Chrome(
-    service=Service(ChromeDriverManager().install()),
-    options=chrome_opts
-)
-wait = WebDriverWait(driver, TIMEOUT)
-
-# ── PROCESA FILA A FILA ──────────────────────────────────────
-for idx, url in tqdm(df[URL_COL].items(), total=len(df), desc="Expandiendo enlaces"):
-    url = str(url).strip()
-
-    # 1. Si ya contiene coordenadas, no hacemos nada
-    if PAT_COORDS.search(url):
-        continue
-
-    # 2. Intentamos abrir y capturar la URL final con @lat,lon
-    success = False
-    for attempt in range(1, MAX_TRIES + 1):
+_driver_path = None
+_driver_lock = threading.Lock()
+
+def make_driver() -> webdriver.Chrome:
+    """Arranca un Chrome headless (el chromedriver se descarga una sola vez)."""
+    global _driver_path
+    with _driver_lock:
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+    return webdriver.Chrome(service=Service(_driver_path), options=chrome_opts)
+
+
+def quit_driver(driver) -> None:
+    """Cierra un navegador que puede estar ya muerto sin propagar el error."""
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+def expand_one(driver, url: str) -> str:
+    """Abre `url` y espera a que la URL final contenga @lat,lon."""
+    driver.get(url)
+    # Espera a que la URL cambie y contenga el patrón @lat,lon
+    WebDriverWait(driver, TIMEOUT).until(lambda d: PAT_COORDS.search(d.current_url))
+    # Devolvemos la URL completa (decodificada para legibilidad)
+    return unquote(driver.current_url)
+
+
+def expand_urls(urls: dict, pool_size: int = POOL_SIZE,
+                pages_per_driver: int = PAGES_PER_DRIVER,
+                rate: float = RATE, burst: int = BURST,
+                cache: GeoCache | None = None,
+                desc: str = "Expandiendo enlaces",
+                timings: dict | None = None) -> dict:
+    """
+    Expande {idx: url} con un pool de navegadores; devuelve {idx: url_final}
+    (None si no se pudo). Los resultados se guardan en `cache` si se pasa.
+    Con `timings` (un dict) se anota en él {idx: segundos} de cada URL,
+    reintentos incluidos.
+
+    Ante cualquier error que no sea el timeout de la espera el navegador
+    se descarta y el siguiente intento arranca uno nuevo (con chromedriver
+    muerto Selenium ni siquiera lanza WebDriverException, sino el error de
+    conexión de urllib3). Si no se puede arrancar, la URL cuenta como fallo
+    y el hilo sigue con la cola.
+    """
+    work = queue.Queue()
+    for item in urls.items():
+        work.put(item)
+
+    limiter = TokenBucket(rate, burst)       # límite global compartido
+    results = {}
+    lock = threading.Lock()
+    bar = tqdm(total=len(urls), desc=desc, unit="url")
+    stats = {"ok": 0, "fallos": 0, "reinicios": 0, "sin_navegador": 0}
+
+    def _worker():
+        driver, pages = None, 0
         try:
-            driver.get(url)
-
-            # Espera a que la URL cambie y contenga el patrón @lat,lon
-            wait.until(lambda d: PAT_COORDS.search(d.current_url))
-
-            # Guardamos la URL completa (decodificada para legibilidad)
-            final_url = unquote(driver.current_url)
+            while True:
+                try:
+                    idx, url = work.get_nowait()
+                except queue.Empty:
+                    return
+
+                final_url = None
+                t0 = time.perf_counter()
+                for attempt in range(1, MAX_TRIES + 1):
+                    # Recicla el navegador para acotar el consumo de memoria
+                    if driver is not None and pages >= pages_per_driver:
+                        quit_driver(driver)
+                        driver = None
+                        with lock:
+                            stats["reinicios"] += 1
+                    if driver is None:
+                        try:
+                            driver, pages = make_driver(), 0
+                        except Exception as e:
+                            tqdm.write(f"⚠️  Fila {idx}: no se pudo arrancar Chrome ({e})")
+                            with lock:
+                                stats["sin_navegador"] += 1
+                            if attempt < MAX_TRIES:
+                                time.sleep(3)
+                            continue
+
+                    limiter.acquire()
+                    pages += 1
+                    try:
+                        final_url = expand_one(driver, url)
+                        break  # sale del bucle de reintentos
+                    except Exception as e:
+                        if not isinstance(e, TimeoutException):
+                            # Chrome muerto o sesión rota: el próximo intento usa uno nuevo
+                            quit_driver(driver)
+                            driver = None
+                        if attempt == MAX_TRIES:
+                            tqdm.write(f"⚠️  Fila {idx}: no se pudo expandir ({e})")
+                        else:
+                            time.sleep(3)  # espera antes de reintentar
+
+                if final_url is not None and cache is not None:
+                    lat, lon = map(float, PAT_COORDS.search(final_url).groups())
+                    cache.put_url(url, final_url, lat, lon, "selenium")
+
+                with lock:
+                    results[idx] = final_url
+                    if timings is not None:
+                        timings[idx] = time.perf_counter() - t0
+                    stats["ok" if final_url else "fallos"] += 1
+                    bar.set_postfix(stats, refresh=False)
+                    bar.update(1)
+        finally:
+            if driver is not None:
+                quit_driver(driver)
+
+    threads = [threading.Thread(target=_worker, daemon=True)
+               for _ in range(max(1, min(pool_size, len(urls))))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    bar.close()
+    return results
+
+
+if __name__ == "__main__":
+    # ── CARGA EL DATAFRAME ───────────────────────────────────────
+    df = read_table(FILE_IN)
+
+    # Caché compartida con los demás scripts (URLs ya expandidas antes)
+    cache = GeoCache()
+
+    # ── SELECCIONA LAS FILAS QUE NECESITAN NAVEGADOR ─────────────
+    # 1. Las que ya contienen coordenadas se descartan de una vez (vectorizado)
+    ya_resueltas = resolvable(df[URL_COL])
+    print(f"📍  {int(ya_resueltas.sum())} de {len(df)} URLs ya traen coordenadas")
+
+    pending = {}
+    for idx, url in df.loc[~ya_resueltas, URL_COL].items():
+        url = str(url).strip()
+        if not url or url == "nan":
+            continue
+
+        # 1b. Si ya la expandimos en una ejecución anterior, la reutilizamos
+        hit = cache.get_url(url)
+        if hit is not None and hit["final_url"]:
+            df.at[idx, URL_COL] = hit["final_url"]
+            continue
+
+        pending[idx] = url
+
+    # ── 2. DEDUPLICA: cada URL canónica se abre una sola vez ─────
+    groups, reps = dedup(pending)
+    report_dedup(len(pending), groups)
+
+    # ── 3. EXPANDE EN PARALELO CON EL POOL DE NAVEGADORES ────────
+    for idx, final_url in fan_out(groups, expand_urls(reps, cache=cache)).items():
+        if final_url is not None:
             df.at[idx, URL_COL] = final_url
-            success = True
-            break  # sale del bucle de reintentos
-
-        except Exception as e:
-            if attempt == MAX_TRIES:
-                print(f"⚠️  Fila {idx}: no se pudo expandir ({e})")
-            else:
-                time.sleep(3)  # espera antes de reintentar
-
-    time.sleep(DELAY_BETWEEN)  # pequeña pausa para no saturar a Google
 
-driver.quit()
+    cache.close()
 
-# ── GUARDA EL RESULTADO ─────────────────────────────────────
-df.to_excel(FILE_OUT, index=False)
-print(f"\n✅  Proceso terminado. Archivo guardado como: {FILE_OUT}")
+    # ── GUARDA EL RESULTADO ─────────────────────────────────────
+    write_table(df, FILE_OUT)
+    print(f"\n✅  Proceso terminado. Archivo guardado como: {FILE_OUT}")
+    for path in export_table(df, EXPORT_BASE, xlsx=EXPORT_XLSX):
+        print(f"   • {path}")
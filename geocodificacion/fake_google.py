@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+fake_google.py
+—————————————————————————————————
+Servidor HTTP local que imita a Google Maps, para medir los scripts sin
+salir a internet (bench_pipeline.py).
+
+    /maps/search/?api=1&query=<modo>-<n>
+        redir-…   → 302 a /maps/place/<query>/@lat,lon,17z
+        center-…  → 200, HTML con "center":{"lat":…,"lng":…}
+        appinit-… → 200, HTML con APP_INITIALIZATION_STATE=[[[lat,lon],…
+        none-…    → 200, HTML sin coordenadas (pasa a gazetteer/Nominatim)
+        js-…      → 200, HTML sin coordenadas que redirige con JavaScript
+                    a /maps/place/…/@lat,lon (solo lo resuelve Selenium)
+    /maps/place/…  → 200, página mínima
+    /search?q=…&format=json → respuesta tipo Nominatim
+
+Con probabilidad P_429 responde 429 y con P_CONSENT redirige a
+http://consent.localhost:<puerto>/ (usa transport.pin_host para que
+«consent.localhost» resuelva a 127.0.0.1). LATENCY_MS añade un retardo
+antes de cada respuesta.
+
+Las coordenadas dependen solo del texto de la consulta, así que cada
+resultado se puede comprobar.
+
+Uso
+───
+python fake_google.py --port 8800 --latency-ms 80 --p429 0.01
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, quote_plus
+
+PORT       = 8800
+LATENCY_MS = 50       # retardo medio por respuesta (± 50 %)
+P_429      = 0.0      # fracción de respuestas 429
+P_CONSENT  = 0.0      # fracción de redirecciones a la página de consentimiento
+HTML_KB    = 300      # tamaño aproximado de las páginas HTML
+
+FILLER = '<script>window.x=[null,"' + "a" * 120 + '",[1,2,3],{"k":"v"}];</script>\n'
+
+
+def coords_for(query: str) -> tuple[float, float]:
+    """Coordenadas deterministas dentro de la CDMX para `query`."""
+    h = int(hashlib.md5(query.encode("utf-8")).hexdigest()[:8], 16)
+    return round(19.20 + (h % 4000) / 10000, 6), round(-99.30 + (h // 4000 % 4000) / 10000, 6)
+
+
+def html_page(query: str, mode: str, kb: int = HTML_KB) -> bytes:
+    lat, lon = coords_for(query)
+    n = max(1, kb * 1024 // len(FILLER))
+    parts = [FILLER] * n
+    pos = int(hashlib.md5(query.encode()).hexdigest()[:4], 16) % n
+    if mode == "center":
+        parts.insert(pos, f'"center":{{"lat":{lat},"lng":{lon}}}')
+    elif mode == "appinit":
+        parts.insert(pos, f"window.APP_INITIALIZATION_STATE=[[[{lat},{lon}],[0,0,0]],")
+    elif mode == "js":
+        # Coordenadas partidas: ni la URL ni las regex del HTML las ven
+        target = f"/maps/place/{quote_plus(query)}/@' + '{lat},{lon},17z"
+        parts.insert(0, f"<script>setTimeout(function(){{location.replace('{target}')}}, 50);</script>\n")
+    return ("<html><head><title>Google Maps</title></head><body>"
+            + "".join(parts) + "</body></html>").encode("utf-8")
+
+
+class FakeGoogle(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"      # keep-alive, como el servicio real
+    latency_ms = LATENCY_MS
+    p_429 = P_429
+    p_consent = P_CONSENT
+    html_kb = HTML_KB
+
+    def _send(self, status: int, body: bytes = b"", ctype: str = "text/html; charset=utf-8",
+              headers: dict | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_GET(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000 * random.uniform(0.5, 1.5))
+        url = urlparse(self.path)
+        qs = parse_qs(url.query)
+        host = self.headers.get("Host", "")
+
+        if host.startswith("consent."):
+            return self._send(200, b"<html><form>Antes de ir a Google</form></html>")
+
+        if url.path.startswith("/maps/search"):
+            if random.random() < self.p_429:
+                return self._send(429, b"Too Many Requests", headers={"Retry-After": "1"})
+            if random.random() < self.p_consent:
+                port = self.server.server_address[1]
+                return self._send(302, headers={
+                    "Location": f"http://consent.localhost:{port}/ml?continue={quote_plus(self.path)}"})
+            query = qs.get("query", [""])[0]
+            mode = query.split("-", 1)[0]
+            if mode == "redir":
+                lat, lon = coords_for(query)
+                return self._send(302, headers={
+                    "Location": f"/maps/place/{quote_plus(query)}/@{lat},{lon},17z"})
+            return self._send(200, html_page(query, mode, self.html_kb))
+
+        if url.path.startswith("/maps/place"):
+            return self._send(200, b"<html><body>lugar</body></html>")
+
+        if url.path == "/search":                       # Nominatim
+            q = qs.get("q", [""])[0].split(",")[0]
+            lat, lon = coords_for(q)
+            body = [{"lat": str(lat), "lon": str(lon), "display_name": q,
+                     "place_id": 1, "boundingbox": [str(lat), str(lat), str(lon), str(lon)]}]
+            return self._send(200, json.dumps(body).encode(), "application/json")
+
+        self._send(404, b"not found")
+
+    do_HEAD = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Los clientes cortan la descarga a propósito (extract_from_stream)
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+def serve(port: int = PORT, latency_ms: float = LATENCY_MS, p_429: float = P_429,
+          p_consent: float = P_CONSENT, html_kb: int = HTML_KB,
+          background: bool = True) -> ThreadingHTTPServer:
+    """Arranca el servidor (en un hilo si `background`) y lo devuelve."""
+    handler = type("Handler", (FakeGoogle,), {
+        "latency_ms": latency_ms, "p_429": p_429, "p_consent": p_consent, "html_kb": html_kb})
+    server = _Server(("127.0.0.1", port), handler)
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    else:
+        server.serve_forever()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Google Maps de mentira para pruebas locales.")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS)
+    parser.add_argument("--p429", type=float, default=P_429)
+    parser.add_argument("--pconsent", type=float, default=P_CONSENT)
+    parser.add_argument("--html-kb", type=int, default=HTML_KB)
+    args = parser.parse_args()
+    print(f"🧪  Google falso en http://127.0.0.1:{args.port}  (Ctrl+C para parar)")
+    serve(args.port, args.latency_ms, args.p429, args.pconsent, args.html_kb, background=False)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+gazetteer.py
+—————————————————————————————————
+Geocodificador local (sin red) para la CDMX a partir de una tabla de
+calles, colonias y sitios de referencia.
+
+La tabla se carga una sola vez en memoria y se indexa por:
+    • texto normalizado completo (coincidencia exacta, O(1))
+    • trigramas de caracteres (índice invertido → similitud de Dice)
+
+Cada consulta devuelve (lat, lon, score, nombre) con 0 ≤ score ≤ 1.
+Si el score queda por debajo de MIN_SCORE conviene recurrir al
+geocodificador en red (Nominatim), que cuesta ≥ 1 s por consulta.
+
+Formato de entrada
+──────────────────
+CSV con columnas  nombre, latitud, longitud  (tipo opcional), o bien un
+GeoPackage/Shapefile con columna 'nombre' (requiere geopandas).
+"""
+
+import csv
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+GAZETTEER_FILE = "gazetteer_cdmx.csv"   # tabla local de la CDMX
+MIN_SCORE      = 0.75                   # por debajo → Nominatim
+
+# Palabras que no ayudan a distinguir lugares dentro de la CDMX
+STOPWORDS = {
+    "de", "la", "el", "los", "las", "del", "y", "en",
+    "cdmx", "mexico", "ciudad", "df", "d", "f",
+}
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sin acentos ni signos, sin palabras vacías."""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    tokens = [t for t in _NON_ALNUM.split(text) if t and t not in STOPWORDS]
+    return " ".join(tokens)
+
+
+def trigrams(norm: str) -> set[str]:
+    padded = f"  {norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Gazetteer:
+    """Índice en memoria nombre → coordenadas."""
+
+    def __init__(self, rows):
+        """`rows`: iterable de (nombre, lat, lon)."""
+        self.names: list[str] = []
+        self.coords: list[tuple[float, float]] = []
+        self.sizes: list[int] = []
+        self.exact: dict[str, int] = {}
+        self.index: dict[str, list[int]] = defaultdict(list)
+        for nombre, lat, lon in rows:
+            norm = normalize(nombre)
+            if not norm:
+                continue
+            i = len(self.names)
+            grams = trigrams(norm)
+            self.names.append(str(nombre))
+            self.coords.append((float(lat), float(lon)))
+            self.sizes.append(len(grams))
+            self.exact.setdefault(norm, i)
+            for g in grams:
+                self.index[g].append(i)
+
+    @classmethod
+    def load(cls, path: str = GAZETTEER_FILE) -> "Gazetteer":
+        """Carga un CSV (nombre, latitud, longitud) o una capa vectorial."""
+        if path.lower().endswith(".csv"):
+            with open(path, newline="", encoding="utf-8-sig") as fh:
+                rows = [(r["nombre"], r["latitud"], r["longitud"])
+                        for r in csv.DictReader(fh) if r["latitud"] and r["longitud"]]
+            return cls(rows)
+        import geopandas as gpd      # solo para .gpkg / .shp
+        gdf = gpd.read_file(path).to_crs(4326)
+        pts = gdf.geometry.representative_point()
+        return cls(zip(gdf["nombre"], pts.y, pts.x))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def lookup(self, query: str):
+        """Devuelve (lat, lon, score, nombre) del mejor candidato o None."""
+        norm = normalize(query)
+        if not norm:
+            return None
+        i = self.exact.get(norm)
+        if i is not None:
+            return (*self.coords[i], 1.0, self.names[i])
+
+        grams = trigrams(norm)
+        shared = Counter()
+        for g in grams:
+            postings = self.index.get(g)
+            if postings:
+                shared.update(postings)
+        if not shared:
+            return None
+        # Similitud de Dice entre conjuntos de trigramas
+        best, score = max(((i, 2 * n / (len(grams) + self.sizes[i]))
+                           for i, n in shared.items()), key=lambda t: t[1])
+        return (*self.coords[best], score, self.names[best])
+
+    def geocode(self, query: str, min_score: float = MIN_SCORE):
+        """(lat, lon) si el mejor candidato supera `min_score`; si no, None."""
+        hit = self.lookup(query)
+        if hit is not None and hit[2] >= min_score:
+            return hit[0], hit[1]
+        return None
+
+
+def load_default() -> Gazetteer | None:
+    """Carga GAZETTEER_FILE si existe (el modo offline es opcional)."""
+    if os.path.exists(GAZETTEER_FILE):
+        gaz = Gazetteer.load(GAZETTEER_FILE)
+        print(f"📚  Gazetteer local: {len(gaz)} lugares ({GAZETTEER_FILE})")
+        return gaz
+    return None
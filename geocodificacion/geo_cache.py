@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+geo_cache.py
+—————————————————————————————————
+Caché persistente URL/consulta → coordenadas, compartida por
+expand_google_links.py, geocode_via_google_redirect.py y
+geocode_google_v2.py.
+
+Se guarda en un SQLite local (CACHE_FILE). Cada entrada tiene:
+    • clave   : URL normalizada ("url:…") o texto de búsqueda ("query:…")
+    • final_url, latitud, longitud
+    • source  : redirect / html / gazetteer / nominatim / selenium
+    • ts      : momento en que se resolvió (para el TTL)
+
+Las entradas caducan tras TTL_DAYS y, si la tabla supera MAX_ENTRIES,
+se eliminan las menos usadas recientemente. Así, al relanzar un proceso
+tras un fallo o tras editar la hoja, solo se consultan las filas nuevas
+o modificadas.
+"""
+
+import sqlite3
+import threading
+import time
+
+from canonical import canonical_url as normalize_url, canonical_query as normalize_query
+
+CACHE_FILE  = "geocode_cache.sqlite"
+TTL_DAYS    = 90          # días antes de volver a consultar una URL
+MAX_ENTRIES = 500_000     # tope de filas; se expulsan las menos usadas
+
+SOURCES = ("redirect", "html", "gazetteer", "nominatim", "selenium")
+
+
+class GeoCache:
+    """Caché SQLite segura entre hilos (una conexión + candado)."""
+
+    def __init__(self, path: str = CACHE_FILE, ttl_days: float = TTL_DAYS,
+                 max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS geocache (
+                key        TEXT PRIMARY KEY,
+                final_url  TEXT,
+                latitud    REAL,
+                longitud   REAL,
+                source     TEXT,
+                ts         REAL,
+                last_used  REAL
+            )""")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS geocache_last_used ON geocache(last_used)")
+        self._conn.commit()
+        self.evict()
+
+    # ── lectura ──────────────────────────────────────────────
+    def _get(self, key: str) -> dict | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT final_url, latitud, longitud, source, ts FROM geocache WHERE key = ?",
+                (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[4] > self.ttl:
+                self._conn.execute("DELETE FROM geocache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE geocache SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return {"final_url": row[0], "latitud": row[1], "longitud": row[2],
+                "source": row[3], "ts": row[4]}
+
+    def get_url(self, url: str) -> dict | None:
+        return self._get("url:" + normalize_url(url))
+
+    def get_query(self, query: str) -> dict | None:
+        return self._get("query:" + normalize_query(query))
+
+    def lookup(self, url: str, query: str | None = None) -> dict | None:
+        """Busca primero por URL y, si no, por texto de búsqueda."""
+        hit = self.get_url(url)
+        if hit is None and query:
+            hit = self.get_query(query)
+        return hit
+
+    # ── escritura ────────────────────────────────────────────
+    def _put(self, key: str, final_url, lat, lon, source: str) -> None:
+        if source not in SOURCES:
+            raise ValueError(f"source desconocido: {source}")
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, final_url, lat, lon, source, now, now))
+            self._conn.commit()
+            self._puts += 1
+            check = self._puts % 1000 == 0
+        if check:
+            self.evict()
+
+    def put_url(self, url: str, final_url, lat, lon, source: str) -> None:
+        self._put("url:" + normalize_url(url), final_url, lat, lon, source)
+
+    def put_query(self, query: str, lat, lon, source: str) -> None:
+        if query:
+            self._put("query:" + normalize_query(query), None, lat, lon, source)
+
+    # ── mantenimiento ────────────────────────────────────────
+    def evict(self) -> None:
+        """Borra entradas caducadas y recorta a `max_entries` (LRU)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM geocache WHERE ts < ?", (time.time() - self.ttl,))
+            self._conn.execute("""
+                DELETE FROM geocache WHERE key IN (
+                    SELECT key FROM geocache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )""", (self.max_entries,))
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM geocache").fetchone()[0]
+
+    def close(self) -> None:
+        self.evict()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
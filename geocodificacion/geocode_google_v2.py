@@ -8,32 +8,45 @@ Created on Sun May 25 22:42:27 2025
 # geocode_google_v2.py
 # ----------------------------------------------------------
 # pip install pandas openpyxl requests tqdm geopy beautifulsoup4
+#
+# python geocode_google_v2.py            → empieza desde cero
+# python geocode_google_v2.py --resume   → retoma desde CKPT_FILE
+# python geocode_google_v2.py --dns-cache → caché DNS en memoria (todo el proceso)
 # ----------------------------------------------------------
 
-import re, time, json
+import re, time, json, argparse, codecs
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
 from geopy.geocoders import Nominatim
 from geopy.extra.rate_limiter import RateLimiter
 from urllib.parse import urlparse, parse_qs, unquote_plus
 from tqdm import tqdm
 
-FILE_IN  = "base_ina_datos_coord.xlsx"          # tu archivo actual
-FILE_OUT = "base_ina_datos_coord_full.xlsx"      # salida XLSX
-CSV_OUT  = "base_ina_datos_coord_full.csv"       # salida CSV
+from geo_cache import GeoCache
+from checkpoint import Checkpoint
+from gazetteer import load_default, MIN_SCORE
+from canonical import dedup, dedup_key, report_dedup
+from stream_io import read_table, write_table, export_table
+from scheduler import AdaptiveScheduler
+from transport import make_session, transport_report, add_dns_cache_option, enable_dns_cache
+from metrics import METRICS
 
-# ------------------------------------------------------------------
-# 1. Carga el dataframe
-# ------------------------------------------------------------------
-df = pd.read_excel(FILE_IN)
+FILE_IN  = "base_ina_datos_coord.parquet"        # salida de geocode_via_google_redirect.py
+FILE_OUT = "base_ina_datos_coord_full.parquet"   # salida (Parquet)
+
+EXPORT_BASE = "base_ina_datos_coord_full"   # exportación final opcional
+EXPORT_XLSX = False                         # True → también .xlsx
+EXPORT_CSV  = True                          # .csv para QGIS
 
-# 2. Prepara columnas vacías (por si no existían)
-for col in ("latitud", "longitud"):
-    if col not in df.columns:
-        df[col] = None
+CKPT_FILE       = "base_ina_datos_coord_full.checkpoint.csv"  # filas ya hechas
+CKPT_EVERY_ROWS = 200     # guarda el avance cada N filas…
+CKPT_EVERY_SECS = 60      # …o cada T segundos, lo que ocurra antes
 
-# 3. Sesión HTTP (cabecera de navegador)
+TRACE_FILE = "base_ina_datos_coord_full.trace.jsonl"  # un span por línea (JSON)
+
+# ------------------------------------------------------------------
+# 1. Sesión HTTP (cabecera de navegador)
+# ------------------------------------------------------------------
 HEADERS = {
     "User-Agent": (
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -42,17 +55,32 @@ HEADERS = {
     )
 }
 
-SESSION = requests.Session()
+# Bucle en serie: basta una conexión keep-alive por host
+SESSION = make_session(pool_size=1)
+
+# Bucle en serie: concurrencia 1, pero con pausa/backoff ante 429/captcha
+SCHEDULER = AdaptiveScheduler(max_concurrency=1)
 
-# 4. Geocoder de respaldo (Nominatim)
+# 2. Geocoder de respaldo (Nominatim)
 geolocator = Nominatim(user_agent="inah_centrog_historico")
 geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1)
 
-# 5. Expresiones regulares
+# 2b. Gazetteer local (opcional): responde sin red si el score ≥ MIN_SCORE
+GAZETTEER = load_default()
+
+# 3. Expresiones regulares
 RE_AT      = re.compile(r"@(-?\d+\.\d+),(-?\d+\.\d+)")
 RE_CENTER  = re.compile(r'"center":\s*{\s*"lat":\s*(-?\d+\.\d+),\s*"lng":\s*(-?\d+\.\d+)')
 RE_APPINIT = re.compile(r'APP_INITIALIZATION_STATE.*?\[(\[-?\d+\.\d+,-?\d+\.\d+)')
 
+# 3b. Lectura incremental del HTML (extract_from_stream)
+CHUNK_BYTES    = 16 * 1024         # bytes por bloque leído del socket
+WINDOW_CHARS   = 512               # solapamiento entre bloques (patrones partidos)
+APP_SPAN       = 4096              # máx. caracteres entre APP_INITIALIZATION_STATE y [[lat,lng
+MAX_HTML_BYTES = 4 * 1024 * 1024   # nunca leer más que esto
+RE_APPINIT_BOUNDED = re.compile(
+    r'APP_INITIALIZATION_STATE.{0,%d}?\[(\[-?\d+\.\d+,-?\d+\.\d+)' % APP_SPAN)
+
 def extract_from_html(html: str):
     """Intenta extraer lat/lon del HTML devuelto por Google Maps search."""
     # Método 1: bloque "center":{"lat":x,"lng":y}
@@ -63,58 +91,213 @@ def extract_from_html(html: str):
     # Método 2: APP_INITIALIZATION_STATE=… [[lat,lng],
     m = RE_APPINIT.search(html)
     if m:
-        lat, lon = map(float, m.group(1).split(','))
+        lat, lon = map(float, m.group(1).lstrip('[').split(','))
         return lat, lon
     return None, None
 
+def extract_from_stream(resp, chunk_bytes: int = CHUNK_BYTES):
+    """
+    Como extract_from_html, pero leyendo el cuerpo por bloques
+    (requiere `stream=True`) y cerrando la conexión en cuanto aparece
+    un patrón de coordenadas. Solo se guarda una ventana deslizante del
+    texto, así que la memoria y el coste de las regex no dependen del
+    tamaño de la página. Devuelve la primera coincidencia en el orden
+    del documento.
+    """
+    decoder = codecs.getincrementaldecoder(resp.encoding or "utf-8")(errors="replace")
+    buf = ""
+    read = 0
+    try:
+        for chunk in resp.iter_content(chunk_bytes):
+            read += len(chunk)
+            buf += decoder.decode(chunk)
+
+            # Método 1: bloque "center":{"lat":x,"lng":y}
+            m = RE_CENTER.search(buf)
+            if m:
+                return float(m.group(1)), float(m.group(2))
+
+            # Método 2: APP_INITIALIZATION_STATE=… [[lat,lng] (a distancia acotada)
+            m = RE_APPINIT_BOUNDED.search(buf)
+            if m:
+                lat, lon = map(float, m.group(1).lstrip('[').split(','))
+                return lat, lon
+
+            # Conserva solo la cola; si hay un APP_INITIALIZATION_STATE
+            # reciente, desde él (su [[lat,lng] puede llegar en el siguiente bloque)
+            keep = WINDOW_CHARS
+            p = buf.rfind("APP_INITIALIZATION_STATE")
+            if p != -1 and len(buf) - p <= APP_SPAN + WINDOW_CHARS:
+                keep = max(keep, len(buf) - p)
+            buf = buf[-keep:]
+
+            if read >= MAX_HTML_BYTES:
+                break
+    finally:
+        resp.close()      # corta la descarga: el resto del HTML no se lee
+    return None, None
+
 def query_from_url(url: str) -> str:
     """Devuelve el texto de búsqueda original de la URL /search/"""
     qs = parse_qs(urlparse(url).query)
     return unquote_plus(qs.get("query", [""])[0])
 
-# 6. Bucle principal
-for idx, row in tqdm(df.iterrows(), total=len(df)):
-    if pd.notna(row["latitud"]) and pd.notna(row["longitud"]):
-        continue  # ya tiene coordenadas
+def resolve_row(url: str, cache: GeoCache | None = None):
+    """
+    Resuelve una URL de Google Maps y devuelve (lat, lon, source).
 
-    url = str(row["google_maps_url"]).strip()
-    if not url:
-        continue
+    Orden: redirección con @lat,lon → HTML → gazetteer local →
+    Nominatim. `source` es "redirect", "html", "gazetteer" o
+    "nominatim"; None si no se obtuvo nada. Si se pasa `cache`, el
+    resultado se guarda en ella.
+    """
+    query = query_from_url(url)
+    lat = lon = source = final_url = None
 
-    lat = lon = None
-
-    try:
-        resp = SESSION.get(url, headers=HEADERS, allow_redirects=True, timeout=15)
+    with METRICS.span("redirect") as span:
+        resp, outcome = SCHEDULER.request(
+            lambda: SESSION.get(url, headers=HEADERS, allow_redirects=True, timeout=15, stream=True),
+            url=url)
+        span["clase"] = outcome
+    blocked = resp is None or outcome not in ("ok", "no_coords")
+    if not blocked:
         final_url = resp.url
 
-        # 6.1 Caso 1: redirección con @lat,lon
-        m = RE_AT.search(final_url)
-        if m:
-            lat, lon = map(float, m.groups())
-        else:
-            # 6.2 Caso 2: buscar en el HTML
-            lat, lon = extract_from_html(resp.text)
-
-        # 6.3 Caso 3: geocodificar con Nominatim (solo si no obtuvimos nada)
-        if lat is None or lon is None:
-            query = query_from_url(url)
-            if query:
+    # Caso 1: redirección con @lat,lon
+    with METRICS.span("regex"):
+        m = RE_AT.search(final_url) if not blocked else None
+    if m:
+        lat, lon = map(float, m.groups())
+        source = "redirect"
+        resp.close()      # el cuerpo no hace falta
+    elif not blocked:
+        # Caso 2: buscar en el HTML (lectura incremental, corta al encontrar)
+        with METRICS.span("html"):
+            lat, lon = extract_from_stream(resp)
+        if lat is not None:
+            source = "html"
+
+    # Caso 3: gazetteer local, sin red (solo si hay buena coincidencia)
+    if (lat is None or lon is None) and query and GAZETTEER is not None:
+        with METRICS.span("gazetteer"):
+            hit = GAZETTEER.geocode(query, MIN_SCORE)
+        if hit is not None:
+            lat, lon = hit
+            source = "gazetteer"
+
+    # Caso 4: geocodificar con Nominatim (solo si no obtuvimos nada)
+    if lat is None or lon is None:
+        if query:
+            with METRICS.span("nominatim"):
                 loc = geocode(query + ", CDMX, México")
-                if loc:
-                    lat, lon = loc.latitude, loc.longitude
+            if loc:
+                lat, lon = loc.latitude, loc.longitude
+                source = "nominatim"
+
+    METRICS.count(f"fuente.{source or 'ninguna'}")
+    if cache is not None and source is not None:
+        cache.put_url(url, final_url, lat, lon, source)
+        if source in ("gazetteer", "nominatim"):
+            cache.put_query(query, lat, lon, source)
+    return lat, lon, source
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Geocodifica las URLs de Google Maps.")
+    parser.add_argument("--resume", action="store_true",
+                        help=f"retoma las filas ya guardadas en {CKPT_FILE}")
+    add_dns_cache_option(parser)
+    args = parser.parse_args()
+    if args.dns_cache:
+        enable_dns_cache()
+
+    # 4. Carga el dataframe
+    df = read_table(FILE_IN)
+
+    # 5. Prepara columnas vacías (por si no existían)
+    for col in ("latitud", "longitud"):
+        if col not in df.columns:
+            df[col] = float("nan")
+
+    # 6. Bucle principal (con puntos de control periódicos)
+    ckpt = Checkpoint(CKPT_FILE, every_rows=CKPT_EVERY_ROWS, every_secs=CKPT_EVERY_SECS)
+    if args.resume:
+        print(f"↺  Reanudando: {len(ckpt.load())} filas recuperadas de {CKPT_FILE}")
+
+    # Filas con la misma URL/consulta canónica se resuelven una sola vez
+    groups, _ = dedup(df["google_maps_url"].to_dict())
+    report_dedup(len(df), groups)
+    resolved = {}      # clave canónica → (lat, lon) ya obtenidos en esta ejecución
+    METRICS.open_trace(TRACE_FILE)
+
+    cache = GeoCache()
+    try:
+        for idx, row in tqdm(df.iterrows(), total=len(df)):
+            if pd.notna(row["latitud"]) and pd.notna(row["longitud"]):
+                continue  # ya tiene coordenadas
+
+            url = str(row["google_maps_url"]).strip()
+            if not url:
+                continue
+
+            # 6.0 Ya hecha antes de la interrupción (--resume)
+            prev = ckpt.done(idx, url)
+            if prev is not None:
+                df.at[idx, "latitud"], df.at[idx, "longitud"] = prev
+                continue
+
+            # 6.1 Duplicado de una fila ya resuelta en esta ejecución
+            key = dedup_key(url)
+            if key in resolved:
+                df.at[idx, "latitud"], df.at[idx, "longitud"] = resolved[key]
+                ckpt.record(idx, url, *resolved[key])
+                METRICS.count("duplicado")
+                continue
+
+            # 6.2 Ya resuelta en una ejecución anterior: sin petición
+            hit = cache.lookup(url, query_from_url(url))
+            if hit is not None:
+                df.at[idx, "latitud"]  = hit["latitud"]
+                df.at[idx, "longitud"] = hit["longitud"]
+                ckpt.record(idx, url, hit["latitud"], hit["longitud"])
+                METRICS.count("cache")
+                continue
+
+            lat = lon = None
 
-    except Exception as e:
-        print(f"⚠️  [{idx}] Error con URL → {e}")
+            try:
+                with METRICS.row(idx), METRICS.span("fila"):
+                    lat, lon, _ = resolve_row(url, cache)
+            except Exception as e:
+                METRICS.count("error")
+                print(f"⚠️  [{idx}] Error con URL → {e}")
 
-    df.at[idx, "latitud"]  = lat
-    df.at[idx, "longitud"] = lon
+            df.at[idx, "latitud"]  = lat
+            df.at[idx, "longitud"] = lon
+            ckpt.record(idx, url, lat, lon)
+            if lat is not None:
+                resolved[key] = (lat, lon)
 
-    time.sleep(1)        # respeta 1 req/s hacia Google
+            with METRICS.span("sleep"):
+                time.sleep(1)    # respeta 1 req/s hacia Google
+    except KeyboardInterrupt:
+        print(f"\n⏸  Interrumpido: avance guardado en {CKPT_FILE}. Usa --resume para continuar.")
+        raise SystemExit(130)
+    finally:
+        ckpt.flush()     # también ante un error inesperado
+        cache.close()
+        SCHEDULER.summary()
+        transport_report(SESSION)
+        METRICS.summary()
+        METRICS.close_trace()
 
-# 7. Guarda resultados
-df.to_excel(FILE_OUT, index=False)
-df.to_csv(CSV_OUT, index=False, encoding="utf-8-sig")
-print("\n✅  Archivo completo generado:")
-print("   •", FILE_OUT)
-print("   •", CSV_OUT)
-print("   Importa el CSV en QGIS → Añadir capa de texto delimitado (X=longitud, Y=latitud, EPSG:4326).")
+    # 7. Guarda resultados
+    write_table(df, FILE_OUT)
+    exported = export_table(df, EXPORT_BASE, xlsx=EXPORT_XLSX, csv=EXPORT_CSV)
+    print("\n✅  Archivo completo generado:")
+    for path in [FILE_OUT, *exported]:
+        print("   •", path)
+    if EXPORT_CSV:
+        print("   Importa el CSV en QGIS → Añadir capa de texto delimitado (X=longitud, Y=latitud, EPSG:4326).")
+    print(f"   O cárgalo en PostGIS: python load_postgis.py {FILE_OUT}")
+    ckpt.remove()
@@ -11,31 +11,50 @@ geocode_via_google_redirect.py
 Lee la columna 'google_maps_url', sigue la redirección de Google
 y extrae latitud / longitud que aparecen después de '@'.
 
+Las URLs se resuelven en paralelo (MAX_WORKERS hilos) pero bajo un
+límite *token bucket* por host: RATE peticiones/s sostenidas con ráfagas
+de hasta BURST. El rendimiento queda acotado por el límite, no por la
+latencia de cada redirección. Si Google responde con 429, captcha o
+consentimiento, scheduler.py reduce la concurrencia, pausa y reintenta.
+
 ⚠️  Respeta el servicio:
-    • Máx. ~1 petición por segundo (Google puede bloquear IPs).
+    • Ajusta RATE/BURST con prudencia (Google puede bloquear IPs).
     • Usa un User-Agent "humano".
 """
 
 import re
-import time
-import pandas as pd
+import argparse
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse, parse_qs, unquote_plus
 from tqdm import tqdm
 
+from rate_limit import HostRateLimiter
+from scheduler import AdaptiveScheduler
+from geo_cache import GeoCache
+from canonical import dedup, fan_out, report_dedup
+from stream_io import read_table, write_table, export_table
+from bulk_extract import prefill
+from transport import (make_session, transport_report, http2_available, fetch_final_urls_http2,
+                       add_dns_cache_option, enable_dns_cache)
+from metrics import METRICS
+
 # 1. CONFIGURA TU ARCHIVO
-FILE_IN  = "base_ina_datos_links_expanded.xlsx"   # ← tu archivo
-FILE_OUT = "base_ina_datos_coord.xlsx"         # salida Excel
-CSV_OUT  = "base_ina_datos_coord.csv"          # salida CSV
+FILE_IN  = "base_ina_datos_links_expanded.parquet"   # ← salida de expand_google_links.py
+FILE_OUT = "base_ina_datos_coord.parquet"           # salida intermedia (Parquet)
 
-# 2. CARGA EL DATAFRAME
-df = pd.read_excel(FILE_IN)
+EXPORT_BASE = "base_ina_datos_coord"   # exportación final opcional
+EXPORT_XLSX = False                    # True → también .xlsx
+EXPORT_CSV  = False                    # True → también .csv (QGIS)
+TRACE_FILE  = "base_ina_datos_coord.trace.jsonl"   # un span por línea (JSON)
 
-# 3. Prepara columnas vacías
-df["latitud"]  = None
-df["longitud"] = None
+# 2. CONCURRENCIA Y LÍMITE DE PETICIONES
+MAX_WORKERS = 8       # peticiones simultáneas en vuelo
+RATE        = 5.0     # peticiones/s sostenidas por host
+BURST       = 10      # ráfaga máxima por host
+USE_HTTP2   = False   # True → cliente asíncrono HTTP/2 (requiere httpx[http2])
 
-# 4. Cabecera para que parezca un navegador
+# 3. Cabecera para que parezca un navegador
 HEADERS = {
     "User-Agent": (
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -44,38 +63,152 @@ HEADERS = {
     )
 }
 
-# 5. Función auxiliar
+# 4. Funciones auxiliares
 COORD_RE = re.compile(r"@(-?\d+\.\d+),(-?\d+\.\d+)")
 
-def get_coords(url: str, session: requests.Session) -> tuple[float | None, float | None]:
-    """ Sigue redirecciones y devuelve (lat, lon) o (None, None). """
+def resolve_url(url: str, session: requests.Session,
+                scheduler: AdaptiveScheduler | None = None,
+                limiter: HostRateLimiter | None = None) -> tuple[str | None, float | None, float | None]:
+    """ Sigue redirecciones y devuelve (url_final, lat, lon).
+
+    Con `scheduler`, la petición pasa por el control adaptativo
+    (pausas y reintentos ante bloqueos de Google); con `limiter`, cada
+    intento (reintentos incluidos) respeta la tasa por host.
+    """
     try:
         # 'allow_redirects=True' para que requests siga hasta la URL final
-        resp = session.get(url, headers=HEADERS, allow_redirects=True, timeout=15)
+        get = lambda: session.get(url, headers=HEADERS, allow_redirects=True, timeout=15)
+        if scheduler is None:
+            resp = get()
+        else:
+            resp, outcome = scheduler.request(get, url=url, limiter=limiter)
+            if resp is None or outcome not in ("ok", "no_coords"):
+                return None, None, None
         final_url = resp.url
         match = COORD_RE.search(final_url)
         if match:
             lat, lon = map(float, match.groups())
-            return lat, lon
+            return final_url, lat, lon
+        return final_url, None, None
     except Exception as e:
         print(f"  ⚠️  Error con {url[:60]}… → {e}")
-    return None, None
+    return None, None, None
+
+def get_coords(url: str, session: requests.Session) -> tuple[float | None, float | None]:
+    """ Sigue redirecciones y devuelve (lat, lon) o (None, None). """
+    _, lat, lon = resolve_url(url, session)
+    return lat, lon
+
+
+_session = None
+
+def shared_session() -> requests.Session:
+    """
+    Sesión única para todos los hilos, con MAX_WORKERS conexiones
+    keep-alive por host (transport.make_session). Antes había una sesión
+    por hilo y cada una abría sus propias conexiones TLS.
+    """
+    global _session
+    if _session is None:
+        _session = make_session(pool_size=MAX_WORKERS)
+    return _session
 
 
-# 6. PROCESA FILA A FILA (1 req/s aprox.)
-with requests.Session() as session:
-    for idx, url in tqdm(df["google_maps_url"].items(), total=len(df)):
-        lat, lon = get_coords(url, session)
+def resolve_all(urls: dict, max_workers: int = MAX_WORKERS,
+                rate: float = RATE, burst: int = BURST, desc: str | None = None,
+                cache: GeoCache | None = None) -> dict:
+    """
+    Resuelve {idx: url} en paralelo y devuelve {idx: (lat, lon)}.
+
+    Antes de nada las URLs se canonicalizan y deduplican: cada clave
+    única se resuelve una vez y el resultado se reparte a sus filas.
+    Cada hilo pide una ficha al limitador del host antes de llamar a
+    `resolve_url`, así que nunca se superan `rate` req/s por host aunque
+    haya `max_workers` peticiones en vuelo. Si se pasa `cache`, las URLs
+    ya resueltas en ejecuciones anteriores no generan ninguna petición.
+    """
+    limiter = HostRateLimiter(rate=rate, burst=burst)
+    scheduler = AdaptiveScheduler(max_concurrency=max_workers)
+    groups, reps = dedup(urls)
+    report_dedup(len(urls), groups)
+
+    results = {}
+    pending = {}
+    for key, url in reps.items():
+        hit = cache.get_url(url) if cache is not None else None
+        if hit is not None:
+            results[key] = (hit["latitud"], hit["longitud"])
+        else:
+            pending[key] = url
+    if cache is not None and results:
+        print(f"   ↺ {len(results)} claves tomadas de la caché ({cache.path})")
+
+    if pending and USE_HTTP2 and http2_available():
+        # Todas las URLs multiplexadas sobre una conexión HTTP/2; sin el
+        # planificador adaptativo (los bloqueos quedan como None)
+        finals = fetch_final_urls_http2(pending, HEADERS, concurrency=max_workers, limiter=limiter)
+        for key, final_url in finals.items():
+            m = COORD_RE.search(final_url or "")
+            lat, lon = map(float, m.groups()) if m else (None, None)
+            if cache is not None and lat is not None:
+                cache.put_url(pending[key], final_url, lat, lon, "redirect")
+            results[key] = (lat, lon)
+        return fan_out(groups, results)
+
+    def _task(key, url):
+        with METRICS.row(key):
+            # El límite por host lo pide el scheduler antes de cada intento
+            with METRICS.span("redirect") as span:
+                final_url, lat, lon = resolve_url(url, shared_session(), scheduler, limiter)
+                span["ok"] = lat is not None
+        METRICS.count("fuente.redirect" if lat is not None else "fuente.ninguna")
+        if cache is not None and lat is not None:
+            cache.put_url(url, final_url, lat, lon, "redirect")
+        return lat, lon
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(_task, key, url): key for key, url in pending.items()}
+        for fut in tqdm(as_completed(futures), total=len(futures), desc=desc):
+            results[futures[fut]] = fut.result()
+    if pending:
+        scheduler.summary()
+        transport_report(shared_session())
+        METRICS.summary()
+    return fan_out(groups, results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Geocodifica siguiendo la redirección de Google Maps.")
+    add_dns_cache_option(parser)
+    args = parser.parse_args()
+    if args.dns_cache:
+        enable_dns_cache()
+
+    # 5. CARGA EL DATAFRAME
+    df = read_table(FILE_IN)
+
+    # 6. Coordenadas que ya vienen en la URL (@lat,lon o !3d…!4d…), sin red
+    pre = prefill(df["google_maps_url"])
+    df["latitud"]  = pre["latitud"]
+    df["longitud"] = pre["longitud"]
+    sin_coords = df["latitud"].isna()
+    print(f"📍  {int((~sin_coords).sum())} de {len(df)} filas resueltas desde la propia URL")
+
+    # 7. RESUELVE EN PARALELO SOLO EL RESTO (limitado por RATE/BURST por host)
+    METRICS.open_trace(TRACE_FILE)
+    with GeoCache() as cache:
+        coords = resolve_all(df.loc[sin_coords, "google_maps_url"].to_dict(), cache=cache)
+    METRICS.close_trace()
+    for idx, (lat, lon) in coords.items():
         df.at[idx, "latitud"]  = lat
         df.at[idx, "longitud"] = lon
-        time.sleep(1)        # <<— respeta el límite; ajusta si hace falta
-
 
-# 7. GUARDA RESULTADOS
-df.to_excel(FILE_OUT, index=False)
-df.to_csv(CSV_OUT, index=False, encoding="utf-8-sig")
+    # 8. GUARDA RESULTADOS
+    write_table(df, FILE_OUT)
+    exported = export_table(df, EXPORT_BASE, xlsx=EXPORT_XLSX, csv=EXPORT_CSV)
 
-print("\n✅  Listo:")
-print(f"   • {FILE_OUT}")
-print(f"   • {CSV_OUT}")
-print("   Importa el CSV en QGIS ‘Añadir capa de texto delimitado’ X=longitud Y=latitud (EPSG:4326).")
+    print("\n✅  Listo:")
+    for path in [FILE_OUT, *exported]:
+        print(f"   • {path}")
+    if EXPORT_CSV:
+        print("   Importa el CSV en QGIS ‘Añadir capa de texto delimitado’ X=longitud Y=latitud (EPSG:4326).")
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+load_postgis.py
+—————————————————————————————————
+Carga los inmuebles geocodificados en PostGIS, junto a subs.lotes_b_subs,
+sin pasar por el CSV + «Añadir capa de texto delimitado» de QGIS.
+
+1. Lee FILE_IN por bloques de BATCH_ROWS filas (stream_io.iter_chunks).
+2. Cada bloque entra con COPY … FROM STDIN (formato CSV) a una tabla
+   temporal: una sola orden por bloque, sin INSERT fila a fila.
+3. Desde la temporal se hace el upsert en TABLE (clave KEY_COL, o la
+   columna de --key) y la geometría se construye en el servidor:
+       ST_SetSRID(ST_MakePoint(longitud, latitud), 4326)
+4. El índice GIST sobre geom se borra antes de cargar y se crea al
+   final (más rápido que actualizarlo fila a fila), seguido de ANALYZE.
+
+Uso
+───
+python load_postgis.py                    # FILE_IN → TABLE
+python load_postgis.py otro.parquet
+python load_postgis.py --keep-index       # carga pequeña: no rehace el índice
+python load_postgis.py --key google_maps_url   # otra columna como clave del upsert
+"""
+
+import argparse
+import io
+import os
+import time
+
+import pandas as pd
+import psycopg2
+from psycopg2 import sql
+
+from stream_io import iter_chunks
+
+FILE_IN = "base_ina_datos_coord_validado.parquet"   # o base_ina_datos_coord_full.parquet
+
+TABLE      = ("subs", "inah_inmuebles")   # esquema, tabla destino
+KEY_COL    = "clave"                      # clave del inmueble (upsert); --key la cambia
+BATCH_ROWS = 5_000                        # filas por COPY
+
+# Columnas que se cargan (si existen en FILE_IN) y su tipo en PostgreSQL
+COLUMNS = {
+    "clave":           "text",
+    "nombre":          "text",
+    "direccion":       "text",
+    "google_maps_url": "text",
+    "latitud":         "double precision",
+    "longitud":        "double precision",
+    "validacion":      "text",
+    "alcaldia_geo":    "text",
+    "colonia_geo":     "text",
+}
+
+# Conexión a PostgreSQL (misma base que script_python/)
+db_config = {
+    'host': 'localhost',
+    'database': 'practica01',
+    'user': 'postgres',
+    'password': 'postgres',
+    'port': '5432'
+}
+
+STAGING = "_inah_carga"
+
+
+def _table() -> sql.Identifier:
+    return sql.Identifier(*TABLE)
+
+
+def _index() -> sql.Identifier:
+    return sql.Identifier(TABLE[0], f"{TABLE[1]}_geom_gix")
+
+
+def _type(col: str) -> str:
+    return COLUMNS.get(col, "text")       # una clave fuera de COLUMNS se carga como texto
+
+
+def create_table(cursor, cols: list[str], key: str = KEY_COL) -> None:
+    """Tabla destino (si no existe) y tabla temporal de carga."""
+    defs = sql.SQL(", ").join(
+        sql.SQL("{} {}").format(sql.Identifier(c), sql.SQL(_type(c))) for c in cols)
+    cursor.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(TABLE[0])))
+    cursor.execute(sql.SQL("""
+        CREATE TABLE IF NOT EXISTS {tabla} (
+            {defs},
+            geom geometry(Point, 4326),
+            actualizado timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY ({key})
+        )""").format(tabla=_table(), defs=defs, key=sql.Identifier(key)))
+    cursor.execute(sql.SQL("CREATE TEMP TABLE IF NOT EXISTS {} ({})").format(
+        sql.Identifier(STAGING), defs))
+
+
+def upsert_sql(cols: list[str], key: str = KEY_COL) -> sql.Composed:
+    """INSERT … SELECT desde la temporal con geometría y ON CONFLICT."""
+    ids = sql.SQL(", ").join(map(sql.Identifier, cols))
+    updates = sql.SQL(", ").join(
+        sql.SQL("{c} = EXCLUDED.{c}").format(c=sql.Identifier(c)) for c in cols if c != key)
+    return sql.SQL("""
+        INSERT INTO {tabla} ({ids}, geom)
+        SELECT DISTINCT ON ({key}) {ids},
+               CASE WHEN latitud IS NOT NULL AND longitud IS NOT NULL
+                    THEN ST_SetSRID(ST_MakePoint(longitud, latitud), 4326) END
+        FROM {stg}
+        WHERE {key} IS NOT NULL
+        ORDER BY {key}
+        ON CONFLICT ({key}) DO UPDATE
+        SET {updates}, geom = EXCLUDED.geom, actualizado = now()
+    """).format(tabla=_table(), ids=ids, key=sql.Identifier(key),
+                stg=sql.Identifier(STAGING), updates=updates)
+
+
+def copy_batch(cursor, df: pd.DataFrame, cols: list[str]) -> None:
+    """COPY del bloque a la temporal (NaN → NULL: campo vacío sin comillas)."""
+    buf = io.StringIO()
+    df[cols].to_csv(buf, header=False, index=False)
+    buf.seek(0)
+    cursor.execute(sql.SQL("TRUNCATE {}").format(sql.Identifier(STAGING)))
+    cursor.copy_expert(
+        sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+            sql.Identifier(STAGING), sql.SQL(", ").join(map(sql.Identifier, cols))),
+        buf)
+
+
+def load(path: str, config: dict = db_config, batch_rows: int = BATCH_ROWS,
+         rebuild_index: bool = True, key: str = KEY_COL, connect=psycopg2.connect) -> int:
+    """Carga `path` en TABLE con `key` como clave; devuelve las filas enviadas."""
+    conn = connect(**config)
+    sent = 0
+    try:
+        with conn.cursor() as cursor:
+            cols = None
+            # La clave se lee como texto: «123», no «123.0» de una columna con huecos
+            for chunk in iter_chunks(path, batch_rows, dtype={key: str}):
+                if cols is None:
+                    cols = [key] + [c for c in COLUMNS if c in chunk.columns and c != key]
+                    missing = {key, "latitud", "longitud"} - set(chunk.columns)
+                    if missing:
+                        raise ValueError(f"{path} no tiene las columnas {sorted(missing)}"
+                                         f" (la clave se elige con --key)")
+                    create_table(cursor, cols, key)
+                    if rebuild_index:
+                        cursor.execute(sql.SQL("DROP INDEX IF EXISTS {}").format(_index()))
+                    conn.commit()
+                    upsert = upsert_sql(cols, key)
+
+                copy_batch(cursor, chunk, cols)
+                cursor.execute(upsert)
+                conn.commit()            # cada bloque queda guardado aunque falle el siguiente
+                sent += len(chunk)
+                print(f"   💾 {sent} filas cargadas")
+
+            if cols is not None:
+                t0 = time.perf_counter()
+                cursor.execute(sql.SQL(
+                    "CREATE INDEX IF NOT EXISTS {} ON {} USING GIST (geom)").format(
+                        sql.Identifier(f"{TABLE[1]}_geom_gix"), _table()))
+                cursor.execute(sql.SQL("ANALYZE {}").format(_table()))
+                conn.commit()
+                print(f"   🗂️  Índice espacial listo en {time.perf_counter() - t0:.1f}s")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return sent
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga los inmuebles geocodificados en PostGIS.")
+    parser.add_argument("path", nargs="?", default=FILE_IN)
+    parser.add_argument("--keep-index", action="store_true",
+                        help="no borra el índice GIST antes de cargar")
+    parser.add_argument("--key", default=KEY_COL,
+                        help=f"columna única de FILE_IN para el upsert (por defecto {KEY_COL})")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        raise SystemExit(f"⚠️  No existe {args.path}")
+
+    t0 = time.perf_counter()
+    try:
+        n = load(args.path, rebuild_index=not args.keep_index, key=args.key)
+    except psycopg2.Error as e:
+        raise SystemExit(f"Error al conectar a PostgreSQL: {e}")
+    print(f"\n✅  {n} filas en {'.'.join(TABLE)} ({time.perf_counter() - t0:.1f}s)")
+    print("   En QGIS: Capa → Añadir capa PostGIS (geometría 'geom', EPSG:4326).")
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+metrics.py
+—————————————————————————————————
+Métricas de una corrida de geocodificación.
+
+    • span(etapa)  → mide cuánto tarda una etapa (redirect, html, regex,
+                     gazetteer, nominatim, sleep, dns, ttfb…)
+    • count(nombre) → contadores: aciertos por método, respuestas por
+                     clase, reintentos…
+    • row(idx)     → marca la fila en curso del hilo; los spans que se
+                     abran dentro llevan su índice en la traza
+    • summary()    → tabla final con n, p50/p95/p99 y total por etapa
+
+Si se abre una traza (open_trace), cada span se escribe como una línea
+JSON: {"t": …, "fila": …, "etapa": …, "ms": …, …}. Se lee con
+pandas.read_json(ruta, lines=True).
+
+Uso
+───
+from metrics import METRICS
+METRICS.open_trace("corrida.trace.jsonl")
+with METRICS.row(idx), METRICS.span("redirect"):
+    …
+METRICS.summary()
+"""
+
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class Metrics:
+    """Spans y contadores seguros entre hilos, con traza JSON-lines opcional."""
+
+    def __init__(self):
+        self.durations = defaultdict(list)     # etapa → [segundos]
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._trace = None
+
+    # ── traza ───────────────────────────────────────────────
+    def open_trace(self, path: str) -> None:
+        self.close_trace()
+        self._trace = open(path, "w", encoding="utf-8")
+        self.trace_path = path
+
+    def close_trace(self) -> None:
+        if self._trace is not None:
+            self._trace.close()
+            self._trace = None
+
+    # ── registro ────────────────────────────────────────────
+    @contextmanager
+    def row(self, idx):
+        prev = getattr(self._local, "row", None)
+        self._local.row = idx
+        try:
+            yield
+        finally:
+            self._local.row = prev
+
+    def observe(self, stage: str, seconds: float, **attrs) -> None:
+        with self._lock:
+            self.durations[stage].append(seconds)
+            if self._trace is not None:
+                rec = {"t": round(time.time(), 3), "fila": getattr(self._local, "row", None),
+                       "etapa": stage, "ms": round(seconds * 1000, 3), **attrs}
+                self._trace.write(json.dumps(rec, default=str) + "\n")
+
+    @contextmanager
+    def span(self, stage: str, **attrs):
+        t0 = time.perf_counter()
+        try:
+            yield attrs          # el bloque puede añadir atributos (p. ej. ok=True)
+        finally:
+            self.observe(stage, time.perf_counter() - t0, **attrs)
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += n
+
+    # ── resumen ─────────────────────────────────────────────
+    def summary(self) -> None:
+        if not self.durations and not self.counters:
+            return
+        print("⏱️  Tiempo por etapa (ms)")
+        print(f"   {'etapa':<12} {'n':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'total s':>9}")
+        with self._lock:
+            stages = sorted(self.durations.items(), key=lambda kv: -sum(kv[1]))
+            counters = sorted(self.counters.items())
+        for stage, values in stages:
+            ms = np.asarray(values) * 1000
+            p50, p95, p99 = np.percentile(ms, (50, 95, 99))
+            print(f"   {stage:<12} {len(ms):>7} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f} "
+                  f"{ms.sum() / 1000:>9.1f}")
+        if counters:
+            print("🔢  " + ", ".join(f"{k}={v}" for k, v in counters))
+        if self._trace is not None:
+            self._trace.flush()
+            print(f"   Traza: {self.trace_path}")
+
+
+# Instancia compartida por todos los módulos de la corrida
+METRICS = Metrics()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+rate_limit.py
+—————————————————————————————————
+Limitador de peticiones tipo *token bucket* compartido por los scripts
+de geocodificación.
+
+Cada host tiene su propia cubeta: se rellena a `rate` fichas por segundo
+y admite ráfagas de hasta `burst` peticiones. Es seguro entre hilos, de
+modo que varios *workers* pueden pedir fichas a la vez sin superar el
+límite global por host.
+
+Uso
+───
+limiter = HostRateLimiter(rate=5, burst=10)
+limiter.acquire(url)      # bloquea hasta que haya ficha para ese host
+"""
+
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """Cubeta de fichas: `rate` fichas/s sostenidas, ráfaga máx. `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        if rate <= 0:
+            raise ValueError("rate debe ser > 0")
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self) -> float:
+        """Toma una ficha si la hay; si no, devuelve los segundos a esperar."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self) -> None:
+        """Bloquea hasta obtener una ficha."""
+        while True:
+            wait = self.try_acquire()
+            if wait == 0.0:
+                return
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """Una `TokenBucket` por host (www.google.com, maps.app.goo.gl, …)."""
+
+    def __init__(self, rate: float = 5.0, burst: int = 10):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return self._buckets[host]
+
+    def acquire(self, url: str) -> None:
+        self.bucket(url).acquire()
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+resolve_tiered.py
+—————————————————————————————————
+Punto de entrada único para geocodificar la columna 'google_maps_url'
+gastando lo mínimo en cada fila. Se prueba, en orden:
+
+    1. url       → @lat,lon ya presente en la propia URL (sin red)
+    2. redirect  → seguir la redirección HTTP de Google
+    3. html      → "center"/APP_INITIALIZATION_STATE en el HTML
+    4. gazetteer → texto de búsqueda en la tabla local de la CDMX (sin red)
+    5. nominatim → texto de búsqueda (query=) en Nominatim, si el
+                   gazetteer no alcanza MIN_SCORE
+    6. selenium  → navegador headless, SOLO para las filas que sigan vacías
+
+Antes de ningún nivel las URLs se canonicalizan y deduplican
+(canonical.py): cada clave única se resuelve una sola vez. Las claves
+ya resueltas en ejecuciones anteriores salen de la caché (geo_cache.py). Al final se imprime, por nivel, cuántas filas se
+intentaron, cuántas se resolvieron y la latencia media / p95, además
+del resumen de metrics.py (p50/p95/p99 por etapa, DNS y TTFB incluidos)
+y la traza JSON-lines en TRACE_FILE.
+
+Con --stream la hoja se lee por bloques (stream_io.py) y cada bloque
+resuelto se añade de inmediato a <EXPORT_BASE>.csv: memoria acotada y primeros
+resultados en disco en segundos.
+
+Uso
+───
+python resolve_tiered.py                # todos los niveles
+python resolve_tiered.py --no-browser   # sin el nivel de Selenium
+python resolve_tiered.py --stream       # lectura/escritura por bloques
+python resolve_tiered.py --dns-cache    # caché DNS en memoria (todo el proceso)
+"""
+
+import argparse
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from geo_cache import GeoCache
+from canonical import dedup, fan_out, report_dedup
+from bulk_extract import prefill
+from stream_io import (iter_chunks, ChunkWriter, CHUNK_ROWS,
+                       read_table, write_table, export_table)
+from rate_limit import HostRateLimiter
+from scheduler import AdaptiveScheduler
+from gazetteer import MIN_SCORE
+from geocode_google_v2 import (HEADERS, RE_AT, extract_from_stream, query_from_url,
+                               geocode, GAZETTEER)
+from geocode_via_google_redirect import shared_session, MAX_WORKERS, RATE, BURST
+from transport import transport_report, add_dns_cache_option, enable_dns_cache
+from metrics import METRICS
+
+FILE_IN  = "base_ina_datos_links_final.xlsx"   # URLs sin expandir
+FILE_OUT = "base_ina_datos_coord_full.parquet" # salida (Parquet)
+
+EXPORT_BASE = "base_ina_datos_coord_full"   # exportación final opcional
+EXPORT_XLSX = False                         # True → también .xlsx
+EXPORT_CSV  = True                          # .csv para QGIS
+
+TRACE_FILE = "base_ina_datos_coord_full.trace.jsonl"   # un span por línea (JSON)
+
+URL_COL = "google_maps_url"
+TIERS   = ("url", "redirect", "html", "gazetteer", "nominatim", "selenium")
+
+
+class TierStats:
+    """Intentos, aciertos y latencias por nivel (seguro entre hilos)."""
+
+    def __init__(self):
+        self.tries = Counter()
+        self.hits = Counter()
+        self.times = defaultdict(list)
+        self.cached = 0
+        self._lock = threading.Lock()
+
+    def record(self, tier: str, seconds: float, hit: bool) -> None:
+        with self._lock:
+            self.tries[tier] += 1
+            self.hits[tier] += int(hit)
+            self.times[tier].append(seconds)
+        METRICS.observe(tier, seconds, ok=hit)
+
+    def report(self) -> None:
+        print("\n📊  Resumen por nivel")
+        print(f"   {'nivel':<10} {'intentos':>9} {'aciertos':>9} {'media ms':>9} {'p95 ms':>9}")
+        if self.cached:
+            print(f"   {'caché':<10} {self.cached:>9} {self.cached:>9} {'-':>9} {'-':>9}")
+        for tier in TIERS:
+            if not self.tries[tier]:
+                continue
+            t = np.array(self.times[tier]) * 1000
+            print(f"   {tier:<10} {self.tries[tier]:>9} {self.hits[tier]:>9} "
+                  f"{t.mean():>9.1f} {np.percentile(t, 95):>9.1f}")
+
+
+def _http_tiers(url: str, limiter: HostRateLimiter, scheduler: AdaptiveScheduler,
+                stats: TierStats, cache: GeoCache | None):
+    """Niveles 2 y 3: una sola petición sirve para la redirección y el HTML."""
+    t0 = time.perf_counter()
+    resp, outcome = scheduler.request(
+        lambda: shared_session().get(url, headers=HEADERS, allow_redirects=True,
+                                     timeout=15, stream=True),
+        url=url, limiter=limiter)
+    if resp is None or outcome not in ("ok", "no_coords"):
+        stats.record("redirect", time.perf_counter() - t0, False)
+        return None
+    m = RE_AT.search(resp.url)
+    stats.record("redirect", time.perf_counter() - t0, m is not None)
+    if m:
+        resp.close()
+        lat, lon = map(float, m.groups())
+        if cache is not None:
+            cache.put_url(url, resp.url, lat, lon, "redirect")
+        return lat, lon, "redirect"
+
+    t0 = time.perf_counter()
+    try:
+        lat, lon = extract_from_stream(resp)
+    except Exception as e:
+        tqdm.write(f"  ⚠️  Error leyendo HTML de {url[:60]}… → {e}")
+        lat = lon = None
+    stats.record("html", time.perf_counter() - t0, lat is not None)
+    if lat is not None:
+        if cache is not None:
+            cache.put_url(url, resp.url, lat, lon, "html")
+        return lat, lon, "html"
+    return None
+
+
+def resolve_tiered(urls: dict, cache: GeoCache | None = None, use_browser: bool = True,
+                   max_workers: int = MAX_WORKERS, rate: float = RATE, burst: int = BURST,
+                   stats: TierStats | None = None):
+    """
+    Resuelve {idx: url} por niveles. Devuelve ({idx: (lat, lon, fuente)}, TierStats).
+    Las filas que ningún nivel resuelve no aparecen en el resultado.
+    Internamente se trabaja con claves únicas (`dedup`), no con filas.
+    Pasando el mismo `stats` en varias llamadas se acumulan las métricas.
+    """
+    stats = stats if stats is not None else TierStats()
+    groups, reps = dedup(urls)
+    report_dedup(len(urls), groups)
+    results = {}
+    pending = {}
+
+    # 1. @lat,lon / !3d…!4d… en la propia URL (toda la columna de una vez) + caché
+    t0 = time.perf_counter()
+    pre = prefill(pd.Series(reps, dtype=object))
+    per_url = (time.perf_counter() - t0) / max(1, len(reps))
+    for (key, url), lat, lon, fuente in zip(reps.items(), pre["latitud"].to_numpy(),
+                                            pre["longitud"].to_numpy(), pre["fuente"]):
+        stats.record("url", per_url, not np.isnan(lat))
+        if not np.isnan(lat):
+            results[key] = (float(lat), float(lon), fuente)
+            continue
+        hit = cache.lookup(url, query_from_url(url)) if cache is not None else None
+        if hit is not None:
+            results[key] = (hit["latitud"], hit["longitud"], hit["source"])
+            stats.cached += 1
+            continue
+        pending[key] = url
+
+    # 2-3. Redirección y HTML, en paralelo bajo el límite por host
+    limiter = HostRateLimiter(rate=rate, burst=burst)
+    scheduler = AdaptiveScheduler(max_concurrency=max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(_http_tiers, url, limiter, scheduler, stats, cache): key
+                   for key, url in pending.items()}
+        for fut in tqdm(as_completed(futures), total=len(futures), desc="HTTP"):
+            res = fut.result()
+            if res is not None:
+                results[futures[fut]] = res
+    if pending:
+        scheduler.summary()
+        transport_report(shared_session())
+    pending = {k: u for k, u in pending.items() if k not in results}
+
+    # 4. Gazetteer local: microsegundos por consulta, sin red
+    if GAZETTEER is not None:
+        for key, url in pending.items():
+            query = query_from_url(url)
+            if not query:
+                continue
+            t0 = time.perf_counter()
+            hit = GAZETTEER.geocode(query, MIN_SCORE)
+            stats.record("gazetteer", time.perf_counter() - t0, hit is not None)
+            if hit is not None:
+                results[key] = (*hit, "gazetteer")
+                if cache is not None:
+                    cache.put_query(query, *hit, "gazetteer")
+        pending = {k: u for k, u in pending.items() if k not in results}
+
+    # 5. Nominatim (su propio RateLimiter impone 1 req/s)
+    for key, url in tqdm(pending.items(), desc="Nominatim"):
+        query = query_from_url(url)
+        if not query:
+            continue
+        t0 = time.perf_counter()
+        try:
+            loc = geocode(query + ", CDMX, México")
+        except Exception as e:
+            tqdm.write(f"  ⚠️  Nominatim falló con «{query}» → {e}")
+            loc = None
+        stats.record("nominatim", time.perf_counter() - t0, loc is not None)
+        if loc:
+            results[key] = (loc.latitude, loc.longitude, "nominatim")
+            if cache is not None:
+                cache.put_url(url, None, loc.latitude, loc.longitude, "nominatim")
+                cache.put_query(query, loc.latitude, loc.longitude, "nominatim")
+    pending = {k: u for k, u in pending.items() if k not in results}
+
+    # 6. Navegador headless solo para lo que queda
+    if use_browser and pending:
+        from expand_google_links import expand_urls   # importa selenium solo si hace falta
+        timings = {}
+        expanded = expand_urls(pending, cache=cache, timings=timings)
+        for key, final_url in expanded.items():
+            m = RE_AT.search(final_url) if final_url else None
+            stats.record("selenium", timings[key], m is not None)
+            if m:
+                results[key] = (*map(float, m.groups()), "selenium")
+
+    return fan_out(groups, results), stats
+
+
+def apply_results(df: pd.DataFrame, results: dict) -> pd.DataFrame:
+    """Vuelca {idx: (lat, lon, fuente)} en las columnas de `df`."""
+    df["latitud"] = float("nan")
+    df["longitud"] = float("nan")
+    df["fuente"] = None
+    for idx, (lat, lon, fuente) in results.items():
+        df.at[idx, "latitud"] = lat
+        df.at[idx, "longitud"] = lon
+        df.at[idx, "fuente"] = fuente
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Geocodificación por niveles.")
+    parser.add_argument("--no-browser", action="store_true",
+                        help="no usar Selenium para las filas restantes")
+    parser.add_argument("--stream", action="store_true",
+                        help=f"procesa por bloques de {CHUNK_ROWS} filas y escribe solo {EXPORT_BASE}.csv")
+    add_dns_cache_option(parser)
+    args = parser.parse_args()
+    if args.dns_cache:
+        enable_dns_cache()
+    METRICS.open_trace(TRACE_FILE)
+
+    if args.stream:
+        # Bloque a bloque: memoria acotada, resultados en disco desde el primer bloque
+        stats = TierStats()
+        n_rows = n_ok = 0
+        csv_out = EXPORT_BASE + ".csv"
+        with GeoCache() as cache, ChunkWriter(csv_out) as out:
+            for chunk in iter_chunks(FILE_IN):
+                results, _ = resolve_tiered(chunk[URL_COL].to_dict(), cache=cache,
+                                            use_browser=not args.no_browser, stats=stats)
+                out.write(apply_results(chunk, results))
+                n_rows += len(chunk)
+                n_ok += len(results)
+                print(f"   💾 {out.rows} filas escritas en {csv_out}")
+        stats.report()
+        METRICS.summary()
+        METRICS.close_trace()
+        print(f"   sin resolver: {n_rows - n_ok} de {n_rows} filas")
+        print(f"\n✅  Archivo generado: {csv_out}")
+        raise SystemExit(0)
+
+    df = read_table(FILE_IN)
+    with GeoCache() as cache:
+        results, stats = resolve_tiered(df[URL_COL].to_dict(), cache=cache,
+                                        use_browser=not args.no_browser)
+    apply_results(df, results)
+
+    stats.report()
+    METRICS.summary()
+    METRICS.close_trace()
+    print(f"   sin resolver: {len(df) - len(results)} de {len(df)} filas")
+
+    write_table(df, FILE_OUT)
+    exported = export_table(df, EXPORT_BASE, xlsx=EXPORT_XLSX, csv=EXPORT_CSV)
+    print("\n✅  Archivo completo generado:")
+    for path in [FILE_OUT, *exported]:
+        print("   •", path)
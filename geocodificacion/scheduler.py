@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+scheduler.py
+—————————————————————————————————
+Planificador adaptativo de peticiones a Google.
+
+1. Clasifica cada respuesta (solo con el status y la URL final, sin leer
+   el cuerpo):
+       ok            → la URL final trae @lat,lon
+       no_coords     → 2xx/3xx sin coordenadas en la URL (hay que mirar el HTML)
+       consent       → página de consentimiento (consent.google.*)
+       captcha       → /sorry/… ("tráfico inusual")
+       throttled     → 429
+       server_error  → 5xx
+       error         → timeout / error de conexión
+       invalid       → petición imposible (URL mal formada, sin esquema,
+                       host que no existe en DNS)
+2. Ajusta la concurrencia con AIMD: +1/límite por cada éxito, ÷2 ante
+   cualquier señal de bloqueo o saturación.
+3. Ante un bloqueo pausa a TODOS los hilos con backoff exponencial con
+   jitter (base·2^k, tope MAX_BACKOFF) y reanuda solo; un 429 con
+   Retry-After pausa exactamente lo que pide Google. La petición
+   fallida se reintenta hasta `max_retries` veces.
+4. Un timeout o error de conexión es un problema de ese host, no de
+   Google entero: suma una falta al host y solo ese host espera (mismo
+   backoff), sin tocar la concurrencia. `invalid` se devuelve al momento,
+   sin reintento ni falta.
+
+Uso
+───
+sched = AdaptiveScheduler(max_concurrency=8)
+resp, outcome = sched.request(lambda: session.get(url, timeout=15),
+                              url=url, limiter=limiter)
+"""
+
+import random
+import re
+import socket
+import threading
+import time
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+from metrics import METRICS
+
+RE_AT_URL = re.compile(r"@-?\d+\.\d+,-?\d+\.\d+")
+
+OK_OUTCOMES    = ("ok", "no_coords")
+BLOCK_OUTCOMES = ("consent", "captcha", "throttled", "server_error")   # pausa global
+HOST_OUTCOMES  = ("error",)                                             # falta del host
+
+# Excepciones que no se arreglan reintentando
+INVALID_EXCEPTIONS = (requests.exceptions.InvalidURL, requests.exceptions.MissingSchema,
+                      requests.exceptions.InvalidSchema, requests.exceptions.InvalidHeader,
+                      requests.exceptions.URLRequired, ValueError)
+
+BASE_BACKOFF = 2.0      # s de la primera pausa
+MAX_BACKOFF  = 300.0    # s de pausa máxima
+MAX_RETRIES  = 3        # reintentos por URL tras un bloqueo
+
+
+def classify_response(resp) -> str:
+    """Clasifica una respuesta de requests sin tocar el cuerpo."""
+    if resp.status_code == 429:
+        return "throttled"
+    if resp.status_code >= 500:
+        return "server_error"
+    final = urlparse(resp.url)
+    if final.netloc.startswith("consent."):
+        return "consent"
+    if final.path.startswith("/sorry/"):
+        return "captcha"
+    if RE_AT_URL.search(resp.url):
+        return "ok"
+    return "no_coords"
+
+
+def _dns_failure(exc: BaseException) -> bool:
+    """¿La causa de fondo es que el nombre no existe (socket.gaierror)?"""
+    seen = set()
+    stack = [exc]
+    while stack:
+        e = stack.pop()
+        if e is None or id(e) in seen:
+            continue
+        seen.add(id(e))
+        if isinstance(e, socket.gaierror) or type(e).__name__ == "NameResolutionError":
+            return True
+        stack.extend([e.__cause__, e.__context__, getattr(e, "reason", None)])
+        stack.extend(a for a in getattr(e, "args", ()) if isinstance(a, BaseException))
+    return False
+
+
+def classify_exception(exc: BaseException) -> str:
+    """'invalid' (no reintentar) o 'error' (timeout / conexión, reintentable)."""
+    if isinstance(exc, INVALID_EXCEPTIONS) or _dns_failure(exc):
+        return "invalid"
+    return "error"
+
+
+def retry_after(resp) -> float | None:
+    """Segundos de la cabecera Retry-After (número o fecha HTTP), si la hay."""
+    value = getattr(resp, "headers", {}).get("Retry-After") if resp is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _host(url: str | None) -> str | None:
+    return urlparse(url).netloc.lower() if url else None
+
+
+class AdaptiveScheduler:
+    """Concurrencia AIMD + pausa global con backoff exponencial y jitter."""
+
+    def __init__(self, max_concurrency: int = 8, min_concurrency: int = 1,
+                 max_retries: int = MAX_RETRIES, base_backoff: float = BASE_BACKOFF,
+                 max_backoff: float = MAX_BACKOFF):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.outcomes = Counter()
+        self.retries = 0
+        self._in_flight = 0
+        self._strikes = 0              # bloqueos seguidos → exponente del backoff
+        self._paused_until = 0.0
+        self._host_strikes = Counter()     # fallos de red seguidos por host
+        self._host_paused_until: dict[str, float] = {}
+        self._cond = threading.Condition()
+
+    def _backoff(self, strikes: int) -> float:
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (strikes - 1))
+        return delay * random.uniform(0.5, 1.5)            # jitter
+
+    # ── control de admisión ─────────────────────────────────
+    def acquire(self, host: str | None = None) -> None:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = max(self._paused_until, self._host_paused_until.get(host, 0.0)) - now
+                if wait > 0:
+                    self._cond.wait(wait)
+                elif self._in_flight >= int(self.limit):
+                    self._cond.wait()
+                else:
+                    self._in_flight += 1
+                    return
+
+    def release(self, outcome: str, host: str | None = None,
+                wait_hint: float | None = None) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self.outcomes[outcome] += 1
+            METRICS.count(f"respuesta.{outcome}")
+            if outcome in OK_OUTCOMES:
+                self._strikes = 0
+                self._host_strikes.pop(host, None)
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            elif outcome in HOST_OUTCOMES:
+                # Solo espera este host; el resto sigue a la misma concurrencia
+                self._host_strikes[host] += 1
+                delay = self._backoff(self._host_strikes[host])
+                until = time.monotonic() + delay
+                if until > self._host_paused_until.get(host, 0.0):
+                    self._host_paused_until[host] = until
+                    print(f"  ⏸  {outcome} en {host or '?'}: ese host espera {delay:.1f}s")
+            elif outcome in BLOCK_OUTCOMES:
+                self._strikes += 1
+                self.limit = max(self.min_concurrency, self.limit / 2)
+                if wait_hint is not None:
+                    delay = min(self.max_backoff, wait_hint)    # Retry-After de Google
+                else:
+                    delay = self._backoff(self._strikes)
+                until = time.monotonic() + delay
+                if until > self._paused_until:
+                    self._paused_until = until
+                    print(f"  ⏸  {outcome}: pausa de {delay:.1f}s, "
+                          f"concurrencia → {int(self.limit)}")
+            self._cond.notify_all()
+
+    # ── petición con reintentos ─────────────────────────────
+    def request(self, fn, classify=classify_response, url: str | None = None, limiter=None):
+        """Ejecuta `fn()` (una petición) y devuelve (resp, outcome).
+
+        Si la respuesta indica bloqueo se reintenta tras la pausa global;
+        tras `max_retries` intentos se devuelve el último resultado. `url`
+        identifica el host para las faltas de red y, con `limiter`
+        (HostRateLimiter), cada intento —reintentos incluidos— pide antes
+        su ficha. Una petición `invalid` vuelve sin reintentar.
+        """
+        host = _host(url)
+        resp, outcome = None, "error"
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                with self._cond:
+                    self.retries += 1
+                METRICS.count("reintentos")
+            if limiter is not None and url is not None:
+                with METRICS.span("limite"):
+                    limiter.acquire(url)
+            self.acquire(host)
+            resp, outcome = None, "error"
+            try:
+                resp = fn()
+                outcome = classify(resp)
+            except Exception as e:
+                outcome = classify_exception(e)
+                print(f"  ⚠️  {e}")
+            finally:
+                self.release(outcome, host,
+                             retry_after(resp) if outcome == "throttled" else None)
+            if outcome in OK_OUTCOMES or outcome == "invalid":
+                break
+            if resp is not None and hasattr(resp, "close"):
+                resp.close()      # con stream=True, devuelve la conexión al pool
+        return resp, outcome
+
+    def summary(self) -> None:
+        counts = ", ".join(f"{k}={v}" for k, v in self.outcomes.most_common())
+        print(f"🚦  Respuestas: {counts or '—'} | reintentos={self.retries} | "
+              f"concurrencia final={int(self.limit)}")
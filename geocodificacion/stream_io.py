@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+stream_io.py
+—————————————————————————————————
+Lectura y escritura por bloques para no cargar el inventario completo
+en memoria.
+
+    iter_chunks(path)  → genera DataFrames de CHUNK_ROWS filas
+                         (.csv con pandas chunksize, .xlsx con openpyxl
+                         en modo read_only, .parquet por row groups)
+    ChunkWriter(path)  → añade bloques a un .csv o .parquet según se
+                         van resolviendo, así los primeros resultados
+                         llegan a disco en segundos
+
+El índice de cada bloque continúa el del anterior (0, 1, 2, … sobre
+todo el archivo), igual que con pd.read_excel. iter_chunks(path, dtype=…)
+fija el tipo de columnas concretas; con str las claves numéricas llegan
+como «123», no como «123.0» (que es lo que da un entero con huecos
+leído como float).
+
+Para pasar datos entre etapas se usa Parquet (read_table/write_table):
+columnas tipadas (latitud/longitud float64) y lectura con memory-map,
+sin el coste de serializar y parsear Excel en cada salto. Excel/CSV
+quedan como exportación final opcional (export_table).
+"""
+
+import os
+from itertools import islice
+
+import pandas as pd
+
+CHUNK_ROWS = 500     # filas por bloque
+
+COORD_COLS = ("latitud", "longitud")
+
+
+def _is_str(dtype) -> bool:
+    return dtype in (str, "str", "string", object)
+
+
+def _as_text(v):
+    """Valor de celda a texto; 123.0 (número entero guardado como float) → «123»."""
+    if v is None or (isinstance(v, float) and v != v):
+        return None
+    if isinstance(v, str):
+        return v
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+
+def _apply_dtype(df: pd.DataFrame, dtype: dict | None) -> pd.DataFrame:
+    for col, typ in (dtype or {}).items():
+        if col in df.columns:
+            if _is_str(typ):
+                df[col] = df[col].map(_as_text).astype(object)
+            else:
+                df[col] = df[col].astype(typ)
+    return df
+
+
+def _iter_xlsx(path: str, chunksize: int, dtype: dict | None = None):
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(c) for c in next(rows)]
+        start = 0
+        while True:
+            block = list(islice(rows, chunksize))
+            if not block:
+                break
+            yield _apply_dtype(pd.DataFrame(block, columns=header,
+                                            index=pd.RangeIndex(start, start + len(block))), dtype)
+            start += len(block)
+    finally:
+        wb.close()
+
+
+def _iter_parquet(path: str, chunksize: int, dtype: dict | None = None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    as_str = [c for c, typ in (dtype or {}).items() if _is_str(typ)]
+    start = 0
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+        # A texto en Arrow, antes de que un entero con nulos pase por float64
+        for col in as_str:
+            i = batch.schema.get_field_index(col)
+            if i >= 0:
+                batch = batch.set_column(i, col, batch.column(i).cast(pa.string()))
+        df = _apply_dtype(batch.to_pandas(),
+                          {c: typ for c, typ in (dtype or {}).items() if c not in as_str})
+        df.index = pd.RangeIndex(start, start + len(df))
+        start += len(df)
+        yield df
+
+
+def iter_chunks(path: str, chunksize: int = CHUNK_ROWS, dtype: dict | None = None):
+    """Genera bloques de `chunksize` filas de un .csv, .xlsx o .parquet.
+    `dtype` ({columna: tipo}) como en pd.read_csv, en los tres formatos."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        yield from pd.read_csv(path, chunksize=chunksize, dtype=dtype)
+    elif ext in (".xlsx", ".xlsm"):
+        yield from _iter_xlsx(path, chunksize, dtype)
+    elif ext == ".parquet":
+        yield from _iter_parquet(path, chunksize, dtype)
+    else:
+        raise ValueError(f"Formato no soportado para lectura por bloques: {path}")
+
+
+def read_table(path: str) -> pd.DataFrame:
+    """Lee un .parquet, .csv o .xlsx completo según la extensión."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        return pd.read_parquet(path, engine="pyarrow", memory_map=True)
+    if ext == ".csv":
+        return pd.read_csv(path)
+    return pd.read_excel(path)
+
+
+def _arrow_safe(df: pd.DataFrame) -> pd.DataFrame:
+    """Coordenadas a float64 y columnas de Excel con tipos mezclados a texto."""
+    df = df.copy()
+    for col in COORD_COLS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    for col in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[col], skipna=True) in ("mixed", "mixed-integer"):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def write_table(df: pd.DataFrame, path: str) -> None:
+    """Escribe la tabla intermedia en Parquet (o CSV/XLSX según extensión)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        _arrow_safe(df).to_parquet(path, engine="pyarrow", index=False)
+    elif ext == ".csv":
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+    else:
+        df.to_excel(path, index=False)
+
+
+def export_table(df: pd.DataFrame, base: str, xlsx: bool = False, csv: bool = False) -> list[str]:
+    """Exportación final opcional a <base>.xlsx / <base>.csv; devuelve las rutas."""
+    paths = []
+    if xlsx:
+        paths.append(base + ".xlsx")
+        df.to_excel(paths[-1], index=False)
+    if csv:
+        paths.append(base + ".csv")
+        df.to_csv(paths[-1], index=False, encoding="utf-8-sig")
+    return paths
+
+
+class ChunkWriter:
+    """Escribe bloques incrementalmente en .csv o .parquet.
+
+    En Parquet el esquema se fija con el primer bloque (o con `schema`, un
+    pa.Schema o dict columna → tipo). Una columna que en ese bloque viene
+    toda vacía sería de tipo null y rompería al llegar datos en otro
+    bloque: las de COORD_COLS son siempre float64 (salvo que `schema` diga
+    otra cosa; un primer bloque sin ninguna fila resuelta es lo normal) y
+    el resto de campos null se promueven a string.
+    """
+
+    def __init__(self, path: str, schema=None):
+        self.path = path
+        self.ext = os.path.splitext(path)[1].lower()
+        if self.ext not in (".csv", ".parquet"):
+            raise ValueError(f"Formato no soportado para escritura por bloques: {path}")
+        self.rows = 0
+        self._writer = None      # pq.ParquetWriter
+        self._schema = schema
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.ext == ".csv":
+            first = self.rows == 0
+            df.to_csv(self.path, mode="w" if first else "a", header=first,
+                      index=False, encoding="utf-8-sig" if first else "utf-8")
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self._writer is None:
+                self._schema = self._first_schema(pa, df)
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+            self._writer.write_table(table)
+        self.rows += len(df)
+
+    def _first_schema(self, pa, df: pd.DataFrame):
+        inferred = pa.Table.from_pandas(df, preserve_index=False).schema
+        declared = self._schema or {}
+        if isinstance(declared, pa.Schema):
+            declared = {f.name: f.type for f in declared}
+        declared = {**{c: pa.float64() for c in COORD_COLS}, **declared}
+        fields = []
+        for field in inferred:
+            if field.name in declared:
+                field = field.with_type(declared[field.name])
+            elif pa.types.is_null(field.type):
+                field = field.with_type(pa.string())
+            fields.append(field)
+        return pa.schema(fields, metadata=inferred.metadata)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
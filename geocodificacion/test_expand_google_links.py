@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+test_expand_google_links.py
+—————————————————————————————————
+El pool de navegadores de expand_urls contra fake_google.py, con URLs
+js-… que solo llegan a /@lat,lon por una redirección en JavaScript (la
+única forma de resolverlas es un Chrome de verdad). Se omite si no hay
+Chrome/chromedriver.
+
+    python -m pytest test_expand_google_links.py
+"""
+
+import shutil
+
+import pytest
+import urllib3
+
+pytest.importorskip("selenium")
+pytest.importorskip("webdriver_manager")
+
+import expand_google_links as egl   # noqa: E402
+import fake_google                  # noqa: E402
+
+CHROME_BINARIES = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome")
+
+
+@pytest.fixture(scope="module")
+def chrome():
+    if not any(shutil.which(b) for b in CHROME_BINARIES):
+        pytest.skip("Chrome no está instalado")
+    try:
+        egl.make_driver().quit()     # también descarga chromedriver una sola vez
+    except Exception as e:
+        pytest.skip(f"No se pudo arrancar Chrome/chromedriver: {e}")
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = fake_google.serve(0, latency_ms=0, html_kb=4)
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def _js_urls(base_url, n):
+    return {i: f"{base_url}/maps/search/?api=1&query=js-{i}" for i in range(n)}
+
+
+def _assert_resolved(urls, results):
+    assert set(results) == set(urls)
+    for i, final_url in results.items():
+        assert final_url is not None, f"fila {i} sin expandir"
+        m = egl.PAT_COORDS.search(final_url)
+        assert m is not None, final_url
+        assert tuple(map(float, m.groups())) == fake_google.coords_for(f"js-{i}")
+
+
+def test_pool_recycles_drivers(chrome, base_url, monkeypatch):
+    started = []
+    make_driver = egl.make_driver
+
+    def counting_make_driver():
+        started.append(1)
+        return make_driver()
+
+    monkeypatch.setattr(egl, "make_driver", counting_make_driver)
+    urls = _js_urls(base_url, 6)
+    timings = {}
+    results = egl.expand_urls(urls, pool_size=2, pages_per_driver=1,
+                              rate=50, burst=10, timings=timings)
+
+    _assert_resolved(urls, results)
+    # Al menos un navegador por página: se recicla tras cada una
+    assert len(started) >= len(urls)
+    assert set(timings) == set(urls) and all(t > 0 for t in timings.values())
+
+
+def test_dead_driver_is_replaced(chrome, base_url, monkeypatch):
+    make_driver = egl.make_driver
+    calls = []
+
+    def first_one_dead():
+        driver = make_driver()
+        calls.append(1)
+        if len(calls) == 1:
+            driver.quit()            # chromedriver parado: el siguiente uso falla
+        return driver
+
+    monkeypatch.setattr(egl, "make_driver", first_one_dead)
+    monkeypatch.setattr(egl.time, "sleep", lambda s: None)
+    urls = _js_urls(base_url, 3)
+    results = egl.expand_urls(urls, pool_size=1, pages_per_driver=10, rate=50, burst=10)
+
+    _assert_resolved(urls, results)
+    assert len(calls) >= 2           # el muerto y su sustituto
+
+
+def test_failed_launch_is_counted_not_fatal(base_url, monkeypatch):
+    def no_chrome():
+        raise RuntimeError("sin Chrome")
+
+    monkeypatch.setattr(egl, "make_driver", no_chrome)
+    monkeypatch.setattr(egl.time, "sleep", lambda s: None)
+    urls = _js_urls(base_url, 3)
+    timings = {}
+    results = egl.expand_urls(urls, pool_size=2, rate=50, burst=10, timings=timings)
+
+    # Los hilos no mueren: todas las filas terminan (como fallo)
+    assert results == {i: None for i in urls}
+    assert set(timings) == set(urls)
+
+
+class _FakeDriver:
+    """Navegador de mentira: el primero que se crea está muerto."""
+    created = 0
+
+    def __init__(self):
+        type(self).created += 1
+        self.dead = type(self).created == 1
+        self.current_url = None
+
+    def get(self, url):
+        if self.dead:
+            # Lo que llega de Selenium cuando chromedriver ya no responde
+            raise urllib3.exceptions.MaxRetryError(None, url, "Connection refused")
+        query = url.rsplit("query=", 1)[1]
+        lat, lon = fake_google.coords_for(query)
+        self.current_url = f"{url}/@{lat},{lon},17z"
+
+    def quit(self):
+        pass
+
+
+def test_dead_driver_is_replaced_without_chrome(base_url, monkeypatch):
+    _FakeDriver.created = 0
+    monkeypatch.setattr(egl, "make_driver", _FakeDriver)
+    monkeypatch.setattr(egl.time, "sleep", lambda s: None)
+    urls = _js_urls(base_url, 3)
+    results = egl.expand_urls(urls, pool_size=1, rate=50, burst=10)
+
+    _assert_resolved(urls, results)
+    assert _FakeDriver.created == 2
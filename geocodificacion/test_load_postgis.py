@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+test_load_postgis.py
+—————————————————————————————————
+SQL que genera load_postgis.py, sin servidor: una conexión y un cursor
+falsos guardan cada orden y el contenido de cada COPY.
+
+    python -m pytest test_load_postgis.py
+"""
+
+import pandas as pd
+import pytest
+from psycopg2 import sql
+
+import load_postgis
+
+
+def render(q) -> str:
+    """sql.Composable → texto (as_string necesita una conexión real)."""
+    if isinstance(q, str):
+        return q
+    if isinstance(q, sql.Composed):
+        return "".join(render(p) for p in q.seq)
+    if isinstance(q, sql.Identifier):
+        return ".".join('"' + s.replace('"', '""') + '"' for s in q.strings)
+    if isinstance(q, sql.SQL):
+        return q.string
+    raise TypeError(type(q))
+
+
+class FakeCursor:
+    def __init__(self):
+        self.executed, self.copied = [], []
+
+    def execute(self, q, params=None):
+        self.executed.append(" ".join(render(q).split()))
+
+    def copy_expert(self, q, buf):
+        self.executed.append(" ".join(render(q).split()))
+        self.copied.append(buf.read())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class FakeConn:
+    def __init__(self):
+        self.cur = FakeCursor()
+        self.commits = self.rollbacks = 0
+        self.closed = False
+
+    def cursor(self):
+        return self.cur
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_db():
+    conn = FakeConn()
+    return conn, lambda **config: conn
+
+
+def _parquet(tmp_path, df):
+    path = str(tmp_path / "inmuebles.parquet")
+    df.to_parquet(path, index=False)
+    return path
+
+
+def test_upsert_sql_does_not_update_key():
+    q = " ".join(render(load_postgis.upsert_sql(["clave", "nombre", "latitud", "longitud"])).split())
+    assert 'INSERT INTO "subs"."inah_inmuebles" ("clave", "nombre", "latitud", "longitud", geom)' in q
+    assert 'SELECT DISTINCT ON ("clave")' in q
+    assert 'ON CONFLICT ("clave") DO UPDATE' in q
+    assert '"nombre" = EXCLUDED."nombre"' in q
+    assert '"clave" = EXCLUDED' not in q
+
+
+def test_integer_key_with_gaps_is_copied_as_integer_text(tmp_path, fake_db):
+    conn, connect = fake_db
+    # Un entero con huecos: pandas lo guarda como float64 (123.0)
+    path = _parquet(tmp_path, pd.DataFrame({
+        "clave": [123, None, 7],
+        "nombre": ["a", "b", "c"],
+        "latitud": [19.4, 19.5, None],
+        "longitud": [-99.1, -99.2, None],
+    }))
+    assert load_postgis.load(path, connect=connect) == 3
+
+    rows = conn.cur.copied[0].splitlines()
+    assert [r.split(",")[0] for r in rows] == ["123", "", "7"]
+    assert conn.closed and conn.rollbacks == 0
+
+
+def test_key_column_is_configurable(tmp_path, fake_db):
+    conn, connect = fake_db
+    path = _parquet(tmp_path, pd.DataFrame({
+        "id_inah": ["A-1", "A-2"],
+        "latitud": [19.4, 19.5],
+        "longitud": [-99.1, -99.2],
+    }))
+    load_postgis.load(path, key="id_inah", connect=connect)
+
+    executed = "\n".join(conn.cur.executed)
+    assert 'CREATE TABLE IF NOT EXISTS "subs"."inah_inmuebles" ( "id_inah" text, "latitud"' in executed
+    assert 'PRIMARY KEY ("id_inah")' in executed
+    assert 'ON CONFLICT ("id_inah") DO UPDATE' in executed
+    assert 'COPY "_inah_carga" ("id_inah", "latitud", "longitud") FROM STDIN' in executed
+    assert conn.cur.copied[0].splitlines()[0] == "A-1,19.4,-99.1"
+
+
+def test_missing_key_column_is_reported(tmp_path, fake_db):
+    conn, connect = fake_db
+    path = _parquet(tmp_path, pd.DataFrame({"latitud": [19.4], "longitud": [-99.1]}))
+    with pytest.raises(ValueError, match="--key"):
+        load_postgis.load(path, connect=connect)
+    assert conn.rollbacks == 1 and conn.closed
+    assert not conn.cur.copied
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+test_stream_io.py
+—————————————————————————————————
+Escritura por bloques de stream_io.ChunkWriter: el esquema Parquet se
+fija con el primer bloque y no debe romper con los siguientes.
+
+    python -m pytest test_stream_io.py
+"""
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from stream_io import ChunkWriter, iter_chunks
+
+
+def _write(path, *chunks, **kwargs):
+    with ChunkWriter(str(path), **kwargs) as out:
+        for chunk in chunks:
+            out.write(pd.DataFrame(chunk))
+    return pd.read_parquet(str(path))
+
+
+def test_null_coordinates_then_floats(tmp_path):
+    # Primer bloque sin ninguna fila resuelta: coordenadas todas None
+    df = _write(tmp_path / "out.parquet",
+                {"latitud": [None, None], "longitud": [None, None], "fuente": [None, None]},
+                {"latitud": [19.4], "longitud": [-99.1], "fuente": ["redirect"]})
+    assert df["latitud"].dtype == "float64" and df["longitud"].dtype == "float64"
+    assert df["latitud"].isna().sum() == 2
+    assert df.loc[2, "latitud"] == 19.4 and df.loc[2, "longitud"] == -99.1
+    assert df.loc[2, "fuente"] == "redirect"
+
+
+def test_null_text_column_then_text(tmp_path):
+    df = _write(tmp_path / "out.parquet",
+                {"clave": [1], "colonia_geo": [None]},
+                {"clave": [2], "colonia_geo": ["Centro"]})
+    assert df["colonia_geo"].tolist()[1] == "Centro"
+
+
+def test_declared_schema_wins(tmp_path):
+    df = _write(tmp_path / "out.parquet",
+                {"dist_lote_m": [None]}, {"dist_lote_m": [12.5]},
+                schema={"dist_lote_m": pa.float64()})
+    assert df["dist_lote_m"].dtype == "float64"
+    assert df["dist_lote_m"].tolist()[1] == 12.5
+
+
+def test_csv_chunks_append(tmp_path):
+    path = tmp_path / "out.csv"
+    with ChunkWriter(str(path)) as out:
+        out.write(pd.DataFrame({"latitud": [None]}))
+        out.write(pd.DataFrame({"latitud": [19.4]}))
+    assert out.rows == 2
+    assert pd.read_csv(path)["latitud"].tolist()[1] == pytest.approx(19.4)
+
+
+def test_iter_chunks_reads_integer_key_as_text(tmp_path):
+    path = str(tmp_path / "in.parquet")
+    pd.DataFrame({"clave": [123, None, 7]}).to_parquet(path, index=False)
+    chunks = list(iter_chunks(path, 2, dtype={"clave": str}))
+    assert [len(c) for c in chunks] == [2, 1]
+    assert chunks[1].index.tolist() == [2]
+    assert [v for c in chunks for v in c["clave"] if isinstance(v, str)] == ["123", "7"]
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+transport.py
+—————————————————————————————————
+Capa de transporte HTTP compartida por los scripts de geocodificación.
+
+    • make_session()  → requests.Session con un pool de conexiones del
+                        tamaño de la concurrencia (pool_maxsize), límite
+                        de conexiones por host (pool_block) y reintentos
+                        solo ante fallos de conexión (los 429/5xx los
+                        gestiona scheduler.py)
+    • enable_dns_cache() → caché en memoria de socket.getaddrinfo con TTL.
+                        Sustituye la función en todo el proceso, así que
+                        es opcional: solo la activan los scripts con
+                        --dns-cache (disable_dns_cache() la quita)
+    • pin_host()      → fija la IP de un host (como curl --resolve)
+    • fetch_final_urls_http2() → cliente asíncrono httpx con HTTP/2
+                        (opcional: pip install "httpx[http2]")
+    • TransportStats  → tasa de reutilización de conexiones e histograma
+                        del tiempo hasta el primer byte (TTFB)
+
+Uso
+───
+session = make_session(pool_size=8)
+… session.get(url) desde varios hilos …
+transport_report(session)
+"""
+
+import asyncio
+import socket
+import threading
+import time
+from bisect import bisect_left
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import METRICS
+
+POOL_SIZE      = 10      # conexiones por host (≈ concurrencia)
+POOL_HOSTS     = 10      # hosts distintos con pool propio
+CONNECT_RETRIES = 2      # reintentos ante fallos de conexión/lectura
+DNS_TTL        = 300     # s que se guarda una resolución DNS
+
+TTFB_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+# ── DNS ───────────────────────────────────────────────────────
+_dns_cache: dict = {}
+_dns_lock = threading.Lock()
+_orig_getaddrinfo = socket.getaddrinfo
+_pinned: dict = {}        # host → IP fija (pin_host)
+
+
+def _cached_getaddrinfo(*args, **kwargs):
+    if args and args[0] in _pinned:
+        args = (_pinned[args[0]], *args[1:])
+    key = (args, tuple(sorted(kwargs.items())))
+    now = time.monotonic()
+    with _dns_lock:
+        hit = _dns_cache.get(key)
+        if hit is not None and now - hit[0] < DNS_TTL:
+            return hit[1]
+    with METRICS.span("dns"):
+        res = _orig_getaddrinfo(*args, **kwargs)
+    with _dns_lock:
+        _dns_cache[key] = (now, res)
+    return res
+
+
+def enable_dns_cache() -> None:
+    """Sustituye socket.getaddrinfo por una versión con caché (idempotente).
+    Afecta a todo el proceso: llamar solo desde el punto de entrada."""
+    socket.getaddrinfo = _cached_getaddrinfo
+
+
+def disable_dns_cache() -> None:
+    """Devuelve socket.getaddrinfo original y vacía la caché."""
+    socket.getaddrinfo = _orig_getaddrinfo
+    with _dns_lock:
+        _dns_cache.clear()
+
+
+def add_dns_cache_option(parser) -> None:
+    """Opción --dns-cache común a los scripts (ver enable_dns_cache)."""
+    parser.add_argument("--dns-cache", action="store_true",
+                        help=f"guarda en memoria las resoluciones DNS durante {DNS_TTL}s")
+
+
+def pin_host(host: str, ip: str) -> None:
+    """Resuelve siempre `host` a `ip` (p. ej. consent.localhost en fake_google.py).
+    Activa la caché DNS del proceso: pensado para pruebas locales."""
+    _pinned[host] = ip
+    enable_dns_cache()
+
+
+# ── Métricas ──────────────────────────────────────────────────
+class TransportStats:
+    """Histograma de TTFB (resp.elapsed = hasta recibir las cabeceras)."""
+
+    def __init__(self):
+        self.counts = [0] * (len(TTFB_BUCKETS_MS) + 1)
+        self.n = 0
+        self._lock = threading.Lock()
+
+    def record_ttfb(self, seconds: float) -> None:
+        with self._lock:
+            self.counts[bisect_left(TTFB_BUCKETS_MS, seconds * 1000)] += 1
+            self.n += 1
+
+    def hook(self, resp, *args, **kwargs):
+        """Hook de requests: se llama en cada salto de la redirección."""
+        self.record_ttfb(resp.elapsed.total_seconds())
+        METRICS.observe("ttfb", resp.elapsed.total_seconds(), status=resp.status_code)
+
+    def histogram(self) -> None:
+        if not self.n:
+            return
+        print("   TTFB (ms)")
+        labels = [f"≤{b}" for b in TTFB_BUCKETS_MS] + [f">{TTFB_BUCKETS_MS[-1]}"]
+        top = max(self.counts)
+        for label, c in zip(labels, self.counts):
+            if c:
+                print(f"   {label:>7} {c:>7}  {'█' * max(1, round(30 * c / top))}")
+
+
+def connection_reuse(session: requests.Session) -> tuple[int, int]:
+    """(peticiones, conexiones abiertas) sumando todos los pools de urllib3."""
+    requests_n = conns = 0
+    for adapter in {id(a): a for a in session.adapters.values()}.values():   # http y https comparten adaptador
+        pools = getattr(adapter.poolmanager, "pools", None)
+        if pools is None:
+            continue
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                requests_n += pool.num_requests
+                conns += pool.num_connections
+    return requests_n, conns
+
+
+def transport_report(session: requests.Session) -> None:
+    n_req, n_conn = connection_reuse(session)
+    reuse = 1 - n_conn / n_req if n_req else 0.0
+    print(f"🔌  Conexiones: {n_req} peticiones sobre {n_conn} conexiones "
+          f"(reutilización {reuse:.0%})")
+    stats = getattr(session, "transport_stats", None)
+    if stats is not None:
+        stats.histogram()
+
+
+# ── Sesión síncrona ───────────────────────────────────────────
+def make_session(pool_size: int = POOL_SIZE, pool_hosts: int = POOL_HOSTS,
+                 retries: int = CONNECT_RETRIES) -> requests.Session:
+    """
+    Sesión con pool de `pool_size` conexiones por host. `pool_block=True`
+    hace que, si todas están ocupadas, el hilo espere en vez de abrir una
+    conexión extra que luego se tira: es el límite por host. No toca el
+    DNS del proceso (se puede crear al importar un módulo).
+    """
+    retry = Retry(total=retries, connect=retries, read=retries, status=0,
+                  backoff_factor=0.3, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size,
+                          pool_block=True, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.transport_stats = TransportStats()
+    session.hooks["response"].append(session.transport_stats.hook)
+    return session
+
+
+# ── Cliente asíncrono HTTP/2 (opcional) ───────────────────────
+def http2_available() -> bool:
+    try:
+        import httpx  # noqa: F401
+        import h2     # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def _fetch_all(urls: dict, headers: dict, concurrency: int, limiter, stats):
+    import httpx
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    sem = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+
+    async with httpx.AsyncClient(http2=True, limits=limits, headers=headers,
+                                 follow_redirects=True, timeout=15) as client:
+        async def _one(key, url):
+            async with sem:
+                if limiter is not None:
+                    await loop.run_in_executor(None, limiter.acquire, url)
+                try:
+                    resp = await client.get(url)
+                except Exception as e:
+                    print(f"  ⚠️  Error con {url[:60]}… → {e}")
+                    return key, None
+                for hop in (*resp.history, resp):
+                    stats.record_ttfb(hop.elapsed.total_seconds())
+                return key, str(resp.url)
+
+        pairs = await asyncio.gather(*(_one(k, u) for k, u in urls.items()))
+    return dict(pairs)
+
+
+def fetch_final_urls_http2(urls: dict, headers: dict, concurrency: int = POOL_SIZE,
+                           limiter=None, stats: TransportStats | None = None) -> dict:
+    """
+    {clave: url} → {clave: url_final} con un único cliente HTTP/2
+    multiplexado. `limiter` (HostRateLimiter) se respeta igual que en el
+    camino con hilos.
+    """
+    stats = stats if stats is not None else TransportStats()
+    result = asyncio.run(_fetch_all(urls, headers, concurrency, limiter, stats))
+    stats.histogram()
+    return result
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+validate_spatial.py
+—————————————————————————————————
+Validación espacial de las coordenadas geocodificadas, antes de
+llevarlas a QGIS / PostGIS.
+
+1. Carga en memoria, una sola vez, los límites de alcaldías y colonias
+   (GeoJSON) y los lotes de subs.lotes_b_subs (PostGIS), cada capa en
+   un shapely.STRtree.
+2. Con todas las coordenadas a la vez (shapely.points + STRtree.query
+   vectorizado, sin bucles por fila):
+       • alcaldía y colonia que contienen cada punto
+       • lote más cercano y distancia en metros
+3. Marca cada fila en la columna 'validacion':
+       ok                → dentro de un lote
+       ajustado          → a ≤ SNAP_MAX_M de un lote: se mueve a un
+                           punto interior de ese lote
+       lejos_de_lote     → dentro de la CDMX pero lejos de todo lote
+       alcaldia_distinta → cae en otra alcaldía que la de EXPECTED_COL
+       fuera_cdmx        → fuera de todas las alcaldías
+       sin_coords        → sin latitud/longitud
+   Las coordenadas originales se conservan en latitud_original /
+   longitud_original.
+
+Las distancias se calculan en una proyección equirectangular local
+centrada en la CDMX (error < 0.5 % dentro de la ciudad), sin pyproj.
+100 000 puntos tardan unos segundos.
+
+Uso
+───
+python validate_spatial.py
+python validate_spatial.py --no-lotes     # solo alcaldías/colonias
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.geometry import shape
+
+from gazetteer import normalize
+from stream_io import read_table, write_table, export_table
+
+FILE_IN  = "base_ina_datos_coord_full.parquet"        # salida de la geocodificación
+FILE_OUT = "base_ina_datos_coord_validado.parquet"
+
+EXPORT_BASE = "base_ina_datos_coord_validado"
+EXPORT_XLSX = False
+EXPORT_CSV  = True                                     # .csv para QGIS
+
+ALCALDIAS_FILE = "alcaldias_cdmx.geojson"   # propiedad NOMBRE_ALC (o nomgeo)
+COLONIAS_FILE  = "colonias_cdmx.geojson"    # propiedad colonia (o nombre), opcional
+EXPECTED_COL   = "alcaldia"                 # columna con la alcaldía esperada (si existe)
+
+SNAP_MAX_M = 30.0     # distancia máxima para ajustar un punto a su lote
+
+# Conexión a PostgreSQL (misma base que script_python/)
+db_config = {
+    'host': 'localhost',
+    'database': 'practica01',
+    'user': 'postgres',
+    'password': 'postgres',
+    'port': '5432'
+}
+LOTES_QUERY = """
+    SELECT clave, ST_AsBinary(ST_Transform(geom, 4326))
+    FROM subs.lotes_b_subs
+    WHERE geom IS NOT NULL;
+"""
+
+# Proyección local (m) alrededor del centro de la CDMX
+LAT0 = 19.40
+M_PER_DEG_LAT = 110_574.0
+M_PER_DEG_LON = 111_320.0 * np.cos(np.radians(LAT0))
+
+NAME_KEYS = ("NOMBRE_ALC", "nomgeo", "alcaldia", "colonia", "nombre", "NOMBRE", "name")
+
+
+# ── carga de capas ────────────────────────────────────────────
+def _to_metres(coords: np.ndarray) -> np.ndarray:
+    return np.column_stack((coords[:, 0] * M_PER_DEG_LON, coords[:, 1] * M_PER_DEG_LAT))
+
+
+def _to_degrees(coords: np.ndarray) -> np.ndarray:
+    return np.column_stack((coords[:, 0] / M_PER_DEG_LON, coords[:, 1] / M_PER_DEG_LAT))
+
+
+def load_geojson(path: str) -> tuple[np.ndarray, np.ndarray]:
+    """(nombres, geometrías en metros) de un GeoJSON en EPSG:4326."""
+    with open(path, encoding="utf-8") as f:
+        features = json.load(f)["features"]
+    names, geoms = [], []
+    for feat in features:
+        props = feat.get("properties") or {}
+        names.append(next((str(props[k]) for k in NAME_KEYS if props.get(k)), ""))
+        geoms.append(shape(feat["geometry"]))
+    return np.array(names, dtype=object), shapely.transform(np.array(geoms), _to_metres)
+
+
+def load_lotes(config: dict = db_config) -> tuple[np.ndarray, np.ndarray]:
+    """(claves, geometrías en metros) de subs.lotes_b_subs."""
+    import psycopg2
+    conn = psycopg2.connect(**config)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(LOTES_QUERY)
+            rows = cursor.fetchall()
+    finally:
+        conn.close()
+    claves = np.array([r[0] for r in rows], dtype=object)
+    geoms = shapely.from_wkb([bytes(r[1]) for r in rows])
+    return claves, shapely.transform(geoms, _to_metres)
+
+
+class Layer:
+    """Capa de polígonos con su STRtree."""
+
+    def __init__(self, names: np.ndarray, geoms: np.ndarray):
+        self.names = names
+        self.geoms = geoms
+        self.tree = shapely.STRtree(geoms)
+
+    def __len__(self):
+        return len(self.geoms)
+
+    def containing(self, points: np.ndarray) -> np.ndarray:
+        """Nombre del polígono que contiene cada punto (None si ninguno)."""
+        out = np.full(len(points), None, dtype=object)
+        pt_idx, poly_idx = self.tree.query(points, predicate="within")
+        out[pt_idx] = self.names[poly_idx]          # si hay solapes, gana el último
+        return out
+
+    def nearest(self, points: np.ndarray, max_distance: float | None = None):
+        """(índice del polígono más cercano o -1, distancia) por punto."""
+        idx = np.full(len(points), -1, dtype=np.int64)
+        dist = np.full(len(points), np.inf)
+        (pt_idx, poly_idx), d = self.tree.query_nearest(
+            points, max_distance=max_distance, return_distance=True, all_matches=False)
+        idx[pt_idx] = poly_idx
+        dist[pt_idx] = d
+        return idx, dist
+
+
+# ── validación ────────────────────────────────────────────────
+def validate(df: pd.DataFrame, alcaldias: Layer, colonias: Layer | None = None,
+             lotes: Layer | None = None, snap_max_m: float = SNAP_MAX_M) -> pd.DataFrame:
+    """Añade alcaldia_geo, colonia_geo, lote_cercano, dist_lote_m y validacion."""
+    out = df.copy()
+    lat = pd.to_numeric(out["latitud"], errors="coerce").to_numpy(dtype="float64", copy=True)
+    lon = pd.to_numeric(out["longitud"], errors="coerce").to_numpy(dtype="float64", copy=True)
+    out["latitud_original"], out["longitud_original"] = lat.copy(), lon.copy()
+
+    has = ~(np.isnan(lat) | np.isnan(lon))
+    xy = _to_metres(np.column_stack((lon[has], lat[has])))
+    points = shapely.points(xy)
+
+    status = np.full(len(out), "sin_coords", dtype=object)
+    alc = np.full(len(out), None, dtype=object)
+    alc[has] = alcaldias.containing(points)
+    out["alcaldia_geo"] = alc
+    if colonias is not None:
+        col = np.full(len(out), None, dtype=object)
+        col[has] = colonias.containing(points)
+        out["colonia_geo"] = col
+
+    st = np.where(alc[has] == None, "fuera_cdmx", "ok").astype(object)   # noqa: E711
+
+    if EXPECTED_COL in out.columns:
+        # normalize() una vez por nombre distinto, no por fila
+        exp_col = out.loc[has, EXPECTED_COL]
+        expected = exp_col.map({v: normalize(v) for v in exp_col.dropna().unique()})
+        got = pd.Series(alc[has]).map({a: normalize(a) for a in alcaldias.names})
+        wrong = (st == "ok") & expected.notna().to_numpy() & \
+                (expected.to_numpy(dtype=object) != got.to_numpy(dtype=object))
+        st[wrong] = "alcaldia_distinta"
+
+    if lotes is not None and not len(lotes):
+        # Capa vacía: ningún punto tiene lote; no es motivo para marcarlos lejos
+        out["lote_cercano"], out["dist_lote_m"] = None, np.nan
+    elif lotes is not None:
+        near, dist = lotes.nearest(points)
+        lote = np.full(len(out), None, dtype=object)
+        d = np.full(len(out), np.nan)
+        found = near >= 0
+        lote_has = np.full(len(points), None, dtype=object)
+        lote_has[found] = lotes.names[near[found]]
+        lote[has] = lote_has
+        d[has] = np.where(found, dist, np.nan)
+        out["lote_cercano"], out["dist_lote_m"] = lote, d
+
+        inside = dist == 0
+        snap = (st == "ok") & ~inside & (dist <= snap_max_m)
+        far = (st == "ok") & ~inside & (dist > snap_max_m)
+        st[snap] = "ajustado"
+        st[far] = "lejos_de_lote"
+
+        if snap.any():
+            # Punto interior del lote (point_on_surface), de vuelta a grados
+            new_xy = shapely.get_coordinates(shapely.point_on_surface(lotes.geoms[near[snap]]))
+            new_lonlat = _to_degrees(new_xy)
+            rows = np.flatnonzero(has)[snap]
+            lon[rows], lat[rows] = new_lonlat[:, 0], new_lonlat[:, 1]
+            out["latitud"], out["longitud"] = lat, lon
+
+    status[has] = st
+    out["validacion"] = status
+    return out
+
+
+def report(out: pd.DataFrame) -> None:
+    counts = out["validacion"].value_counts()
+    print("📊  Validación espacial")
+    for k, v in counts.items():
+        print(f"   {k:<18} {v:>7}  ({v / len(out):.1%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Valida y ajusta las coordenadas geocodificadas.")
+    parser.add_argument("--no-lotes", action="store_true",
+                        help="no consulta subs.lotes_b_subs (solo alcaldías/colonias)")
+    args = parser.parse_args()
+
+    # 1. Capas en memoria
+    t0 = time.perf_counter()
+    alcaldias = Layer(*load_geojson(ALCALDIAS_FILE))
+    print(f"🗺️  {len(alcaldias)} alcaldías ({ALCALDIAS_FILE})")
+    colonias = None
+    try:
+        colonias = Layer(*load_geojson(COLONIAS_FILE))
+        print(f"🗺️  {len(colonias)} colonias ({COLONIAS_FILE})")
+    except FileNotFoundError:
+        print(f"ℹ️  Sin {COLONIAS_FILE}: no se asigna colonia")
+    lotes = None
+    if not args.no_lotes:
+        try:
+            lotes = Layer(*load_lotes())
+            print(f"🗺️  {len(lotes)} lotes (subs.lotes_b_subs)")
+        except Exception as e:
+            print(f"⚠️  No se pudieron leer los lotes: {e}")
+    print(f"   capas listas en {time.perf_counter() - t0:.1f}s")
+
+    # 2. Validación vectorizada
+    df = read_table(FILE_IN)
+    t0 = time.perf_counter()
+    out = validate(df, alcaldias, colonias, lotes)
+    print(f"⏱️  {len(df)} puntos validados en {time.perf_counter() - t0:.2f}s")
+    report(out)
+
+    # 3. Guarda resultados
+    write_table(out, FILE_OUT)
+    exported = export_table(out, EXPORT_BASE, xlsx=EXPORT_XLSX, csv=EXPORT_CSV)
+    print("\n✅  Listo:")
+    for path in [FILE_OUT, *exported]:
+        print(f"   • {path}")
@@ -1,141 +1,319 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import argparse
 import psycopg2
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 import os
 from matplotlib import rcParams
+from matplotlib.backends.backend_pdf import PdfPages
 
-# Configuración de la conexión a la base de datos
-db_config = {
-    'host': 'localhost',
-    'database': 'practica01',
-    'user': 'postgres',
-    'password': 'postgres',
-    'port': '5432'
-}
+from lotes_db import connect, filtrar
+from snapshot_lotes import leer_snapshot, opcion_snapshot
 
 # Ruta de guardado específica
 output_dir = r'C:\Users\eurekastein\OneDrive\Documentos\EDIFICIOS\boxplot'
 output_filename = os.path.join(output_dir, 'barras_rangos_mejorado.png')
 
+# Polígonos a graficar
+filtro = "max_min IS NOT NULL"
+
+# Modo del gráfico: 'auto', 'completo', 'bandas', 'lttb' o 'paginas'
+modo_barras = 'auto'
+MAX_BARRAS = 300            # 'auto': hasta aquí una barra por polígono
+N_BANDAS = 200              # bandas de cuantiles / barras LTTB del modo resumido
+K_ETIQUETAS = 10            # polígonos etiquetados en cada extremo
+BARRAS_POR_PAGINA = 100     # modo 'paginas'
+FIGSIZE_RESUMEN = (16, 8)   # tamaño fijo del modo resumido
+
 # Consulta SQL para obtener los rangos
 query = """
-    SELECT 
-        clave, 
+    SELECT
+        clave,
         max_min
-    FROM 
+    FROM
         subs.lotes_b_subs
     WHERE
-        max_min IS NOT NULL;
+        {filtro};
 """
 
-try:
-    # Establecer conexión
-    conn = psycopg2.connect(**db_config)
+
+def cargar_rangos(conn):
+    """(claves, rangos) de los polígonos con rango numérico válido."""
     cursor = conn.cursor()
-    cursor.execute(query)
+    cursor.execute(query.format(filtro=filtro))
     resultados = cursor.fetchall()
-    
-    if not resultados:
-        print("No se encontraron polígonos con datos de rango.")
+
+    # Procesar datos
+    claves, rangos = [], []
+    for poligono_id, rango in resultados:
+        try:
+            rango = float(rango) if rango is not None else np.nan
+            if not np.isnan(rango):
+                claves.append(str(poligono_id))
+                rangos.append(rango)
+        except Exception as e:
+            print(f"Error procesando polígono {poligono_id}: {e}")
+    return claves, np.array(rangos)
+
+
+def rangos_snapshot(tabla):
+    """Lo mismo que cargar_rangos, desde una tabla del snapshot local."""
+    mask = filtrar(tabla, filtro) & ~np.isnan(tabla['max_min'])
+    return [str(c) for c in tabla['clave'][mask]], tabla['max_min'][mask]
+
+
+def figura_barras(ids, rangos, media, titulo='Rangos de velocidad (máx - mín) por polígono (ordenados)'):
+    """Una barra con su valor por polígono (el gráfico original); `rangos` ya ordenados."""
+    n_barras = len(rangos)
+
+    # Configurar el gráfico con espacio adaptativo
+    fig, ax = plt.subplots(figsize=(max(10, n_barras*0.3), 8))  # Ancho dinámico
+
+    # Ajustar posición de las barras y su ancho
+    posiciones = np.arange(n_barras)
+    ancho_barra = max(0.2, min(0.8, 30/n_barras))  # Ancho adaptativo
+
+    # Crear gráfico de barras con colores
+    colors = plt.cm.plasma(np.linspace(0, 1, n_barras))
+    bars = ax.bar(posiciones, rangos, width=ancho_barra, color=colors, alpha=0.7)
+
+    # Títulos y etiquetas
+    ax.set_title(titulo, fontsize=14, pad=20)
+    ax.set_xlabel('ID de Polígono', fontsize=12)
+    ax.set_ylabel('Rango de Velocidad (mm/año)', fontsize=12)
+
+    # Ajustar etiquetas del eje X
+    fontsize_etiquetas = max(6, min(10, 300/n_barras))
+    ax.set_xticks(posiciones)
+    ax.set_xticklabels(ids,
+                      rotation=45,
+                      ha='right',
+                      fontsize=fontsize_etiquetas)
+
+    # Añadir espacio entre etiquetas y eje
+    ax.tick_params(axis='x', which='major', pad=10)
+
+    # Añadir línea de media general
+    ax.axhline(media, color='red', linestyle='--',
+              linewidth=1.5, alpha=0.7,
+              label=f'Media: {media:.2f} mm/año')
+
+    # Añadir valores encima de las barras
+    fontsize_valores = max(6, min(9, 200/n_barras))
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2., height,
+               f'{height:.1f}',
+               ha='center',
+               va='bottom' if height >= 0 else 'top',
+               fontsize=fontsize_valores,
+               rotation=90 if n_barras > 50 else 0,
+               bbox=dict(facecolor='white', alpha=0.7, edgecolor='none', pad=1))
+
+    # Ajustar límites del eje X
+    ax.set_xlim(-0.7, n_barras - 0.3)
+
+    # Ajustar margen inferior de forma segura
+    margen_inferior = min(0.15 + (n_barras * 0.007), 0.5)
+    fig.subplots_adjust(bottom=margen_inferior, top=0.92)
+
+    # Leyenda mejorada
+    ax.legend(loc='upper right', framealpha=0.9)
+
+    # Grid y estilo
+    ax.grid(True, linestyle='--', alpha=0.5, axis='y')
+    ax.set_axisbelow(True)
+    return fig
+
+
+def bandas_cuantiles(rangos, n_bandas=N_BANDAS):
+    """
+    Agrupa los rangos ordenados en `n_bandas` bandas de igual número de
+    polígonos: (inicio, fin, mínimo, mediana, máximo) por banda.
+    """
+    n = len(rangos)
+    bordes = np.unique(np.linspace(0, n, min(n_bandas, n) + 1).astype(np.int64))
+    inicio, fin = bordes[:-1], bordes[1:]
+    # Ya están ordenados: mínimo y máximo son los extremos de cada banda
+    mediana = (rangos[inicio + (fin - inicio - 1) // 2] + rangos[inicio + (fin - inicio) // 2]) / 2
+    return inicio, fin, rangos[inicio], mediana, rangos[fin - 1]
+
+
+def lttb_indices(y, n_out):
+    """
+    Índices elegidos por Largest-Triangle-Three-Buckets sobre (i, y[i]):
+    conserva la forma de la curva con `n_out` puntos (incluye el primero
+    y el último).
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64)
+    cubetas = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    elegidos = [0]
+    for b in range(n_out - 2):
+        ini, fin = cubetas[b], cubetas[b + 1]
+        # Promedio de la cubeta siguiente (el último punto para la última)
+        sig_ini, sig_fin = fin, (cubetas[b + 2] if b + 2 < len(cubetas) else n)
+        cx, cy = x[sig_ini:sig_fin].mean(), y[sig_ini:sig_fin].mean()
+        ax_, ay = x[elegidos[-1]], y[elegidos[-1]]
+        area = np.abs((ax_ - cx) * (y[ini:fin] - ay) - (ax_ - x[ini:fin]) * (cy - ay))
+        elegidos.append(ini + int(np.argmax(area)))
+    elegidos.append(n - 1)
+    return np.asarray(elegidos)
+
+
+def figura_resumida(ids, rangos, media, modo='bandas', k=K_ETIQUETAS, n_bandas=N_BANDAS):
+    """
+    Versión de tamaño fijo para miles de polígonos: bandas de cuantiles
+    (mediana con línea mín–máx) o barras elegidas por LTTB, y etiquetas
+    solo para los k menores y k mayores.
+    """
+    n = len(rangos)
+    fig, ax = plt.subplots(figsize=FIGSIZE_RESUMEN)
+
+    if modo == 'lttb':
+        idx = lttb_indices(rangos, n_bandas)
+        centros, alturas = idx.astype(np.float64), rangos[idx]
+        anchos = np.full(len(idx), max(1.0, n / len(idx)) * 0.9)
+        descripcion = f'{len(idx)} barras elegidas con LTTB'
     else:
-        # Procesar datos
-        datos = []
-        for poligono_id, rango in resultados:
-            try:
-                rango = float(rango) if isinstance(rango, str) else rango
-                if not np.isnan(rango):
-                    datos.append({'id': str(poligono_id), 'rango': rango})
-            except Exception as e:
-                print(f"Error procesando polígono {poligono_id}: {e}")
-        
-        if not datos:
-            print("No hay datos válidos.")
-            exit()
-
-        # Convertir a DataFrame y ordenar
-        df = pd.DataFrame(datos)
-        df = df.sort_values('rango')
-        n_barras = len(df)
-        
-        # Configuración de estilo
-        plt.style.use('ggplot')
-        rcParams.update({'figure.autolayout': True})
-        
-        # Configurar el gráfico con espacio adaptativo
-        fig, ax = plt.subplots(figsize=(max(10, n_barras*0.3), 8))  # Ancho dinámico
-        
-        # Ajustar posición de las barras y su ancho
-        posiciones = np.arange(n_barras)
-        ancho_barra = max(0.2, min(0.8, 30/n_barras))  # Ancho adaptativo
-        
-        # Crear gráfico de barras con colores
-        colors = plt.cm.plasma(np.linspace(0, 1, n_barras))
-        bars = ax.bar(posiciones, df['rango'], width=ancho_barra, color=colors, alpha=0.7)
-        
-        # Títulos y etiquetas
-        ax.set_title('Rangos de velocidad (máx - mín) por polígono (ordenados)', 
-                    fontsize=14, pad=20)
-        ax.set_xlabel('ID de Polígono', fontsize=12)
-        ax.set_ylabel('Rango de Velocidad (mm/año)', fontsize=12)
-        
-        # Ajustar etiquetas del eje X
-        fontsize_etiquetas = max(6, min(10, 300/n_barras))
-        ax.set_xticks(posiciones)
-        ax.set_xticklabels(df['id'], 
-                          rotation=45, 
-                          ha='right', 
-                          fontsize=fontsize_etiquetas)
-        
-        # Añadir espacio entre etiquetas y eje
-        ax.tick_params(axis='x', which='major', pad=10)
-        
-        # Añadir línea de media general
-        media = df['rango'].mean()
-        ax.axhline(media, color='red', linestyle='--', 
-                  linewidth=1.5, alpha=0.7, 
-                  label=f'Media: {media:.2f} mm/año')
-        
-        # Añadir valores encima de las barras
-        fontsize_valores = max(6, min(9, 200/n_barras))
-        for bar in bars:
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height,
-                   f'{height:.1f}',
-                   ha='center', 
-                   va='bottom' if height >= 0 else 'top',
-                   fontsize=fontsize_valores,
-                   rotation=90 if n_barras > 50 else 0,
-                   bbox=dict(facecolor='white', alpha=0.7, edgecolor='none', pad=1))
-        
-        # Ajustar límites del eje X
-        ax.set_xlim(-0.7, n_barras - 0.3)
-        
-        # Ajustar margen inferior de forma segura
-        margen_inferior = min(0.15 + (n_barras * 0.007), 0.5)
-        plt.subplots_adjust(bottom=margen_inferior, top=0.92)
-        
-        # Leyenda mejorada
-        ax.legend(loc='upper right', framealpha=0.9)
-        
-        # Grid y estilo
-        ax.grid(True, linestyle='--', alpha=0.5, axis='y')
-        ax.set_axisbelow(True)
-        
-        # Guardar el gráfico
-        os.makedirs(output_dir, exist_ok=True)
-        plt.savefig(output_filename, dpi=300, bbox_inches='tight')
-        print(f"Gráfico guardado como: {output_filename}")
-        
-        # Mostrar el gráfico
+        inicio, fin, minimo, mediana, maximo = bandas_cuantiles(rangos, n_bandas)
+        centros, alturas, anchos = (inicio + fin - 1) / 2, mediana, np.maximum(fin - inicio, 1) * 0.9
+        ax.vlines(centros, minimo, maximo, color='black', linewidth=0.6, alpha=0.5,
+                  label='Mín – máx de la banda')
+        descripcion = f'{len(inicio)} bandas de ~{n / len(inicio):.0f} polígonos (mediana)'
+
+    colors = plt.cm.plasma(np.linspace(0, 1, len(centros)))
+    ax.bar(centros, alturas, width=anchos, color=colors, alpha=0.7)
+
+    ax.set_title(f'Rangos de velocidad (máx - mín) por polígono (ordenados, {n} polígonos)',
+                 fontsize=14, pad=20)
+    ax.set_xlabel(f'Polígonos ordenados por rango — {descripcion}', fontsize=12)
+    ax.set_ylabel('Rango de Velocidad (mm/año)', fontsize=12)
+    ax.set_xlim(-0.5, n - 0.5)
+
+    ax.axhline(media, color='red', linestyle='--',
+               linewidth=1.5, alpha=0.7,
+               label=f'Media: {media:.2f} mm/año')
+
+    # Solo los extremos llevan nombre: marca en su posición y lista en un recuadro
+    k = min(k, n // 2)
+    if k:
+        extremos = np.r_[np.arange(k), np.arange(n - k, n)]
+        ax.scatter(extremos, rangos[extremos], s=12, color='black', zorder=3)
+        menores = "\n".join(f"{ids[i]}: {rangos[i]:.1f}" for i in range(k))
+        mayores = "\n".join(f"{ids[i]}: {rangos[i]:.1f}" for i in range(n - 1, n - k - 1, -1))
+        ax.text(0.01, 0.98, f"Mayores rangos\n{mayores}\n\nMenores rangos\n{menores}",
+                transform=ax.transAxes, ha='left', va='top', fontsize=7, family='monospace',
+                bbox=dict(facecolor='white', alpha=0.8, edgecolor='gray'))
+
+    ax.legend(loc='upper right', framealpha=0.9)
+    ax.grid(True, linestyle='--', alpha=0.5, axis='y')
+    ax.set_axisbelow(True)
+    fig.tight_layout()
+    return fig
+
+
+def graficar_paginas(ids, rangos, media, output_filename, por_pagina=BARRAS_POR_PAGINA):
+    """
+    El gráfico original partido en páginas de `por_pagina` polígonos: un
+    PDF de varias páginas si output_filename termina en .pdf, si no un PNG
+    por página (_p001, _p002…). Cada figura se cierra al guardarla.
+    """
+    n = len(rangos)
+    n_paginas = -(-n // por_pagina)
+    base, ext = os.path.splitext(output_filename)
+    pdf = PdfPages(output_filename) if ext.lower() == '.pdf' else None
+    try:
+        for p in range(n_paginas):
+            trozo = slice(p * por_pagina, (p + 1) * por_pagina)
+            fig = figura_barras(ids[trozo], rangos[trozo], media,
+                                titulo=f'Rangos de velocidad (máx - mín) por polígono '
+                                       f'(ordenados, página {p + 1}/{n_paginas})')
+            if pdf is not None:
+                pdf.savefig(fig, bbox_inches='tight')
+            else:
+                fig.savefig(f'{base}_p{p + 1:03d}{ext}', dpi=300, bbox_inches='tight')
+            plt.close(fig)
+    finally:
+        if pdf is not None:
+            pdf.close()
+    destino = output_filename if pdf is not None else f'{base}_p001{ext} … _p{n_paginas:03d}{ext}'
+    print(f"Gráfico guardado como: {destino} ({n_paginas} páginas)")
+
+
+def graficar(claves, rangos, output_filename, mostrar=True, modo=modo_barras):
+    """
+    modo: 'completo' (una barra por polígono), 'bandas', 'lttb', 'paginas'
+    o 'auto' (completo hasta MAX_BARRAS polígonos, bandas si hay más).
+    """
+    # Ordenar por rango
+    rangos = np.asarray(rangos, dtype=np.float64)
+    orden = np.argsort(rangos, kind='stable')
+    ids = np.asarray([str(c) for c in claves], dtype=object)[orden]
+    rangos = rangos[orden]
+    media = rangos.mean()
+    if modo == 'auto':
+        modo = 'completo' if len(rangos) <= MAX_BARRAS else 'bandas'
+
+    # Configuración de estilo
+    plt.style.use('ggplot')
+    rcParams.update({'figure.autolayout': modo in ('completo', 'paginas')})
+
+    os.makedirs(os.path.dirname(output_filename) or '.', exist_ok=True)
+    if modo == 'paginas':
+        graficar_paginas(ids, rangos, media, output_filename)
+        return
+    if modo == 'completo':
+        fig = figura_barras(ids, rangos, media)
+    else:
+        fig = figura_resumida(ids, rangos, media, modo)
+
+    # Guardar el gráfico
+    fig.savefig(output_filename, dpi=300, bbox_inches='tight')
+    print(f"Gráfico guardado como: {output_filename}")
+
+    # Mostrar el gráfico
+    if mostrar:
         plt.show()
 
-except psycopg2.Error as e:
-    print(f"Error al conectar a PostgreSQL: {e}")
-finally:
-    if conn is not None:
-        conn.close()
-        print("Conexión cerrada")
\ No newline at end of file
+
+def main():
+    parser = argparse.ArgumentParser(description="Barras del rango de velocidad por polígono.")
+    parser.add_argument('--modo', default=modo_barras,
+                        choices=('auto', 'completo', 'bandas', 'lttb', 'paginas'),
+                        help="'auto': una barra por polígono hasta MAX_BARRAS, bandas si hay más")
+    parser.add_argument('-o', '--salida', default=output_filename,
+                        help="archivo de salida (.pdf con --modo paginas → un PDF de varias páginas)")
+    opcion_snapshot(parser)
+    args = parser.parse_args()
+
+    conn = None
+    try:
+        if args.snapshot:
+            claves, rangos = rangos_snapshot(leer_snapshot(args.snapshot))
+        else:
+            # Establecer conexión
+            conn = connect()
+            claves, rangos = cargar_rangos(conn)
+
+        if not len(rangos):
+            print("No se encontraron polígonos con datos de rango.")
+            return
+        graficar(claves, rangos, args.salida, modo=args.modo)
+
+    except psycopg2.Error as e:
+        print(f"Error al conectar a PostgreSQL: {e}")
+    except FileNotFoundError as e:
+        print(e)
+    finally:
+        if conn is not None:
+            conn.close()
+            print("Conexión cerrada")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Tiempo por figura de los histogramas por polígono, con datos sintéticos:
+#   antes      plt.subplots + ax.hist + ax.text + tight_layout + savefig + close
+#              (graficar_poligono, como el bucle original de histogramas.py)
+#   plantilla  PlantillaHistograma: solo se mueven rectángulos, límites y textos
+#   zlib=1     plantilla guardando con PNG_COMPRESION = 1
+# Cada modo se mide dibujando en memoria (canvas.draw, a 100 dpi) y
+# guardando el PNG a --dpi.
+#
+# Uso:
+#   python bench_histogramas.py                  # 40 figuras a 300 dpi
+#   python bench_histogramas.py --figuras 200 --dpi 100
+
+import argparse
+import os
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+import histogramas
+
+N_FIGURAS = 40
+
+
+def poligonos_sinteticos(n, seed=0):
+    rng = np.random.default_rng(seed)
+    out = []
+    for i in range(n):
+        v = rng.normal(rng.uniform(-30, 30), rng.uniform(0.5, 15), rng.integers(5, 300))
+        conteos, bordes = np.histogram(v, bins=int(rng.integers(1, 21)))
+        r = {'n': len(v), 'media': v.mean(), 'mediana': np.median(v),
+             'maximo': v.max(), 'minimo': v.min(), 'desv': v.std()}
+        out.append(('P{}'.format(i), r, bordes, conteos))
+    return out
+
+
+def antes(poligonos, carpeta, dpi, guardar):
+    for poligono_id, r, bordes, conteos in poligonos:
+        fig, ax = plt.subplots(figsize=(10, 6))
+        histogramas.graficar_poligono(ax, poligono_id, r, bordes, conteos)
+        fig.tight_layout()
+        if guardar:
+            fig.savefig(os.path.join(carpeta, 'a_{}.png'.format(poligono_id)), dpi=dpi)
+        else:
+            fig.canvas.draw()
+        plt.close(fig)
+
+
+def plantilla(poligonos, carpeta, dpi, guardar, compresion=None):
+    p = histogramas.PlantillaHistograma()
+    for poligono_id, r, bordes, conteos in poligonos:
+        p.actualizar(poligono_id, r, bordes, conteos)
+        if guardar:
+            p.guardar(os.path.join(carpeta, 'p_{}.png'.format(poligono_id)), dpi=dpi,
+                      compresion=compresion)
+        else:
+            p.fig.canvas.draw()
+    plt.close(p.fig)
+
+
+def medir(funcion, poligonos, carpeta, dpi, guardar):
+    t0 = time.perf_counter()
+    funcion(poligonos, carpeta, dpi, guardar)
+    return (time.perf_counter() - t0) / len(poligonos) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los histogramas por polígono.")
+    parser.add_argument('--figuras', type=int, default=N_FIGURAS)
+    parser.add_argument('--dpi', type=int, default=histogramas.DPI)
+    args = parser.parse_args()
+
+    plt.style.use('ggplot')
+    poligonos = poligonos_sinteticos(args.figuras)
+    # Calentamiento: fuentes y caché de texto de matplotlib
+    antes(poligonos[:2], None, args.dpi, guardar=False)
+
+    print("{} figuras, {} dpi (ms por figura)".format(args.figuras, args.dpi))
+    print("{:<10} {:>10} {:>10}".format('modo', 'dibujo', 'png'))
+    with tempfile.TemporaryDirectory() as carpeta:
+        base = None
+        modos = (('antes', antes), ('plantilla', plantilla),
+                 ('zlib=1', lambda *a, **k: plantilla(*a, compresion=1, **k)))
+        for nombre, funcion in modos:
+            dibujo = medir(funcion, poligonos, carpeta, args.dpi, guardar=False)
+            png = medir(funcion, poligonos, carpeta, args.dpi, guardar=True)
+            base = base or (dibujo, png)
+            print("{:<10} {:>10.1f} {:>10.1f}   (x{:.1f} / x{:.1f})".format(
+                nombre, dibujo, png, base[0] / dibujo, base[1] / png))
+
+
+if __name__ == "__main__":
+    main()
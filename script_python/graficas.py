@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Punto de entrada único para las gráficas de subs.lotes_b_subs.
+#
+# En vez de que cada script abra su conexión y repita la consulta con su
+# propio WHERE, se lee una sola vez la unión de columnas que piden todas
+# las gráficas (velocidades en binario + max_min, no_puntos, nombres…) y
+# cada filtro se aplica en memoria con lotes_db.mascara. Un reporte
+# completo cuesta una consulta en lugar de cinco.
+#
+# Uso:
+#   python graficas.py                      # las gráficas de REPORTE
+#   python graficas.py --grafica boxplot "max_min>=4.5 AND no_puntos>=5" caja.png
+#   python graficas.py --grafica barras "" barras.png --grafica histogramas "" hist/
+#   python graficas.py --specs reporte.json  # [{"tipo", "filtro", "salida"}, ...]
+#   python graficas.py --snapshot            # desde la copia local, sin PostgreSQL
+
+import argparse
+import json
+import os
+import time
+
+import matplotlib
+matplotlib.use('Agg')  # solo se guardan archivos
+import matplotlib.pyplot as plt
+import numpy as np
+import psycopg2
+
+from lotes_db import (BASE_WHERE, connect, read_velocidades, filtrar, filtro_columnas,
+                      summarize, histograms, _Filtro)
+from snapshot_lotes import leer_snapshot, opcion_snapshot
+import barrass
+import box_plot_filtrados
+import boxplot
+import histograma
+import histogramas
+
+# Gráficas por defecto: las de cada script, con su filtro y su archivo
+REPORTE = [
+    {'tipo': 'boxplot', 'filtro': boxplot.filtro, 'salida': boxplot.output_filename},
+    {'tipo': 'boxplot_nombres', 'filtro': box_plot_filtrados.filtro,
+     'salida': os.path.join(box_plot_filtrados.output_dir, 'boxplots_velocidades_edificios_ordenados.png')},
+    {'tipo': 'histogramas', 'filtro': histogramas.filtro, 'salida': histogramas.output_dir},
+    {'tipo': 'barras', 'filtro': barrass.filtro, 'salida': barrass.output_filename},
+    {'tipo': 'histograma_rangos', 'filtro': histograma.filtro, 'salida': histograma.output_filename},
+]
+
+
+def _ordenados(resumen):
+    resumen.sort(key=lambda x: x['media'])
+    return resumen
+
+
+def _rangos(tabla, mask):
+    rangos = np.asarray(tabla['max_min'], dtype=np.float64)
+    mask = mask & ~np.isnan(rangos)
+    return tabla['clave'][mask], rangos[mask]
+
+
+def grafica_boxplot(tabla, mask, salida, opciones):
+    resumen = _ordenados(summarize(tabla, mask))
+    if resumen:
+        boxplot.graficar(resumen, salida, mostrar=False)
+    return len(resumen)
+
+
+def grafica_boxplot_nombres(tabla, mask, salida, opciones):
+    resumen = _ordenados(summarize(tabla, mask, extra_cols=('nombres',)))
+    if resumen:
+        box_plot_filtrados.graficar(resumen, salida, mostrar=False)
+    return len(resumen)
+
+
+def grafica_histogramas(tabla, mask, salida, opciones):
+    resumen = {r['clave']: r for r in summarize(tabla, mask, fliers=False)}
+    poligonos = [(clave, resumen[clave], bordes, conteos)
+                 for clave, (bordes, conteos) in histograms(tabla, mask).items()]
+    if poligonos:
+        histogramas.renderizar_lote(poligonos, opciones.procesos, opciones.forzar, directorio=salida)
+    return len(poligonos)
+
+
+def grafica_barras(tabla, mask, salida, opciones):
+    claves, rangos = _rangos(tabla, mask)
+    if len(rangos):
+        barrass.graficar(claves, rangos, salida, mostrar=False, modo=opciones.modo_barras)
+    return len(rangos)
+
+
+def grafica_histograma_rangos(tabla, mask, salida, opciones):
+    _, rangos = _rangos(tabla, mask)
+    if len(rangos):
+        histograma.graficar(rangos, salida, mostrar=False)
+    return len(rangos)
+
+
+# tipo → (función, columnas que necesita, ¿usa velmm_yr?)
+TIPOS = {
+    'boxplot':           (grafica_boxplot, (), True),
+    'boxplot_nombres':   (grafica_boxplot_nombres, ('nombres',), True),
+    'histogramas':       (grafica_histogramas, (), True),
+    'barras':            (grafica_barras, ('max_min',), False),
+    'histograma_rangos': (grafica_histograma_rangos, ('max_min',), False),
+}
+
+# Únicas columnas que puede usar un filtro: el WHERE llega tal cual a PostgreSQL
+COLUMNAS_PERMITIDAS = ('max_min', 'no_puntos')
+
+
+def validar(specs):
+    """Comprueba tipos y filtros antes de ir a la base de datos."""
+    for spec in specs:
+        if spec['tipo'] not in TIPOS:
+            raise ValueError(f"Tipo de gráfica desconocido: {spec['tipo']} "
+                             f"(disponibles: {', '.join(TIPOS)})")
+        if not spec.get('salida'):
+            raise ValueError(f"Falta la salida de la gráfica {spec['tipo']}")
+        filtro = spec.get('filtro')
+        if filtro and filtro.strip():
+            # El analizador completo, no solo los tokens: «max_min >» o
+            # «pg_sleep(10) > 0» se rechazan aquí, antes de la consulta
+            _Filtro(filtro, {c: np.zeros(1) for c in COLUMNAS_PERMITIDAS}, 1).parse()
+
+
+def consulta_unica(specs):
+    """
+    Columnas, WHERE y condición base de la única consulta que cubre todas
+    las gráficas. El WHERE es la disyunción de los filtros, que deben
+    haber pasado antes por validar() (solo columnas de COLUMNAS_PERMITIDAS,
+    números, comparaciones, IS [NOT] NULL, AND, OR, NOT y paréntesis).
+    """
+    columnas, velocidades = set(), False
+    for spec in specs:
+        _, cols, usa_vel = TIPOS[spec['tipo']]
+        columnas.update(cols)
+        columnas.update(filtro_columnas(spec.get('filtro')))
+        velocidades = velocidades or usa_vel
+
+    filtros = [spec.get('filtro') for spec in specs]
+    where = None if not all(filtros) else " OR ".join(f"({f})" for f in dict.fromkeys(filtros))
+
+    # Si todas usan velocidades se descartan en el servidor los polígonos sin ellas
+    todas_vel = all(TIPOS[spec['tipo']][2] for spec in specs)
+    return sorted(columnas), where, (BASE_WHERE if todas_vel else None), velocidades
+
+
+def cargar_tabla(conn, specs):
+    """La única consulta del reporte."""
+    columnas, where, base, velocidades = consulta_unica(specs)
+    t0 = time.perf_counter()
+    tabla = read_velocidades(conn, where, columns=columnas, base=base, velocidades=velocidades)
+    print(f"Consulta única: {len(tabla['clave'])} polígonos, {len(tabla['valores'])} velocidades "
+          f"({time.perf_counter() - t0:.1f}s)")
+    return tabla
+
+
+def generar(tabla, specs, opciones):
+    for spec in specs:
+        funcion = TIPOS[spec['tipo']][0]
+        mask = filtrar(tabla, spec.get('filtro'))
+        t0 = time.perf_counter()
+        # rc_context: el estilo que fija cada script no se hereda a la siguiente gráfica
+        with plt.rc_context():
+            total = funcion(tabla, mask, spec['salida'], opciones)
+        plt.close('all')
+        if total:
+            print(f"{spec['tipo']}: {total} polígonos ({time.perf_counter() - t0:.1f}s)")
+        else:
+            print(f"{spec['tipo']}: ningún polígono cumple '{spec.get('filtro') or ''}'")
+
+
+def cargar_specs(args):
+    if args.specs:
+        with open(args.specs, encoding='utf-8') as f:
+            return json.load(f)
+    if args.grafica:
+        return [{'tipo': t, 'filtro': f, 'salida': s} for t, f, s in args.grafica]
+    return REPORTE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gráficas de subs.lotes_b_subs con una sola consulta.")
+    parser.add_argument('--grafica', nargs=3, action='append', metavar=('TIPO', 'FILTRO', 'SALIDA'),
+                        help="tipo: " + ", ".join(TIPOS) + "; filtro '' → sin filtro")
+    parser.add_argument('--specs', help="JSON con una lista de {tipo, filtro, salida}")
+    parser.add_argument('-j', '--procesos', type=int, default=histogramas.procesos,
+                        help="procesos para los histogramas por polígono")
+    parser.add_argument('--forzar', action='store_true',
+                        help="regenera los histogramas por polígono aunque no hayan cambiado")
+    parser.add_argument('--modo-barras', default=barrass.modo_barras,
+                        choices=('auto', 'completo', 'bandas', 'lttb', 'paginas'),
+                        help="modo de la gráfica de barras (ver barrass.py)")
+    opcion_snapshot(parser)
+    args = parser.parse_args()
+
+    specs = cargar_specs(args)
+    try:
+        validar(specs)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    conn = None
+    try:
+        if args.snapshot:
+            tabla = leer_snapshot(args.snapshot)
+        else:
+            # Establecer conexión con la base de datos
+            conn = connect()
+            tabla = cargar_tabla(conn, specs)
+        generar(tabla, specs, args)
+
+    except psycopg2.Error as e:
+        print(f"Error al conectar a PostgreSQL: {e}")
+    except FileNotFoundError as e:
+        print(e)
+    finally:
+        if conn is not None:
+            conn.close()
+            print("Conexión cerrada")
+
+
+if __name__ == "__main__":
+    main()
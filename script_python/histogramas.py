@@ -1,134 +1,315 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')  # sin ventana: los gráficos solo se guardan en disco
+import numpy as np
 import psycopg2
 import matplotlib.pyplot as plt
-import numpy as np
 from matplotlib.ticker import MaxNLocator
 
-# Configuración de la conexión a la base de datos
-db_config = {
-    'host': 'localhost',
-    'database': 'practica01',
-    'user': 'postgres',
-    'password': 'postgres',
-    'port': '5432'
-}
-
-# Consulta SQL para obtener los polígonos con sus arrays de velocidad
-query = """
-    SELECT 
-        clave, 
-        velmm_yr
-    FROM 
-        subs.lotes_b_subs
-    WHERE
-        velmm_yr IS NOT NULL AND array_length(velmm_yr, 1) > 0;
-"""
-
-try:
-    # Establecer conexión con la base de datos
-    conn = psycopg2.connect(**db_config)
-    cursor = conn.cursor()
-    
-    # Ejecutar la consulta
-    cursor.execute(query)
-    resultados = cursor.fetchall()
-    
-    # Verificar si obtuvimos datos
-    if not resultados:
-        print("No se encontraron polígonos con datos de velocidad.")
+from lotes_db import (MAX_BINS, connect, fetch_summaries, fetch_histograms, filtrar,
+                      summarize, histograms)
+from snapshot_lotes import leer_snapshot, opcion_snapshot
+
+# Polígonos a graficar (None → todos los que tienen velmm_yr no vacío)
+filtro = None
+
+# Carpeta de salida y manifiesto con la huella de cada gráfico ya generado
+output_dir = '.'
+manifest_filename = 'histogramas_manifest.json'
+
+# Procesos para el renderizado (None → uno por núcleo)
+procesos = None
+DPI = 300
+
+# Nivel zlib del PNG (None → el de matplotlib). A 300 dpi la compresión es
+# buena parte de savefig: 1 guarda ~25% más rápido con archivos ~50% más grandes
+PNG_COMPRESION = None
+
+# Cambiar si se modifica el diseño del gráfico: invalida todo el manifiesto
+VERSION_GRAFICO = 2
+
+# Cada cuántos gráficos se informa el avance y se guarda el manifiesto
+PASO_PROGRESO = 100
+
+
+def cargar_poligonos(conn=None, tabla=None):
+    """
+    Estadísticos y conteos del histograma de cada polígono, calculados en
+    PostgreSQL (bins de Freedman-Diaconis entre 1 y 20) o sobre una tabla
+    del snapshot local.
+    """
+    if tabla is not None:
+        mask = filtrar(tabla, filtro)
+        resumen = {r['clave']: r for r in summarize(tabla, mask, fliers=False)}
+        histogramas = histograms(tabla, mask)
+    else:
+        resumen = {r['clave']: r for r in fetch_summaries(conn, filtro, fliers=False)}
+        histogramas = fetch_histograms(conn, filtro)
+    return [(clave, resumen[clave], bordes, conteos)
+            for clave, (bordes, conteos) in histogramas.items()]
+
+
+def nombre_archivo(poligono_id, directorio=None):
+    return os.path.join(directorio or output_dir,
+                        "histograma_velocidades_poligono_{}.png".format(poligono_id))
+
+
+def huella(r, bordes, conteos):
+    """Hash de todo lo que se dibuja: si no cambia, el PNG tampoco."""
+    h = hashlib.sha1()
+    h.update(str(VERSION_GRAFICO).encode())
+    h.update(np.asarray(bordes, dtype=np.float64).tobytes())
+    h.update(np.asarray(conteos, dtype=np.int64).tobytes())
+    h.update(repr([r[k] for k in ('n', 'media', 'mediana', 'maximo', 'minimo', 'desv')]).encode())
+    return h.hexdigest()
+
+
+def cargar_manifiesto(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def guardar_manifiesto(path, manifiesto):
+    # Archivo temporal + replace: un corte a medias no deja un JSON roto
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=0, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def texto_estadisticas(r):
+    return """
+    Total valores: {}
+    Media: {:.2f} mm/año
+    Mediana: {:.2f} mm/año
+    Máx: {:.2f} mm/año
+    Mín: {:.2f} mm/año
+    Desv. Estándar: {:.2f} mm/año""".format(
+        r['n'],
+        r['media'],
+        r['mediana'],
+        r['maximo'],
+        r['minimo'],
+        r['desv']
+    )
+
+
+def graficar_poligono(ax, poligono_id, r, bordes, conteos):
+    """
+    Dibuja el histograma de un polígono sobre `ax` (que se limpia antes),
+    creando todos los artistas. Es el camino de referencia; en lote se usa
+    PlantillaHistograma.
+    """
+    ax.clear()
+
+    # Conteos ya agrupados: una muestra por bin con su frecuencia como peso
+    ax.hist(bordes[:-1], bins=bordes, weights=conteos,
+            color='#3498db', edgecolor='black', alpha=0.7)
+
+    # Configurar título y etiquetas
+    ax.set_title('Distribución de velocidades - Polígono: {}'.format(poligono_id))
+    ax.set_xlabel('Velocidad (mm/año)')
+    ax.set_ylabel('Frecuencia')
+
+    # Asegurar que las etiquetas del eje y sean enteros
+    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
+
+    # Mostrar estadísticas en el gráfico
+    ax.text(0.95, 0.95, texto_estadisticas(r), transform=ax.transAxes,
+            verticalalignment='top', horizontalalignment='right',
+            bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
+
+
+class PlantillaHistograma:
+    """
+    Figura de histograma armada una sola vez: ejes, etiquetas, cuadro de
+    estadísticas, MAX_BINS rectángulos y márgenes (tight_layout se calcula
+    al crearla, no por polígono). Para cada polígono solo se mueven los
+    rectángulos, se reajustan los límites y se cambian los textos.
+    """
+
+    def __init__(self, max_bins=MAX_BINS, figsize=(10, 6)):
+        self.fig, self.ax = plt.subplots(figsize=figsize)
+        ax = self.ax
+
+        # Mismos rectángulos que crea ax.hist (bar de borde a borde)
+        self.barras = ax.bar(np.arange(max_bins), np.ones(max_bins), width=1.0, align='edge',
+                             color='#3498db', edgecolor='black', alpha=0.7).patches
+        self.titulo = ax.set_title('Distribución de velocidades - Polígono: ')
+        ax.set_xlabel('Velocidad (mm/año)')
+        ax.set_ylabel('Frecuencia')
+        ax.yaxis.set_major_locator(MaxNLocator(integer=True))
+        self.texto = ax.text(0.95, 0.95, '', transform=ax.transAxes,
+                             verticalalignment='top', horizontalalignment='right',
+                             bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
+
+        # Márgenes con etiquetas de ejes anchas (hasta 5 cifras) y fijos desde aquí
+        ax.set_xlim(-999.99, 999.99)
+        ax.set_ylim(0, 99999)
+        self.fig.tight_layout()
+        ax.set_autoscale_on(True)
+
+    def actualizar(self, poligono_id, r, bordes, conteos):
+        if len(conteos) > len(self.barras):
+            raise ValueError("{} bins; la plantilla tiene {}".format(len(conteos), len(self.barras)))
+        for i, rect in enumerate(self.barras):
+            if i < len(conteos):
+                rect.set_bounds(bordes[i], 0, bordes[i + 1] - bordes[i], conteos[i])
+                rect.set_visible(True)
+            else:
+                rect.set_visible(False)
+
+        # Límites como los de ax.hist: márgenes de rcParams y la base fija en 0
+        self.ax.relim(visible_only=True)
+        self.ax.autoscale_view()
+
+        self.titulo.set_text('Distribución de velocidades - Polígono: {}'.format(poligono_id))
+        self.texto.set_text(texto_estadisticas(r))
+
+    def guardar(self, archivo, dpi=DPI, compresion=PNG_COMPRESION):
+        extra = {} if compresion is None else {'pil_kwargs': {'compress_level': compresion}}
+        self.fig.savefig(archivo, dpi=dpi, **extra)
+
+
+# Plantilla propia de cada proceso: se crea una vez y se reutiliza en cada polígono
+_plantilla = None
+
+
+def _iniciar_worker():
+    global _plantilla
+    plt.style.use('ggplot')
+    _plantilla = PlantillaHistograma()
+
+
+def _renderizar(tarea):
+    """Guarda un histograma; devuelve (clave, huella, error)."""
+    poligono_id, r, bordes, conteos, h, archivo = tarea
+    if _plantilla is None:
+        _iniciar_worker()
+    try:
+        _plantilla.actualizar(poligono_id, r, bordes, conteos)
+        _plantilla.guardar(archivo)
+        return poligono_id, h, None
+    except Exception as e:
+        return poligono_id, h, str(e)
+
+
+def renderizar_lote(poligonos, n_procesos=procesos, forzar=False, directorio=None):
+    """
+    Reparte los polígonos entre `n_procesos` (1 → en este mismo proceso).
+    Salta los que tienen la misma huella que en el manifiesto y cuyo PNG
+    sigue existiendo, salvo con forzar=True. `directorio` sustituye a
+    output_dir.
+    """
+    directorio = directorio or output_dir
+    os.makedirs(directorio, exist_ok=True)
+    manifest_path = os.path.join(directorio, manifest_filename)
+    manifiesto = {} if forzar else cargar_manifiesto(manifest_path)
+
+    tareas = []
+    for poligono_id, r, bordes, conteos in poligonos:
+        h = huella(r, bordes, conteos)
+        clave = str(poligono_id)
+        archivo = nombre_archivo(poligono_id, directorio)
+        if manifiesto.get(clave) == h and os.path.exists(archivo):
+            continue
+        tareas.append((poligono_id, r, bordes, conteos, h, archivo))
+
+    omitidos = len(poligonos) - len(tareas)
+    if omitidos:
+        print("Sin cambios desde el último renderizado: {} polígonos".format(omitidos))
+    if not tareas:
+        return 0, 0
+
+    n_procesos = n_procesos or os.cpu_count() or 1
+    n_procesos = min(n_procesos, len(tareas))
+    print("Generando {} histogramas con {} proceso(s)...".format(len(tareas), n_procesos))
+
+    if n_procesos == 1:
+        _iniciar_worker()
+        resultados = map(_renderizar, tareas)
+        pool = None
     else:
-        # Configurar el estilo de los gráficos
-        plt.style.use('ggplot')
-        
-        # Procesar cada polígono
-        for row in resultados:
-            poligono_id, vel_array = row
-            
-            # Convertir el array de PostgreSQL a lista de Python
-            try:
-                if isinstance(vel_array, str):
-                    velocidades = [float(x) for x in vel_array.strip('{}').split(',')]
-                else:
-                    velocidades = list(vel_array)
-                velocidades = np.array(velocidades, dtype=float)
-            except Exception as e:
-                print("Error procesando velocidades para polígono {}: {}".format(poligono_id, e))
-                continue
-            
-            # Filtrar valores nulos o inválidos
-            velocidades = velocidades[~np.isnan(velocidades)]
-            
-            if len(velocidades) == 0:
-                print("Polígono {} no tiene valores de velocidad válidos.".format(poligono_id))
-                continue
-            
-            # Configurar la figura
-            fig, ax = plt.subplots(figsize=(10, 6))
-            
-            # Cálculo robusto del número de bins
-            try:
-                # Regla de Freedman-Diaconis con manejo de casos especiales
-                iqr = np.percentile(velocidades, 75) - np.percentile(velocidades, 25)
-                if iqr == 0:
-                    # Si todos los valores son iguales, usar 1 bin
-                    num_bins = 1
-                else:
-                    bin_width = 2 * iqr / (len(velocidades) ** (1/3))
-                    range_val = np.max(velocidades) - np.min(velocidades)
-                    num_bins = int(range_val / bin_width) if bin_width > 0 else 10
-                    num_bins = max(1, min(num_bins, 20))  # Entre 1 y 20 bins
-            except:
-                num_bins = 10  # Valor por defecto si falla el cálculo
-            
-            # Crear el histograma con manejo de errores
-            try:
-                n, bins, patches = ax.hist(velocidades, bins=num_bins, color='#3498db', 
-                                        edgecolor='black', alpha=0.7)
-                
-                # Configurar título y etiquetas
-                ax.set_title('Distribución de velocidades - Polígono: {}'.format(poligono_id))
-                ax.set_xlabel('Velocidad (mm/año)')
-                ax.set_ylabel('Frecuencia')
-                
-                # Asegurar que las etiquetas del eje y sean enteros
-                ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-                
-                # Mostrar estadísticas en el gráfico
-                stats_text = """
-                Total valores: {}
-                Media: {:.2f} mm/año
-                Mediana: {:.2f} mm/año
-                Máx: {:.2f} mm/año
-                Mín: {:.2f} mm/año
-                Desv. Estándar: {:.2f} mm/año""".format(
-                    len(velocidades),
-                    np.mean(velocidades),
-                    np.median(velocidades),
-                    np.max(velocidades),
-                    np.min(velocidades),
-                    np.std(velocidades)
-                )
-                
-                ax.text(0.95, 0.95, stats_text, transform=ax.transAxes, 
-                       verticalalignment='top', horizontalalignment='right',
-                       bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
-                
-                # Guardar el gráfico
-                plt.tight_layout()
-                filename = "histograma_velocidades_poligono_{}.png".format(poligono_id)
-                plt.savefig(filename, dpi=300)
-                print("Gráfico guardado como {}".format(filename))
-                plt.close()
-                
-            except Exception as e:
-                print("Error al generar histograma para polígono {}: {}".format(poligono_id, e))
-                plt.close()
-
-except psycopg2.Error as e:
-    print("Error al conectar a PostgreSQL: {}".format(e))
-finally:
-    if conn is not None:
-        conn.close()
-        print("Conexión cerrada")
\ No newline at end of file
+        pool = ProcessPoolExecutor(max_workers=n_procesos, initializer=_iniciar_worker)
+        chunk = max(1, min(32, len(tareas) // (n_procesos * 4)))
+        resultados = pool.map(_renderizar, tareas, chunksize=chunk)
+
+    hechos = errores = 0
+    t0 = time.perf_counter()
+    try:
+        for i, (poligono_id, h, error) in enumerate(resultados, 1):
+            if error is None:
+                manifiesto[str(poligono_id)] = h
+                hechos += 1
+            else:
+                manifiesto.pop(str(poligono_id), None)
+                errores += 1
+                print("Error al generar histograma para polígono {}: {}".format(poligono_id, error))
+
+            if i % PASO_PROGRESO == 0 or i == len(tareas):
+                dt = time.perf_counter() - t0
+                print("  {}/{} ({:.0%}) - {:.1f} gráficos/s".format(
+                    i, len(tareas), i / len(tareas), i / dt if dt else 0.0))
+                guardar_manifiesto(manifest_path, manifiesto)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        guardar_manifiesto(manifest_path, manifiesto)
+
+    return hechos, errores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Histogramas de velocidad por polígono.")
+    parser.add_argument('-j', '--procesos', type=int, default=procesos,
+                        help="procesos para renderizar (por defecto, uno por núcleo)")
+    parser.add_argument('--forzar', action='store_true',
+                        help="regenera todos los gráficos aunque no hayan cambiado")
+    opcion_snapshot(parser)
+    args = parser.parse_args()
+
+    conn = None
+    try:
+        if args.snapshot:
+            poligonos = cargar_poligonos(tabla=leer_snapshot(args.snapshot))
+        else:
+            # Establecer conexión con la base de datos
+            conn = connect()
+            poligonos = cargar_poligonos(conn)
+            conn.close()
+            conn = None
+            print("Conexión cerrada")
+
+        # Verificar si obtuvimos datos
+        if not poligonos:
+            print("No se encontraron polígonos con datos de velocidad.")
+            return
+
+        hechos, errores = renderizar_lote(poligonos, args.procesos, args.forzar)
+        print("Gráficos guardados en {}: {} nuevos, {} con error".format(
+            os.path.abspath(output_dir), hechos, errores))
+
+    except psycopg2.Error as e:
+        print("Error al conectar a PostgreSQL: {}".format(e))
+    except FileNotFoundError as e:
+        print(e)
+    finally:
+        if conn is not None:
+            conn.close()
+            print("Conexión cerrada")
+
+
+if __name__ == "__main__":
+    main()
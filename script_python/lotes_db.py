@@ -0,0 +1,525 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Acceso compartido a subs.lotes_b_subs para los scripts de gráficas.
+#
+# Las estadísticas por polígono (n, media, desviación, mínimo, máximo,
+# cuartiles, bigotes, valores atípicos) y los conteos del histograma se
+# calculan en PostgreSQL con unnest + percentile_cont / width_bucket; por
+# la red solo viajan filas resumen, no cada velocidad de cada punto.
+#
+# Las fórmulas siguen a NumPy/Matplotlib para que las gráficas no cambien:
+#   - percentile_cont = np.percentile (interpolación lineal)
+#   - stddev_pop      = np.std (ddof=0)
+#   - bigotes a 1.5·IQR, como plt.boxplot (whis=1.5)
+#   - bins de Freedman-Diaconis entre 1 y MAX_BINS, como histogramas.py
+#
+# Cuando hacen falta las velocidades en crudo, iter_velocidades /
+# read_velocidades las leen con un cursor del lado del servidor y las
+# devuelven como un solo array float64 más offsets por polígono. Sobre
+# esa tabla en memoria, mascara() aplica los mismos filtros que el WHERE
+# de los scripts y summarize() / histograms() dan los mismos resultados
+# que fetch_summaries() / fetch_histograms(), calculados para todos los
+# polígonos a la vez con stats_ragged.
+
+import re
+import struct
+
+import numpy as np
+import psycopg2
+import psycopg2.extensions
+
+from stats_ragged import seleccionar, ragged_stats, ragged_fliers, ragged_histograms
+
+# Configuración de la conexión a la base de datos
+db_config = {
+    'host': 'localhost',
+    'database': 'practica01',
+    'user': 'postgres',
+    'password': 'postgres',
+    'port': '5432'
+}
+
+# Condición común: polígonos con array de velocidades no vacío
+BASE_WHERE = "velmm_yr IS NOT NULL AND array_length(velmm_yr, 1) > 0"
+
+WHIS     = 1.5   # longitud de los bigotes en múltiplos del IQR
+MAX_BINS = 20    # tope de bins por histograma
+ITERSIZE = 2000  # filas por viaje del cursor con nombre (lado servidor)
+
+# OIDs de float8[] y float4[] en PostgreSQL
+FLOAT_ARRAY_OIDS = (1022, 1021)
+
+# Velocidades individuales (sin NULL ni NaN) de los polígonos filtrados
+_VALUES_CTE = """
+    v AS (
+        SELECT l.clave, x.v::float8 AS v
+        FROM subs.lotes_b_subs l
+        CROSS JOIN LATERAL unnest(l.velmm_yr) AS x(v)
+        WHERE {where} AND x.v IS NOT NULL AND x.v::float8 <> 'NaN'::float8
+    )"""
+
+SUMMARY_SQL = """
+    WITH""" + _VALUES_CTE + """,
+    s AS (
+        SELECT clave,
+               count(*)          AS n,
+               avg(v)            AS media,
+               stddev_pop(v)     AS desv,
+               min(v)            AS minimo,
+               max(v)            AS maximo,
+               percentile_cont(ARRAY[0.25, 0.5, 0.75]) WITHIN GROUP (ORDER BY v) AS q
+        FROM v
+        GROUP BY clave
+    )
+    SELECT s.clave, s.n, s.media, s.desv, s.minimo, s.maximo,
+           s.q[1] AS q1, s.q[2] AS mediana, s.q[3] AS q3,
+           LEAST(COALESCE(min(v.v) FILTER (WHERE v.v >= s.q[1] - %(whis)s * (s.q[3] - s.q[1])), s.q[1]), s.q[1]) AS whislo,
+           GREATEST(COALESCE(max(v.v) FILTER (WHERE v.v <= s.q[3] + %(whis)s * (s.q[3] - s.q[1])), s.q[3]), s.q[3]) AS whishi,
+           {fliers} AS fliers{extra}
+    FROM s
+    JOIN v USING (clave)
+    GROUP BY s.clave, s.n, s.media, s.desv, s.minimo, s.maximo, s.q;
+"""
+
+_FLIERS = ("COALESCE(array_agg(v.v ORDER BY v.v) FILTER (WHERE v.v < s.q[1] - %(whis)s * (s.q[3] - s.q[1])"
+           " OR v.v > s.q[3] + %(whis)s * (s.q[3] - s.q[1])), ARRAY[]::float8[])")
+
+# Columnas adicionales del polígono (una subconsulta por columna, sin JOIN)
+_EXTRA = ",\n           (SELECT l.{c} FROM subs.lotes_b_subs l WHERE l.clave = s.clave LIMIT 1) AS {c}"
+
+HIST_SQL = """
+    WITH""" + _VALUES_CTE + """,
+    s AS (
+        SELECT clave, count(*) AS n, min(v) AS lo, max(v) AS hi,
+               percentile_cont(0.25) WITHIN GROUP (ORDER BY v) AS q1,
+               percentile_cont(0.75) WITHIN GROUP (ORDER BY v) AS q3
+        FROM v
+        GROUP BY clave
+    ),
+    b AS (
+        SELECT clave, lo, hi,
+               CASE WHEN q3 = q1 THEN 1
+                    ELSE GREATEST(1, LEAST(%(max_bins)s,
+                         floor((hi - lo) / (2 * (q3 - q1) / cbrt(n)))::int))
+               END AS nbins
+        FROM s
+    ),
+    t AS (
+        -- Bordes inferiores calculados como np.linspace: width_bucket con el
+        -- array asigna cada valor al mismo bin que np.histogram
+        SELECT clave, lo, hi, nbins,
+               ARRAY(SELECT lo + i * ((hi - lo) / nbins) FROM generate_series(0, nbins - 1) AS i) AS th
+        FROM b
+    )
+    SELECT t.clave, t.lo, t.hi, t.nbins,
+           CASE WHEN t.hi = t.lo THEN 1 ELSE width_bucket(v.v, t.th) END AS bucket,
+           count(*) AS conteo
+    FROM t
+    JOIN v USING (clave)
+    GROUP BY 1, 2, 3, 4, 5
+    ORDER BY 1, 5;
+"""
+
+
+def connect():
+    """Conexión con db_config."""
+    return psycopg2.connect(**db_config)
+
+
+def _where(where, base=BASE_WHERE):
+    conds = [c for c in (base, where and f"({where})") if c]
+    return " AND ".join(conds) or "TRUE"
+
+
+def fetch_summaries(conn, where=None, extra_cols=(), fliers=True):
+    """
+    Una fila resumen por polígono: clave, n, media, desv, minimo, maximo,
+    q1, mediana, q3, whislo, whishi, fliers (np.ndarray) y las columnas
+    de `extra_cols` de subs.lotes_b_subs (p. ej. 'nombres').
+    """
+    extra = "".join(_EXTRA.format(c=c) for c in extra_cols)
+    query = SUMMARY_SQL.format(where=_where(where), extra=extra,
+                               fliers=_FLIERS if fliers else "ARRAY[]::float8[]")
+    with conn.cursor() as cursor:
+        cursor.execute(query, {'whis': WHIS})
+        names = [d[0] for d in cursor.description]
+        rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+    for r in rows:
+        r['fliers'] = np.asarray(r['fliers'] or [], dtype=float)
+    return rows
+
+
+def fetch_histograms(conn, where=None, max_bins=MAX_BINS):
+    """
+    {clave: (bordes, conteos)} con bins de Freedman-Diaconis calculados en
+    el servidor; bordes y conteos son los mismos que daría np.histogram.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(HIST_SQL.format(where=_where(where)), {'max_bins': max_bins})
+        rows = cursor.fetchall()
+    hists = {}
+    for clave, lo, hi, nbins, bucket, conteo in rows:
+        if clave not in hists:
+            if hi == lo:
+                lo, hi = lo - 0.5, hi + 0.5       # igual que np.histogram con datos constantes
+            hists[clave] = (np.linspace(lo, hi, nbins + 1), np.zeros(nbins, dtype=np.int64))
+        hists[clave][1][bucket - 1] = conteo
+    return hists
+
+
+def box_stats(summaries, labels=None):
+    """Diccionarios para ax.bxp a partir de fetch_summaries."""
+    stats = []
+    for i, s in enumerate(summaries):
+        stats.append({
+            'label': labels[i] if labels is not None else str(s['clave']),
+            'med': s['mediana'], 'q1': s['q1'], 'q3': s['q3'],
+            'whislo': s['whislo'], 'whishi': s['whishi'],
+            'fliers': s['fliers'], 'mean': s['media'],
+        })
+    return stats
+
+
+def nombres_etiqueta(nombres, max_n=2):
+    """Nombres únicos (en orden) del polígono, como mucho `max_n` por etiqueta."""
+    if isinstance(nombres, str):
+        nombres_lista = nombres.strip('{}').split(',')
+    elif isinstance(nombres, list):
+        nombres_lista = nombres
+    else:
+        nombres_lista = []
+
+    # Eliminar nombres duplicados manteniendo el orden
+    nombres_unicos = list(dict.fromkeys(n.strip() for n in nombres_lista if n is not None))
+
+    etiqueta = "\n".join(nombres_unicos[:max_n])
+    if len(nombres_unicos) > max_n:
+        etiqueta += f"\n(+{len(nombres_unicos) - max_n} más)"
+    return etiqueta
+
+
+# ── Lectura de velocidades en crudo (valores + offsets) ──────────
+#
+# El lector pide array_send(velmm_yr::float8[]): el formato binario de
+# PostgreSQL (cabecera + [longitud int32, valor float8 big-endian] por
+# elemento) se lee con np.frombuffer sin parsear texto. El typecaster
+# de texto queda para consultas que seleccionen velmm_yr tal cual.
+
+_ELEM = np.dtype([('len', '>i4'), ('v', '>f8')])
+
+
+def _cast_float_array(value, cursor):
+    """'{1.5,-2,NULL}' → np.ndarray float64 sin pasar por listas de Python."""
+    if value is None:
+        return None
+    body = value[1:-1]
+    if not body:
+        return np.empty(0)
+    if 'NULL' in body:
+        body = body.replace('NULL', 'nan')
+    return np.fromstring(body, dtype=np.float64, sep=',')
+
+
+FLOAT_ARRAY_NP = psycopg2.extensions.new_type(FLOAT_ARRAY_OIDS, 'FLOAT_ARRAY_NP', _cast_float_array)
+
+
+def register_numpy_arrays(conn):
+    """Hace que float8[]/float4[] lleguen como np.ndarray en esta conexión."""
+    psycopg2.extensions.register_type(FLOAT_ARRAY_NP, conn)
+
+
+def decode_float8_array(buf):
+    """Salida de array_send(float8[]) → np.ndarray float64 (NULL → NaN)."""
+    if buf is None:
+        return None
+    ndim, flags, _ = struct.unpack_from('>iii', buf, 0)
+    if ndim == 0:
+        return np.empty(0)
+    n = struct.unpack_from('>i', buf, 12)[0]
+    for d in range(1, ndim):
+        n *= struct.unpack_from('>i', buf, 12 + 8 * d)[0]
+    pos = 12 + 8 * ndim
+    if not flags & 1:
+        # Sin NULL: todos los elementos miden 12 bytes → vista estructurada
+        return np.frombuffer(buf, dtype=_ELEM, count=n, offset=pos)['v'].astype(np.float64)
+    out = np.empty(n)
+    for i in range(n):
+        length = struct.unpack_from('>i', buf, pos)[0]
+        pos += 4
+        if length < 0:
+            out[i] = np.nan
+        else:
+            out[i] = struct.unpack_from('>d', buf, pos)[0]
+            pos += length
+    return out
+
+
+def _pack(arrays, drop_nan=True):
+    """Lista de arrays → (valores planos, offsets) con offsets[i]:offsets[i+1] por polígono."""
+    lengths = np.fromiter((0 if a is None else len(a) for a in arrays), dtype=np.int64, count=len(arrays))
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    valores = np.concatenate([a for a in arrays if a is not None]) if offsets[-1] else np.empty(0)
+    if drop_nan:
+        ok = ~np.isnan(valores)
+        if not ok.all():
+            kept = np.zeros(len(valores) + 1, dtype=np.int64)
+            np.cumsum(ok, out=kept[1:])
+            valores, offsets = valores[ok], kept[offsets]
+    return valores, offsets
+
+
+def _object_array(values):
+    """Array 1-D de objetos (np.asarray convertiría listas de igual largo en 2-D)."""
+    out = np.empty(len(values), dtype=object)
+    out[:] = list(values)
+    return out
+
+
+def iter_velocidades(conn, where=None, columns=(), itersize=ITERSIZE, drop_nan=True,
+                     base=BASE_WHERE, velocidades=True):
+    """
+    Recorre subs.lotes_b_subs con un cursor con nombre (lado servidor) y
+    genera, por cada lote de `itersize` filas, un dict con:
+        clave    → np.ndarray de claves
+        valores  → float64 con todas las velocidades del lote, seguidas
+        offsets  → int64, len = filas + 1; las del polígono i son
+                   valores[offsets[i]:offsets[i+1]]
+        <col>    → np.ndarray por cada columna de `columns`
+    La memoria depende de `itersize`, no del tamaño de la tabla.
+    base=None no exige velmm_yr no vacío; velocidades=False no lo lee
+    (valores vacío, offsets en cero).
+    """
+    arr = 'array_send(velmm_yr::float8[])' if velocidades else 'NULL::bytea'
+    cols = ", ".join(('clave', arr) + tuple(columns))
+    with conn.cursor(name='lotes_velocidades') as cursor:
+        cursor.itersize = itersize
+        cursor.execute(f"SELECT {cols} FROM subs.lotes_b_subs WHERE {_where(where, base)} ORDER BY clave")
+        while True:
+            rows = cursor.fetchmany(itersize)
+            if not rows:
+                break
+            batch = list(zip(*rows))
+            valores, offsets = _pack([decode_float8_array(b) for b in batch[1]], drop_nan)
+            out = {'clave': _object_array(batch[0]), 'valores': valores, 'offsets': offsets}
+            for name, col in zip(columns, batch[2:]):
+                out[name] = _object_array(col) if name == 'nombres' else np.asarray(col)
+            yield out
+
+
+def read_velocidades(conn, where=None, columns=(), itersize=ITERSIZE, drop_nan=True,
+                     base=BASE_WHERE, velocidades=True):
+    """Como iter_velocidades pero une todos los lotes en un solo dict."""
+    parts = list(iter_velocidades(conn, where, columns, itersize, drop_nan, base, velocidades))
+    if not parts:
+        return {'clave': np.empty(0, dtype=object), 'valores': np.empty(0),
+                'offsets': np.zeros(1, dtype=np.int64), **{c: np.empty(0) for c in columns}}
+    starts = np.cumsum([0] + [p['offsets'][-1] for p in parts[:-1]])
+    out = {
+        'clave': np.concatenate([p['clave'] for p in parts]),
+        'valores': np.concatenate([p['valores'] for p in parts]),
+        'offsets': np.concatenate([[0]] + [p['offsets'][1:] + s for p, s in zip(parts, starts)]),
+    }
+    for c in columns:
+        out[c] = np.concatenate([p[c] for p in parts])
+    return out
+
+
+# ── Filtros y estadísticos en memoria ────────────────────────────
+#
+# mascara() entiende el subconjunto de SQL que usan los filtros de los
+# scripts («max_min>=4.5 AND no_puntos >= 5», «max_min IS NOT NULL»…):
+# comparaciones entre columnas y números, IS [NOT] NULL, AND, OR, NOT y
+# paréntesis. Sigue la lógica de tres valores de SQL: una comparación con
+# NULL/NaN no es verdadera ni falsa y la fila no pasa el filtro.
+
+_TOKEN = re.compile(r"\s*(?:(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+)|([A-Za-z_]\w*)|(>=|<=|<>|!=|=|<|>|\(|\)|-))")
+_OPS = {'>=': np.greater_equal, '<=': np.less_equal, '<>': np.not_equal, '!=': np.not_equal,
+        '=': np.equal, '<': np.less, '>': np.greater}
+
+
+def _tokens(where):
+    tokens, pos, where = [], 0, where.strip()
+    while pos < len(where):
+        m = _TOKEN.match(where, pos)
+        if not m or m.end() == pos:
+            raise ValueError(f"Filtro no válido cerca de: {where[pos:]!r}")
+        num, name, op = m.groups()
+        if num is not None:
+            tokens.append(('num', float(num)))
+        elif name is not None:
+            up = name.upper()
+            tokens.append(('kw', up) if up in ('AND', 'OR', 'NOT', 'IS', 'NULL') else ('col', name))
+        else:
+            tokens.append(('op', op))
+        pos = m.end()
+    return tokens
+
+
+class _Filtro:
+    """Analizador descendente; cada nodo devuelve (verdadero, nulo) como máscaras."""
+
+    def __init__(self, where, columnas, n):
+        self.tokens = _tokens(where)
+        self.pos = 0
+        self.columnas = columnas
+        self.n = n
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _take(self, kind, value=None):
+        tok = self._peek()
+        if tok[0] != kind or (value is not None and tok[1] != value):
+            raise ValueError(f"Filtro no válido: se esperaba {value or kind}, llegó {tok[1]!r}")
+        self.pos += 1
+        return tok[1]
+
+    def parse(self):
+        out = self._or()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"Filtro no válido: sobra {self._peek()[1]!r}")
+        return out
+
+    def _or(self):
+        t, nul = self._and()
+        while self._peek() == ('kw', 'OR'):
+            self.pos += 1
+            t2, n2 = self._and()
+            t = t | t2
+            nul = (nul | n2) & ~t
+        return t, nul
+
+    def _and(self):
+        t, nul = self._not()
+        while self._peek() == ('kw', 'AND'):
+            self.pos += 1
+            t2, n2 = self._not()
+            falso = (~t & ~nul) | (~t2 & ~n2)
+            t = t & t2
+            nul = (nul | n2) & ~falso
+        return t, nul
+
+    def _not(self):
+        if self._peek() == ('kw', 'NOT'):
+            self.pos += 1
+            t, nul = self._not()
+            return ~t & ~nul, nul
+        return self._comparacion()
+
+    def _operando(self):
+        kind, value = self._peek()
+        if kind == 'op' and value == '-':
+            self.pos += 1
+            return -self._take('num')
+        if kind == 'num':
+            self.pos += 1
+            return value
+        if kind != 'col':
+            raise ValueError(f"Filtro no válido: se esperaba una columna o un número, llegó {value!r}")
+        self.pos += 1
+        name = value
+        if name not in self.columnas:
+            raise ValueError(f"Columna desconocida en el filtro: {name} "
+                             f"(disponibles: {', '.join(sorted(self.columnas))})")
+        return np.asarray(self.columnas[name], dtype=np.float64)
+
+    def _comparacion(self):
+        if self._peek() == ('op', '('):
+            self.pos += 1
+            out = self._or()
+            self._take('op', ')')
+            return out
+        a = self._operando()
+        if self._peek() == ('kw', 'IS'):
+            self.pos += 1
+            negado = self._peek() == ('kw', 'NOT')
+            self.pos += negado
+            self._take('kw', 'NULL')
+            es_nulo = np.broadcast_to(np.isnan(a), (self.n,))
+            return (~es_nulo if negado else es_nulo.copy()), np.zeros(self.n, dtype=bool)
+        op = self._take('op')
+        if op not in _OPS:
+            raise ValueError(f"Operador no válido en el filtro: {op}")
+        b = self._operando()
+        with np.errstate(invalid='ignore'):
+            nul = np.broadcast_to(np.isnan(a) | np.isnan(b), (self.n,)).copy()
+            t = np.broadcast_to(_OPS[op](a, b), (self.n,)) & ~nul
+        return t, nul
+
+
+def mascara(where, columnas):
+    """
+    Máscara booleana de las filas de `columnas` ({nombre: array}) que
+    cumplen `where`; None o '' → todas.
+    """
+    n = len(next(iter(columnas.values())))
+    if not where or not where.strip():
+        return np.ones(n, dtype=bool)
+    return _Filtro(where, columnas, n).parse()[0]
+
+
+def filtrar(tabla, where):
+    """mascara() con las columnas numéricas de una tabla de read_velocidades."""
+    columnas = {c: v for c, v in tabla.items() if c not in ('clave', 'valores', 'offsets', 'nombres')}
+    if not columnas:
+        if where and where.strip():
+            raise ValueError(f"La tabla no tiene columnas para el filtro: {where}")
+        return np.ones(len(tabla['clave']), dtype=bool)
+    return mascara(where, columnas)
+
+
+def filtro_columnas(where):
+    """Columnas que nombra un filtro. Solo lo separa en tokens: no comprueba
+    la sintaxis ni qué columnas son (para eso, _Filtro(...).parse())."""
+    return {value for kind, value in _tokens(where or '') if kind == 'col'}
+
+
+def _indices(tabla, mask):
+    n = len(tabla['offsets']) - 1
+    return np.arange(n) if mask is None else np.flatnonzero(mask)
+
+
+def _ragged(tabla, mask, max_bins=MAX_BINS):
+    """Índices elegidos, sus (valores, offsets) y los estadísticos de stats_ragged."""
+    idx = _indices(tabla, mask)
+    valores, offsets = seleccionar(tabla['valores'], tabla['offsets'], idx)
+    return idx, valores, offsets, ragged_stats(valores, offsets, WHIS, max_bins)
+
+
+_SUMMARY_COLS = ('media', 'desv', 'minimo', 'maximo', 'q1', 'mediana', 'q3', 'whislo', 'whishi')
+
+
+def summarize(tabla, mask=None, extra_cols=(), fliers=True):
+    """
+    Lo mismo que fetch_summaries, calculado sobre una tabla de
+    read_velocidades; `mask` elige los polígonos. Los polígonos sin
+    velocidades no aparecen (como en el servidor).
+    """
+    idx, _, offsets, st = _ragged(tabla, mask)
+    if fliers:
+        fv, fo = ragged_fliers(st, offsets, WHIS)
+    columnas = {c: st[c].tolist() for c in _SUMMARY_COLS}
+    rows = []
+    for j in np.flatnonzero(st['n'] > 0):
+        i = idx[j]
+        r = {'clave': tabla['clave'][i], 'n': int(st['n'][j])}
+        for c in _SUMMARY_COLS:
+            r[c] = columnas[c][j]
+        r['fliers'] = fv[fo[j]:fo[j + 1]] if fliers else np.empty(0)
+        for c in extra_cols:
+            r[c] = tabla[c][i]
+        rows.append(r)
+    return rows
+
+
+def histograms(tabla, mask=None, max_bins=MAX_BINS):
+    """Lo mismo que fetch_histograms sobre una tabla de read_velocidades."""
+    idx, valores, offsets, st = _ragged(tabla, mask, max_bins)
+    bajo, alto, conteos, oc = ragged_histograms(valores, offsets, st)
+    hists = {}
+    for j in np.flatnonzero(st['n'] > 0):
+        bordes = np.linspace(bajo[j], alto[j], st['nbins'][j] + 1)
+        hists[tabla['clave'][idx[j]]] = (bordes, conteos[oc[j]:oc[j + 1]])
+    return hists
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copia local de subs.lotes_b_subs para las gráficas.
+#
+# Guarda clave, velmm_yr, max_min, no_puntos y nombres en SNAPSHOT_DIR:
+#   valores.f8        velocidades de todos los polígonos seguidas (float64)
+#   offsets.i8        las del polígono i son valores[offsets[i]:offsets[i+1]]
+#   columnas.parquet  clave, max_min, no_puntos, nombres (una fila por polígono)
+#   meta.json         firma de la tabla, número de filas y de valores
+#
+# valores y offsets se abren con np.memmap: leer el snapshot no carga las
+# velocidades en memoria hasta que se usan. leer_snapshot() devuelve el
+# mismo dict que lotes_db.read_velocidades, así que los scripts aceptan
+# --snapshot y no tocan la base de datos.
+#
+# La firma (count(*), max(xmin) y, si se configura, max(COLUMNA_FECHA)) se
+# calcula en la misma transacción que la copia; si no cambió, no se
+# vuelve a descargar nada.
+#
+# Uso:
+#   python snapshot_lotes.py            # crea o actualiza si la tabla cambió
+#   python snapshot_lotes.py --estado   # solo compara la firma
+#   python snapshot_lotes.py --forzar   # descarga aunque no haya cambios
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from lotes_db import connect, iter_velocidades
+
+# Carpeta del snapshot (junto a los scripts)
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lotes_snapshot')
+
+# Columnas además de clave y velmm_yr
+COLUMNAS = ('max_min', 'no_puntos', 'nombres')
+
+# Columna con la fecha de última modificación, si la tabla la tiene (p. ej. 'actualizado')
+COLUMNA_FECHA = None
+
+FORMATO = 1
+
+FIRMA_SQL = """
+    SELECT count(*), COALESCE(max(xmin::text::bigint), 0){fecha}
+    FROM subs.lotes_b_subs;
+"""
+
+
+def firma_tabla(conn):
+    """Firma de subs.lotes_b_subs: cambia con cualquier INSERT, UPDATE o DELETE."""
+    fecha = f", max({COLUMNA_FECHA})::text" if COLUMNA_FECHA else ""
+    with conn.cursor() as cursor:
+        cursor.execute(FIRMA_SQL.format(fecha=fecha))
+        fila = cursor.fetchone()
+    firma = {'filas': fila[0], 'xmin': fila[1]}
+    if COLUMNA_FECHA:
+        firma['fecha'] = fila[2]
+    return firma
+
+
+def leer_meta(directorio=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(directorio, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('formato') == FORMATO else None
+
+
+def _reemplazar(tmp):
+    os.replace(tmp, tmp[:-len('.tmp')])
+
+
+def crear_snapshot(conn, directorio=SNAPSHOT_DIR, forzar=False):
+    """
+    Descarga la tabla a `directorio` si su firma cambió (o con forzar).
+    Devuelve el meta del snapshot vigente.
+    """
+    # Firma y copia dentro de la misma foto de la base de datos
+    conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+    firma = firma_tabla(conn)
+    meta = leer_meta(directorio)
+    if meta is not None and meta['firma'] == firma and not forzar:
+        conn.rollback()
+        print(f"Snapshot al día ({meta['filas']} polígonos, {meta['creado']})")
+        return meta
+
+    os.makedirs(directorio, exist_ok=True)
+    # Sin meta.json el snapshot no es válido: si la copia se corta, no se usa a medias
+    if os.path.exists(os.path.join(directorio, 'meta.json')):
+        os.remove(os.path.join(directorio, 'meta.json'))
+
+    t0 = time.perf_counter()
+    valores_tmp = os.path.join(directorio, 'valores.f8.tmp')
+    offsets, partes = [np.zeros(1, dtype=np.int64)], []
+    n_valores = 0
+    with open(valores_tmp, 'wb') as f:
+        for lote in iter_velocidades(conn, columns=COLUMNAS, base=None):
+            lote['valores'].astype('<f8', copy=False).tofile(f)
+            offsets.append(lote['offsets'][1:] + n_valores)
+            n_valores += len(lote['valores'])
+            partes.append(pd.DataFrame({
+                'clave': lote['clave'].astype(str),
+                'max_min': np.asarray(lote['max_min'], dtype=np.float64),
+                'no_puntos': np.asarray(lote['no_puntos'], dtype=np.float64),
+                'nombres': [list(n) if isinstance(n, list) else n for n in lote['nombres']],
+            }))
+            print(f"  {sum(len(p) for p in partes)} polígonos, {n_valores} velocidades")
+    conn.rollback()
+
+    offsets = np.concatenate(offsets)
+    offsets.astype('<i8', copy=False).tofile(os.path.join(directorio, 'offsets.i8.tmp'))
+    columnas = pd.concat(partes, ignore_index=True) if partes else \
+        pd.DataFrame({'clave': [], 'max_min': [], 'no_puntos': [], 'nombres': []})
+    columnas.to_parquet(os.path.join(directorio, 'columnas.parquet.tmp'), index=False)
+    for nombre in ('valores.f8.tmp', 'offsets.i8.tmp', 'columnas.parquet.tmp'):
+        _reemplazar(os.path.join(directorio, nombre))
+
+    meta = {
+        'formato': FORMATO,
+        'firma': firma,
+        'creado': datetime.now().isoformat(timespec='seconds'),
+        'filas': len(columnas),
+        'valores': n_valores,
+        'columnas': list(COLUMNAS),
+    }
+    with open(os.path.join(directorio, 'meta.json.tmp'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    _reemplazar(os.path.join(directorio, 'meta.json.tmp'))
+    print(f"Snapshot guardado en {directorio}: {meta['filas']} polígonos, "
+          f"{n_valores} velocidades ({time.perf_counter() - t0:.1f}s)")
+    return meta
+
+
+def _memmap(path, dtype, n):
+    if n == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(n,))
+
+
+def leer_snapshot(directorio=SNAPSHOT_DIR):
+    """
+    Tabla con el formato de lotes_db.read_velocidades (sin filtrar; los
+    filtros se aplican con lotes_db.filtrar). valores y offsets son memmap.
+    """
+    meta = leer_meta(directorio)
+    if meta is None:
+        raise FileNotFoundError(f"No hay snapshot válido en {directorio}; "
+                                f"créalo con: python snapshot_lotes.py")
+    columnas = pd.read_parquet(os.path.join(directorio, 'columnas.parquet'))
+    tabla = {
+        'clave': columnas['clave'].to_numpy(dtype=object),
+        'valores': _memmap(os.path.join(directorio, 'valores.f8'), '<f8', meta['valores']),
+        'offsets': _memmap(os.path.join(directorio, 'offsets.i8'), '<i8', meta['filas'] + 1),
+        'max_min': columnas['max_min'].to_numpy(dtype=np.float64),
+        'no_puntos': columnas['no_puntos'].to_numpy(dtype=np.float64),
+    }
+    # Parquet devuelve las listas como arrays: nombres_etiqueta espera listas
+    nombres = np.empty(len(columnas), dtype=object)
+    nombres[:] = [None if n is None else list(n) for n in columnas['nombres']]
+    tabla['nombres'] = nombres
+    return tabla
+
+
+def opcion_snapshot(parser):
+    """Añade --snapshot [DIR] al argparse de un script de gráficas."""
+    parser.add_argument('--snapshot', nargs='?', const=SNAPSHOT_DIR, metavar='DIR',
+                        help="lee la copia local (python snapshot_lotes.py) en vez de PostgreSQL")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copia local de subs.lotes_b_subs para las gráficas.")
+    parser.add_argument('directorio', nargs='?', default=SNAPSHOT_DIR)
+    parser.add_argument('--estado', action='store_true', help="solo compara la firma de la tabla")
+    parser.add_argument('--forzar', action='store_true', help="descarga aunque la tabla no haya cambiado")
+    args = parser.parse_args()
+
+    conn = None
+    try:
+        # Establecer conexión con la base de datos
+        conn = connect()
+        if args.estado:
+            meta = leer_meta(args.directorio)
+            firma = firma_tabla(conn)
+            if meta is None:
+                print(f"No hay snapshot en {args.directorio}")
+            elif meta['firma'] == firma:
+                print(f"Snapshot al día ({meta['filas']} polígonos, {meta['creado']})")
+            else:
+                print(f"Snapshot desactualizado: {meta['firma']} → {firma}")
+        else:
+            crear_snapshot(conn, args.directorio, args.forzar)
+
+    except psycopg2.Error as e:
+        print(f"Error al conectar a PostgreSQL: {e}")
+    finally:
+        if conn is not None:
+            conn.close()
+            print("Conexión cerrada")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Estadísticos por polígono sobre arrays irregulares (valores + offsets).
+#
+# Las velocidades de todos los polígonos van en un solo array float64 y
+# las del polígono i son valores[offsets[i]:offsets[i+1]] (el formato de
+# lotes_db.read_velocidades y del snapshot local). Todo se calcula de una
+# vez para todos los polígonos, sin bucle de Python por polígono:
+#   - n, suma, mínimo, máximo con np.add/minimum/maximum.reduceat
+#   - cuartiles con un orden segmentado (un solo sort de enteros con clave
+#     polígono·N + rango global) e interpolación lineal como np.percentile
+#   - bigotes a whis·IQR y valores atípicos como plt.boxplot
+#   - bins de Freedman-Diaconis y conteos iguales a np.histogram
+#
+# Los polígonos sin valores dan n = 0, NaN en los estadísticos y 0 bins.
+
+import numpy as np
+
+
+def _segmentos(offsets):
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n = np.diff(offsets)
+    return offsets, n, n > 0
+
+
+def _reduce(ufunc, valores, offsets, llenos, vacio=np.nan):
+    """ufunc.reduceat por segmento; los segmentos vacíos dan `vacio`."""
+    out = np.full(len(llenos), vacio, dtype=np.float64)
+    if llenos.any():
+        # reduceat con solo los inicios de segmentos llenos: cada uno termina
+        # donde empieza el siguiente lleno (los vacíos no ocupan posiciones)
+        out[llenos] = ufunc.reduceat(valores, offsets[:-1][llenos])
+    return out
+
+
+def ordenar_segmentos(valores, offsets):
+    """Valores ordenados dentro de cada polígono (los polígonos no se mezclan)."""
+    offsets, n, _ = _segmentos(offsets)
+    total = len(valores)
+    orden = np.argsort(valores)
+    rango = np.empty(total, dtype=np.int64)
+    rango[orden] = np.arange(total)
+    # polígono·N + rango: ordenar estos enteros agrupa por polígono y deja
+    # cada grupo en orden de valor (mucho más rápido que un argsort estable)
+    clave = np.repeat(np.arange(len(n), dtype=np.int64) * total, n) + rango
+    clave.sort()
+    return valores[orden[clave % total]]
+
+
+def cuantiles(ordenados, offsets, q):
+    """
+    Cuantil `q` (0–1) de cada polígono sobre valores ya ordenados por
+    segmento; interpolación lineal, igual que np.percentile.
+    """
+    offsets, n, llenos = _segmentos(offsets)
+    out = np.full(len(n), np.nan)
+    pos = q * (n[llenos] - 1)
+    bajo = np.floor(pos).astype(np.int64)
+    alto = np.minimum(bajo + 1, n[llenos] - 1)
+    t = pos - bajo
+    inicio = offsets[:-1][llenos]
+    a, b = ordenados[inicio + bajo], ordenados[inicio + alto]
+    # Misma fórmula que np.lerp de NumPy (exacta en los extremos)
+    out[llenos] = np.where(t >= 0.5, b - (b - a) * (1 - t), a + (b - a) * t)
+    return out
+
+
+def ragged_stats(valores, offsets, whis=1.5, max_bins=20):
+    """
+    dict de arrays (uno por polígono): n, media, desv (ddof=0), minimo,
+    maximo, q1, mediana, q3, iqr, whislo, whishi y nbins (Freedman-Diaconis
+    entre 1 y max_bins). También devuelve 'ordenados' para reutilizarlos.
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    offsets, n, llenos = _segmentos(offsets)
+
+    suma = _reduce(np.add, valores, offsets, llenos)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = suma / n
+    desv_cuad = (valores - np.repeat(media, n)) ** 2
+    desv = np.sqrt(_reduce(np.add, desv_cuad, offsets, llenos) / np.where(llenos, n, 1))
+    minimo = _reduce(np.minimum, valores, offsets, llenos)
+    maximo = _reduce(np.maximum, valores, offsets, llenos)
+
+    ordenados = ordenar_segmentos(valores, offsets)
+    q1 = cuantiles(ordenados, offsets, 0.25)
+    mediana = cuantiles(ordenados, offsets, 0.5)
+    q3 = cuantiles(ordenados, offsets, 0.75)
+    iqr = q3 - q1
+
+    # Bigotes: el dato más extremo dentro de whis·IQR, nunca dentro de la caja
+    lim_bajo, lim_alto = np.repeat(q1 - whis * iqr, n), np.repeat(q3 + whis * iqr, n)
+    whislo = np.fmin(_reduce(np.minimum, np.where(valores >= lim_bajo, valores, np.inf),
+                             offsets, llenos), q1)
+    whishi = np.fmax(_reduce(np.maximum, np.where(valores <= lim_alto, valores, -np.inf),
+                             offsets, llenos), q3)
+    whislo[~llenos] = whishi[~llenos] = np.nan
+
+    # Freedman-Diaconis: ancho 2·IQR/n^(1/3); un solo bin si IQR = 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fd = np.floor((maximo - minimo) / (2 * iqr / np.cbrt(n)))
+    nbins = np.where(iqr > 0, np.clip(np.nan_to_num(fd, nan=1.0, posinf=max_bins), 1, max_bins), 1)
+    nbins = np.where(llenos, nbins, 0).astype(np.int64)
+
+    return {
+        'n': n, 'media': media, 'desv': desv, 'minimo': minimo, 'maximo': maximo,
+        'q1': q1, 'mediana': mediana, 'q3': q3, 'iqr': iqr,
+        'whislo': whislo, 'whishi': whishi, 'nbins': nbins, 'ordenados': ordenados,
+    }
+
+
+def ragged_fliers(stats, offsets, whis=1.5):
+    """Valores atípicos (ordenados) de cada polígono como (valores, offsets)."""
+    offsets, n, _ = _segmentos(offsets)
+    ordenados = stats['ordenados']
+    lim_bajo = np.repeat(stats['q1'] - whis * stats['iqr'], n)
+    lim_alto = np.repeat(stats['q3'] + whis * stats['iqr'], n)
+    fuera = (ordenados < lim_bajo) | (ordenados > lim_alto)
+    contados = np.zeros(len(ordenados) + 1, dtype=np.int64)
+    np.cumsum(fuera, out=contados[1:])
+    return ordenados[fuera], contados[offsets]
+
+
+def ragged_histograms(valores, offsets, stats):
+    """
+    Conteos de np.histogram(v, bins=nbins) de cada polígono, sin bucle:
+    (bajo, alto, conteos, offsets_conteos). Los bordes del polígono i son
+    np.linspace(bajo[i], alto[i], nbins[i] + 1) y sus conteos
+    conteos[offsets_conteos[i]:offsets_conteos[i+1]].
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    offsets, n, llenos = _segmentos(offsets)
+    nbins = stats['nbins']
+    bajo, alto = stats['minimo'].copy(), stats['maximo'].copy()
+    # Datos constantes: np.histogram usa el rango (v - 0.5, v + 0.5)
+    constante = llenos & (alto == bajo)
+    bajo[constante] -= 0.5
+    alto[constante] += 0.5
+
+    off_conteos = np.zeros(len(n) + 1, dtype=np.int64)
+    np.cumsum(nbins, out=off_conteos[1:])
+    if not llenos.any():
+        return bajo, alto, np.zeros(0, dtype=np.int64), off_conteos
+
+    # Mismo cálculo que np.histogram con bins uniformes: índice aproximado
+    # y corrección contra los bordes exactos de np.linspace
+    nb, lo, hi = np.repeat(nbins, n), np.repeat(bajo, n), np.repeat(alto, n)
+    paso = (hi - lo) / nb
+    idx = ((valores - lo) * (nb / (hi - lo))).astype(np.int64)
+    idx = np.clip(idx, 0, nb - 1)
+
+    def borde(k):
+        return np.where(k == nb, hi, k * paso + lo)
+
+    idx -= valores < borde(idx)
+    idx += (valores >= borde(idx + 1)) & (idx != nb - 1)
+
+    conteos = np.bincount(np.repeat(off_conteos[:-1], n) + idx, minlength=off_conteos[-1])
+    return bajo, alto, conteos.astype(np.int64), off_conteos
+
+
+def seleccionar(valores, offsets, idx):
+    """(valores, offsets) solo de los polígonos `idx`, sin bucle por polígono."""
+    offsets = np.asarray(offsets, dtype=np.int64)
+    idx = np.asarray(idx, dtype=np.int64)
+    n = offsets[idx + 1] - offsets[idx]
+    nuevos = np.zeros(len(idx) + 1, dtype=np.int64)
+    np.cumsum(n, out=nuevos[1:])
+    pos = np.arange(nuevos[-1]) + np.repeat(offsets[idx] - nuevos[:-1], n)
+    return np.asarray(valores[pos], dtype=np.float64), nuevos
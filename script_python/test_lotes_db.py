@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Pruebas del analizador de filtros de lotes_db (_Filtro / mascara) y de
+# graficas.validar. El filtro de graficas.py llega tal cual al WHERE de
+# la consulta, así que el analizador es la única barrera contra la
+# inyección de SQL: todo lo que no sea columnas permitidas, números,
+# comparaciones, IS [NOT] NULL, AND, OR, NOT y paréntesis debe fallar.
+#
+# La lógica de tres valores (NULL/NaN) se compara con la de SQL: los
+# mismos filtros se evalúan en SQLite, que sigue el estándar igual que
+# PostgreSQL para estos operadores.
+#
+# Uso:
+#   python -m pytest test_lotes_db.py
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+import graficas
+from lotes_db import _Filtro, filtro_columnas, mascara
+
+
+def _validar(filtro):
+    graficas.validar([{'tipo': 'barras', 'filtro': filtro, 'salida': 'x.png'}])
+
+
+# ── Inyección de SQL: todo esto se rechaza antes de la base de datos ──
+
+RECHAZADOS = [
+    "; DROP TABLE subs.lotes_b_subs",
+    "max_min > 1; DROP TABLE subs.lotes_b_subs",
+    "max_min > 1 -- comentario",
+    "max_min > 1 --",
+    "max_min > 1 /* comentario */",
+    "max_min > (SELECT max(max_min) FROM subs.lotes_b_subs)",
+    "max_min IN (SELECT 1)",
+    "EXISTS (SELECT 1)",
+    "max_min > 1 UNION SELECT 1",
+    "nombres = 'x'",
+    "max_min > 1 OR 'a' = 'a'",
+    'max_min > "no_puntos"',
+    "pg_sleep(10) > 0",
+    "max_min > pg_sleep(10)",
+    "clave = 1",                       # columna real pero no permitida
+    "velmm_yr IS NOT NULL",
+    "max_min >",
+    "max_min > 1 OR",
+    "max_min > 1 AND AND no_puntos > 1",
+    "(max_min > 1",
+    "max_min > 1)",
+    "max_min",
+    "1",
+    "max_min > 1 max_min",
+    "max_min IS 1",
+    "max_min == 1",
+    "max_min > 1::int",
+    "max_min > 1 || 'x'",
+    "max_min > $1",
+    "max_min > %s",
+    "max_min > - - 1",
+]
+
+
+@pytest.mark.parametrize("filtro", RECHAZADOS)
+def test_validar_rechaza(filtro):
+    with pytest.raises(ValueError):
+        _validar(filtro)
+
+
+@pytest.mark.parametrize("filtro", [
+    None,
+    "",
+    "   ",
+    "max_min>=4.5 AND no_puntos >= 5",
+    "max_min IS NOT NULL and max_min <= 5",
+    "NOT (max_min < -2.5e1 OR no_puntos <> 3)",
+    "max_min != .5",
+])
+def test_validar_acepta(filtro):
+    _validar(filtro)
+
+
+def test_rechazo_antes_de_conectar(monkeypatch):
+    """main() no llega a conectar con un filtro inválido."""
+    monkeypatch.setattr(graficas, 'connect', lambda: pytest.fail("se conectó a PostgreSQL"))
+    monkeypatch.setattr('sys.argv', ['graficas.py', '--grafica', 'barras',
+                                     'max_min > 1; DROP TABLE x', 'x.png'])
+    with pytest.raises(SystemExit) as exc:
+        graficas.main()
+    assert "Filtro no válido" in str(exc.value.code)
+
+
+def test_filtro_columnas_solo_separa():
+    assert filtro_columnas("max_min > 1 AND no_puntos IS NULL") == {'max_min', 'no_puntos'}
+    assert filtro_columnas(None) == set()
+
+
+# ── Lógica de tres valores: igual que en SQL ─────────────────────────
+
+A = [1.0, np.nan, 5.0, 3.0, np.nan, -1.0]
+B = [np.nan, np.nan, 2.0, 3.0, 4.0, 0.0]
+
+FILTROS_SQL = [
+    "a > 2",
+    "NOT a > 2",
+    "NOT NOT a > 2",
+    "a IS NULL",
+    "a IS NOT NULL",
+    "NOT a IS NULL",
+    "a = b",
+    "a <> b",
+    "a != b",
+    "a >= b",
+    "a > -2",
+    "a > 0 OR b > 0",
+    "a > 0 AND b > 0",
+    "NOT (a > 0 AND b > 0)",
+    "NOT (a > 3 AND b > 0)",
+    "NOT (a > 0 OR b > 0)",
+    "NOT (a < 0 OR b > 5)",
+    "a > 2 OR a IS NULL",
+    "(a > 0 OR b > 3) AND NOT b < 1",
+    "a > 0 AND b > 0 OR a IS NULL",
+    "a > 0 OR b > 0 AND a < 0",
+    "1 = 1",
+    "1 > 2 OR a = 3",
+]
+
+
+@pytest.fixture(scope='module')
+def sqlite():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE t (i INTEGER, a REAL, b REAL)")
+    conn.executemany("INSERT INTO t VALUES (?, ?, ?)",
+                     [(i, None if np.isnan(a) else a, None if np.isnan(b) else b)
+                      for i, (a, b) in enumerate(zip(A, B))])
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize("filtro", FILTROS_SQL)
+def test_mascara_igual_que_sql(sqlite, filtro):
+    filas = {i for (i,) in sqlite.execute(f"SELECT i FROM t WHERE {filtro}")}
+    esperado = np.array([i in filas for i in range(len(A))])
+    obtenido = mascara(filtro, {'a': np.array(A), 'b': np.array(B)})
+    np.testing.assert_array_equal(obtenido, esperado)
+
+
+@pytest.mark.parametrize("filtro, esperado", [
+    # Resultados de PostgreSQL: una comparación con NULL no es verdadera ni falsa
+    ("a > 2", [False, False, True, True, False, False]),
+    ("NOT a > 2", [True, False, False, False, False, True]),
+    ("NOT (a > 3 AND b > 0)", [True, False, False, True, False, True]),
+    ("NOT (a > 0 OR b > 0)", [False, False, False, False, False, True]),
+])
+def test_mascara_nulos(filtro, esperado):
+    obtenido = mascara(filtro, {'a': np.array(A), 'b': np.array(B)})
+    assert obtenido.tolist() == esperado
+
+
+def test_mascara_sin_filtro():
+    assert mascara(None, {'a': np.array(A)}).all()
+    assert mascara('  ', {'a': np.array(A)}).all()
+
+
+def test_columna_desconocida():
+    with pytest.raises(ValueError, match="Columna desconocida"):
+        _Filtro("c > 1", {'a': np.zeros(1)}, 1).parse()